@@ -0,0 +1,51 @@
+/**
+ * Catalog delta between two scrapes, consumed by the MCP server (see mcp-server/catalog_delta.py)
+ */
+
+/**
+ * Stable key for a product across scrapes.
+ * Store URLs end with the item id (e.g. '...-i281'); falls back to the URL, then the name.
+ * Must match product_key() in mcp-server/catalog_delta.py (both are pinned by
+ * mcp-server/testdata/product_keys.json).
+ */
+function productKey(product) {
+  const url = product.url || '';
+  const match = url.match(/-(i\d+)\/?$/);
+  if (match) {
+    return match[1];
+  }
+  return url || product.name || '';
+}
+
+/**
+ * Compute added/changed/removed products between two scrapes, keyed by productKey()
+ */
+function buildCatalogDelta(previous, current) {
+  const previousByKey = new Map(previous.products.map(product => [productKey(product), product]));
+  const currentKeys = new Set();
+  const added = [];
+  const changed = [];
+
+  for (const product of current.products) {
+    const key = productKey(product);
+    currentKeys.add(key);
+    const before = previousByKey.get(key);
+    if (!before) {
+      added.push(product);
+    } else if (JSON.stringify(before) !== JSON.stringify(product)) {
+      changed.push(product);
+    }
+  }
+
+  const removed = [...previousByKey.keys()].filter(key => !currentKeys.has(key));
+
+  return {
+    baseScrapedAt: previous.scrapedAt,
+    scrapedAt: current.scrapedAt,
+    added,
+    changed,
+    removed
+  };
+}
+
+module.exports = { productKey, buildCatalogDelta };
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Admission control for tool calls
+Bounds concurrent work per tool class and rate-limits each session with a
+token bucket. Calls that would wait too long are rejected right away with a
+retry hint, so a burst cannot push latency up for every session.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+# Idle full buckets are pruned once more sessions than this are tracked
+MAX_TRACKED_SESSIONS = 10000
+
+
+class Overloaded(Exception):
+    """A call was not admitted; `retry_after` is a hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `burst` calls at once, refilled at `rate` calls per second"""
+
+    def __init__(self, rate: float, burst: int, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: Optional[float] = None) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: Optional[float] = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= self.burst
+
+
+class ConcurrencyLimit:
+    """Counting semaphore with a bounded FIFO wait queue and a wait timeout.
+
+    Waiters are plain futures created on the running loop, so the limit
+    itself is not tied to one event loop.
+    """
+
+    def __init__(self, limit: int, max_queue: int, max_wait: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded("queue_full", self.max_wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise Overloaded("wait_timeout", self.max_wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Drop a waiter that gave up, returning its slot if one was already handed over"""
+        if waiter.done() and not waiter.cancelled():
+            self.release()
+        else:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest live waiter
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    """Per-class concurrency limits plus per-session token buckets.
+
+    A limit or rate of 0 disables that check.
+    """
+
+    def __init__(self, limits: Dict[str, int], max_queue: int, max_wait: float, rate: float, burst: int):
+        self.limits = {
+            name: ConcurrencyLimit(limit, max_queue, max_wait)
+            for name, limit in limits.items() if limit > 0
+        }
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _take_token(self, session_id: str) -> float:
+        bucket = self._buckets.get(session_id)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_SESSIONS:
+                now = time.monotonic()
+                for sid in [sid for sid, b in self._buckets.items() if b.is_full(now)]:
+                    del self._buckets[sid]
+            bucket = self._buckets[session_id] = TokenBucket(self.rate, self.burst)
+        return bucket.take()
+
+    def _reject(self, error: Overloaded) -> Overloaded:
+        self.rejected[error.reason] = self.rejected.get(error.reason, 0) + 1
+        return error
+
+    @asynccontextmanager
+    async def admit(self, tool_class: str, session_id: Optional[str]):
+        """Hold an admission slot for the duration of a call, or raise Overloaded.
+
+        Calls without a session id are only bounded by the class limits: a
+        shared bucket for them would throttle every anonymous client at once.
+        """
+        if self.rate > 0 and session_id is not None:
+            retry_after = self._take_token(session_id)
+            if retry_after:
+                raise self._reject(Overloaded("rate_limited", retry_after))
+
+        limit = self.limits.get(tool_class)
+        if limit is not None:
+            try:
+                await limit.acquire()
+            except Overloaded as e:
+                raise self._reject(e)
+
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            if limit is not None:
+                limit.release()
+
+    def stats(self) -> Dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "classes": {
+                name: {"active": limit.active, "queued": limit.queued, "limit": limit.limit}
+                for name, limit in self.limits.items()
+            },
+        }
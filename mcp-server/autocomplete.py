@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Prefix autocomplete
+A character trie of normalised product-name words and category names.
+Every node stores its best completions (most popular first), computed once
+when the trie is built, so a lookup is one dictionary step per prefix
+character and never walks the subtree below it.
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# Completions kept per node, the most a lookup can return
+TOP_K = 20
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace"""
+    return " ".join((text or "").lower().split())
+
+
+def name_words(name: str) -> List[str]:
+    """Distinct words of a product name worth completing (no numbers or single letters)"""
+    return list(dict.fromkeys(
+        word for word in WORD_PATTERN.findall(name.lower())
+        if len(word) > 1 and not word.isdigit()
+    ))
+
+
+class _Node:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.entries: List[Tuple[str, str, int]] = []
+        self.top: Tuple[Tuple[str, str, int], ...] = ()
+
+
+def _rank(entry: Tuple[str, str, int]) -> tuple:
+    text, kind, count = entry
+    return -count, len(text), text, kind
+
+
+class CompletionTrie:
+    """Popularity-ordered completions for one catalog version"""
+
+    def __init__(self, terms: Iterable[Tuple[str, str, str, int]], top_k: int = TOP_K):
+        """`terms` yields (key, text, kind, popularity); `key` is the normalised form of `text`"""
+        self.top_k = top_k
+        self.root = _Node()
+        for key, text, kind, count in terms:
+            node = self.root
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+            node.entries.append((text, kind, count))
+        self._rank_completions()
+
+    def _rank_completions(self) -> None:
+        # Post-order without recursion: children are ranked before their parent
+        order = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children.values())
+
+        for node in reversed(order):
+            candidates = list(node.entries)
+            for child in node.children.values():
+                candidates.extend(child.top)
+            node.top = tuple(sorted(candidates, key=_rank)[:self.top_k])
+            node.entries = []
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, int]]:
+        """Up to `limit` (text, kind, popularity) completions of `prefix`, most popular first"""
+        node = self.root
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return list(node.top[:limit])
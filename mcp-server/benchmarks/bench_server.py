@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot functions in server.py
+
+Generates synthetic Hebrew/English catalogs shaped like products.json,
+measures wall time and peak memory for each hot function, and compares
+the results against a stored baseline.
+
+Usage:
+  python benchmarks/bench_server.py                      # run and print
+  python benchmarks/bench_server.py --save-baseline      # add new cases to baseline.json
+  python benchmarks/bench_server.py --check              # fail on regression (advisory, see README)
+  python benchmarks/bench_server.py --sizes 100,1000000  # custom catalog sizes
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import server  # noqa: E402
+
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_TIME_THRESHOLD = 0.5
+DEFAULT_MEMORY_THRESHOLD = 0.25
+# Slowdowns smaller than this are timer noise, not regressions
+NOISE_FLOOR_SECONDS = 0.002
+# ... as are slowdowns within this many median absolute deviations of the runs
+NOISE_SPREADS = 4
+DEFAULT_RETRIES = 2
+STORE_NAME = server.DEFAULT_STORE
+
+# Building blocks for synthetic product names
+HEBREW_WORDS = [
+    "אורז", "בסמטי", "מלא", "אורגני", "קינואה", "עדשים", "כתומות", "ירוקות",
+    "חומוס", "שעועית", "לבנה", "בורגול", "כוסמת", "פתיתים", "ספגטי", "קמח",
+    "כוסמין", "שיבולת", "שועל", "גריסים", "פנה", "אטריות", "אפונה", "מש",
+]
+ENGLISH_WORDS = ["Royal", "Premium", "Basmati", "Quinoa", "Organic", "Bio", "Gold", "Classic"]
+CATEGORIES = ["דגנים", "קטניות", "פסטה, אטריות ופתיתים", "תערובות דגנים וקטניות", "קמחים"]
+SIZES = ["500 גרם", "400 גרם", "1 ק\"ג", "750 גרם", "250 גרם"]
+BRAND = "ניצת הדובדבן"
+
+SEARCH_TERM = "אורז"
+SEARCH_CATEGORY = "קטניות"
+SHOPPING_LIST = ["אורז", "עדשים", "קמח", "טחינה", "פסטה"]
+
+
+def generate_catalog(count: int, seed: int = 42) -> Dict:
+    """Generate a synthetic catalog with the same shape as products.json"""
+    rng = random.Random(seed)
+    products = []
+
+    for i in range(count):
+        words = rng.sample(HEBREW_WORDS, rng.randint(1, 3))
+        if rng.random() < 0.2:
+            words.append(rng.choice(ENGLISH_WORDS))
+        name = f"{' '.join(words)} {rng.choice(SIZES)} - {BRAND}"
+        products.append({
+            "name": name,
+            "price": f"{rng.randint(5, 80)}.{rng.choice(['0', '5', '9'])}",
+            "category": rng.choice(CATEGORIES),
+            "url": f"product-{i}-i{1000 + i}",
+            "image": f"/ProductsImages/thumbs/S{i:07d}_250_180.jpg",
+        })
+
+    return {
+        "scrapedAt": "2025-01-01T00:00:00.000Z",
+        "totalProducts": len(products),
+        "products": products,
+    }
+
+
+def write_store(root: Path, catalog: Dict) -> None:
+    """Write a synthetic catalog into a stores/<store>/data layout"""
+    data_dir = root / STORE_NAME / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    with open(data_dir / "products.json", "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False)
+
+
+def build_cases(size: int, loop: asyncio.AbstractEventLoop) -> Dict[str, Callable[[], object]]:
+    """Build the benchmark cases for one catalog size"""
+    ctx = SimpleNamespace(session_id="bench-session")
+    # Ids are store:product_key, and generate_catalog's urls end with the item id
+    cart_items = [f"{STORE_NAME}:i{1000 + i}" for i in range(min(size, 50))]
+
+    def transform_all():
+        products = server.load_store_products(STORE_NAME)
+        for product in products:
+            server.transform_product_to_mcp_format(product, STORE_NAME)
+
+    def catalog_build():
+        server._catalogs.clear()
+        snapshots_enabled = server.SNAPSHOT_ENABLED
+        server.SNAPSHOT_ENABLED = False
+        try:
+            server.get_store_catalog(STORE_NAME)
+        finally:
+            server.SNAPSHOT_ENABLED = snapshots_enabled
+
+    def catalog_snapshot():
+        server._catalogs.clear()
+        server.get_store_catalog(STORE_NAME)
+
+    def similarity_build():
+        server._derived_cache.clear()
+        server.similar_products(cart_items[1])
+
+    def price_stats_build():
+        server._derived_cache.clear()
+        server.category_price_stats()
+
+    def completions_build():
+        server._derived_cache.clear()
+        server.autocomplete_products("אור")
+
+    def cart_fill():
+        server.user_carts.pop(ctx.session_id, None)
+        for product_id in cart_items:
+            loop.run_until_complete(server.add_to_cart(ctx, product_id, 1))
+
+    def cart_batch():
+        server.user_carts.pop(ctx.session_id, None)
+        operations = [{"product_id": product_id, "quantity": 1} for product_id in cart_items]
+        loop.run_until_complete(server.update_cart(ctx, operations))
+
+    def cart_view():
+        loop.run_until_complete(server.view_cart(ctx))
+
+    def cart_view_cold():
+        server._cart_views.pop(ctx.session_id, None)
+        loop.run_until_complete(server.view_cart(ctx))
+
+    def cart_remove():
+        for product_id in cart_items:
+            loop.run_until_complete(server.remove_from_cart(ctx, product_id))
+        cart_fill()
+
+    return {
+        "load_store_products": lambda: server.load_store_products(STORE_NAME),
+        "transform_product_to_mcp_format": transform_all,
+        "get_store_catalog[build]": catalog_build,
+        "get_store_catalog[snapshot]": catalog_snapshot,
+        "search_products[empty]": lambda: server.search_products(search=""),
+        "search_products[term]": lambda: server.search_products(search=SEARCH_TERM),
+        "search_products[english]": lambda: server.search_products(search="basmati"),
+        "search_products[category]": lambda: server.search_products(search="", category=SEARCH_CATEGORY),
+        "search_products[max_price,sort]": lambda: server.search_products(search="", max_price=20, sort="price_asc"),
+        "search_shopping_list[x5]": lambda: server.search_shopping_list(SHOPPING_LIST),
+        "similar_products[build]": similarity_build,
+        "similar_products": lambda: server.similar_products(cart_items[1]),
+        "category_price_stats[build]": price_stats_build,
+        "category_price_stats": server.category_price_stats,
+        "autocomplete[build]": completions_build,
+        "autocomplete": lambda: server.autocomplete_products("אור"),
+        "add_to_cart[x50]": cart_fill,
+        "update_cart[x50]": cart_batch,
+        "view_cart": cart_view,
+        "view_cart[cold]": cart_view_cold,
+        "remove_from_cart[x50]": cart_remove,
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Measure wall time over `repeat` runs (best, median and spread) and peak traced memory of one run"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        "seconds": min(timings),
+        "median_seconds": median,
+        "spread_seconds": statistics.median(abs(t - median) for t in timings),
+        "peak_bytes": peak,
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int, only: Optional[Dict[int, Set[str]]] = None) -> Dict:
+    """Run every case (or only the cases listed per size) for every catalog size and return the results"""
+    results = {}
+    original_stores_dir = server.STORES_DIR
+    original_snapshot_dir = server.SNAPSHOT_DIR
+    original_history_enabled = server.PRICE_HISTORY_ENABLED
+    loop = asyncio.new_event_loop()
+
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                write_store(Path(tmp), generate_catalog(size))
+                server.STORES_DIR = Path(tmp)
+                server.SNAPSHOT_DIR = Path(tmp) / "snapshots"
+                # History appends run in a background thread and would skew the measurements
+                server.PRICE_HISTORY_ENABLED = False
+                server._catalogs.clear()
+
+                cases = build_cases(size, loop)
+                cases["add_to_cart[x50]"]()  # prime the cart for view/remove
+
+                size_results = {}
+                for name, func in cases.items():
+                    if only is not None and name not in only.get(size, ()):
+                        continue
+                    # Fewer repeats for very large catalogs keeps runs bounded
+                    runs = repeat if size <= 100000 else 1
+                    size_results[name] = measure(func, runs)
+                    print(
+                        f"  {size:>8} {name:<34} "
+                        f"{size_results[name]['median_seconds'] * 1000:10.3f} ms "
+                        f"{size_results[name]['peak_bytes'] / 1024:12.1f} KiB"
+                    )
+                results[str(size)] = size_results
+    finally:
+        server.STORES_DIR = original_stores_dir
+        server.SNAPSHOT_DIR = original_snapshot_dir
+        server.PRICE_HISTORY_ENABLED = original_history_enabled
+        server._catalogs.clear()
+        server.user_carts.pop("bench-session", None)
+        loop.close()
+
+    return results
+
+
+def compare(results: Dict, baseline: Dict, time_threshold: float,
+            memory_threshold: float) -> List[Tuple[str, str, str]]:
+    """Return the regressions of `results` relative to `baseline` as (size, case, message).
+
+    Times are compared by median. A slowdown counts only when it exceeds the
+    relative threshold, the absolute noise floor and NOISE_SPREADS times the
+    spread of either run, so a noisy case needs a larger margin.
+    """
+    regressions = []
+
+    for size, cases in results.items():
+        for name, current in cases.items():
+            previous = baseline.get(size, {}).get(name)
+            if not previous:
+                continue
+
+            base = previous.get("median_seconds", previous["seconds"])
+            spread = max(previous.get("spread_seconds", 0.0), current["spread_seconds"])
+            time_limit = base + max(base * time_threshold, NOISE_FLOOR_SECONDS, NOISE_SPREADS * spread)
+            if current["median_seconds"] > time_limit:
+                regressions.append((size, name, (
+                    f"{name} @ {size}: median {current['median_seconds'] * 1000:.3f} ms "
+                    f"> {time_limit * 1000:.3f} ms (baseline {base * 1000:.3f} ms)"
+                )))
+
+            memory_limit = previous["peak_bytes"] * (1 + memory_threshold)
+            if current["peak_bytes"] > memory_limit:
+                regressions.append((size, name, (
+                    f"{name} @ {size}: peak {current['peak_bytes']} B "
+                    f"> {int(memory_limit)} B (baseline {previous['peak_bytes']} B)"
+                )))
+
+    return regressions
+
+
+def merge_baseline(baseline: Dict, results: Dict, update_existing: bool = False) -> List[str]:
+    """Add the cases of `results` missing from `baseline` (in place) and return their names.
+
+    Existing entries are kept unless `update_existing` is set, so a slowdown
+    is never hidden by re-saving the baseline along with an unrelated change.
+    """
+    saved = []
+    for size, cases in results.items():
+        entries = baseline.setdefault(size, {})
+        for name, result in cases.items():
+            if name not in entries or update_existing:
+                entries[name] = result
+                saved.append(f"{name} @ {size}")
+    return saved
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark server.py hot functions")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated catalog sizes (e.g. 100,1000,1000000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Add cases missing from the baseline; existing entries are kept")
+    parser.add_argument("--update-existing", action="store_true",
+                        help="With --save-baseline, also overwrite existing entries")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when results regress")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help="Allowed relative slowdown before failing (0.5 = 50%%)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Re-measure regressed cases this many times; fail only if every attempt regresses")
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help="Allowed relative peak memory growth before failing")
+    parser.add_argument("--output", type=Path, help="Also write results JSON to this file")
+    args = parser.parse_args()
+
+    # Per-call INFO logging would dominate the measurements
+    logging.getLogger(server.__name__).setLevel(logging.WARNING)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"Running benchmarks for catalog sizes: {sizes}")
+    results = run_benchmarks(sizes, args.repeat)
+
+    document = {
+        "python": sys.version.split()[0],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        baseline = {}
+        if args.baseline.exists():
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+        saved = merge_baseline(baseline, results, args.update_existing)
+        args.baseline.write_text(json.dumps(dict(document, results=baseline), indent=2), encoding="utf-8")
+        print(f"\n✓ Saved {len(saved)} baseline entries to {args.baseline}")
+        for entry in saved:
+            print(f"  - {entry}")
+
+    if args.check:
+        if not args.baseline.exists():
+            print(f"\n❌ No baseline found at {args.baseline}; run with --save-baseline first")
+            return 1
+
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+        regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+        for attempt in range(1, args.retries + 1):
+            if not regressions:
+                break
+            # A one-off slow run (another process, a GC pause) should not fail the check
+            regressed: Dict[int, Set[str]] = {}
+            for size, name, _ in regressions:
+                regressed.setdefault(int(size), set()).add(name)
+            print(f"\nRe-measuring {sum(len(names) for names in regressed.values())} regressed case(s) "
+                  f"(attempt {attempt}/{args.retries})")
+            retried = run_benchmarks(sorted(regressed), args.repeat, regressed)
+            regressions = compare(retried, baseline, args.time_threshold, args.memory_threshold)
+
+        if regressions:
+            print("\n❌ Performance regressions detected:")
+            for _, _, line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\n✓ No regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
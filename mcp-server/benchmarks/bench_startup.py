@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Startup benchmarks for server.py
+
+Measures, in fresh interpreter processes:
+  import[server]   cumulative import time of server.py (python -X importtime)
+  import[local]    import time spent in this repo's own modules
+  bind             process start until the HTTP port accepts connections
+  ready            process start until GET /ready returns 200
+
+and compares the results against a stored baseline.
+
+Usage:
+  python benchmarks/bench_startup.py                   # run and print
+  python benchmarks/bench_startup.py --save-baseline   # store startup_baseline.json
+  python benchmarks/bench_startup.py --check           # fail on regression
+  python benchmarks/bench_startup.py --top 15          # also list the slowest imports
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BENCH_DIR = Path(__file__).parent
+SERVER_DIR = BENCH_DIR.parent
+BASELINE_FILE = BENCH_DIR / "startup_baseline.json"
+DEFAULT_TIME_THRESHOLD = 0.5
+# Process startup is noisier than the hot-function benchmarks
+NOISE_FLOOR_SECONDS = 0.05
+STARTUP_TIMEOUT = 60.0
+LOCAL_MODULES = {path.stem for path in SERVER_DIR.glob("*.py")}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every line of -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure_import(env: Dict[str, str]) -> Tuple[Dict[str, float], List[Tuple[str, int, int]]]:
+    """Import server in a fresh interpreter and return its import times"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    modules = parse_importtime(completed.stderr)
+    total = next(cumulative for name, _, cumulative in modules if name == "server")
+    local = sum(self_us for name, self_us, _ in modules if name.split(".")[0] in LOCAL_MODULES)
+    return {"import[server]": total / 1e6, "import[local]": local / 1e6}, modules
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_boot(env: Dict[str, str]) -> Dict[str, float]:
+    """Start the server and time how long until the port binds and /ready succeeds"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "server.py"], cwd=SERVER_DIR, env=dict(env, PORT=str(port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    results = {}
+    try:
+        while "ready" not in results:
+            if process.poll() is not None:
+                raise RuntimeError(f"server.py exited with code {process.returncode}")
+            if time.perf_counter() - started > STARTUP_TIMEOUT:
+                raise RuntimeError("server.py did not become ready in time")
+
+            if "bind" not in results:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    results["bind"] = time.perf_counter() - started
+                except OSError:
+                    time.sleep(0.005)
+                    continue
+
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1) as response:
+                    if response.status == 200:
+                        results["ready"] = time.perf_counter() - started
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.005)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return results
+
+
+def run_benchmarks(repeat: int, top: int) -> Dict[str, Dict[str, float]]:
+    """Best and median of every startup metric over `repeat` fresh processes"""
+    samples: Dict[str, List[float]] = {}
+    slowest = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            # Snapshots and history in a scratch dir; the first boot builds the snapshot
+            CATALOG_SNAPSHOT_DIR=str(Path(tmp) / "catalog"),
+            PRICE_HISTORY_DIR=str(Path(tmp) / "history"),
+            IMAGE_PROXY_BASE_URL="",
+            PYTHONDONTWRITEBYTECODE="",
+        )
+        for _ in range(repeat):
+            imports, modules = measure_import(env)
+            for name, seconds in list(imports.items()) + list(measure_boot(env).items()):
+                samples.setdefault(name, []).append(seconds)
+            slowest = modules
+
+    if top:
+        print("\nSlowest imports (self time):")
+        for name, self_us, cumulative_us in sorted(slowest, key=lambda m: -m[1])[:top]:
+            print(f"  {self_us / 1000:9.1f} ms {cumulative_us / 1000:9.1f} ms  {name}")
+        print()
+
+    results = {}
+    for name, values in samples.items():
+        values.sort()
+        results[name] = {"seconds": values[0], "median_seconds": values[len(values) // 2]}
+        print(f"  {name:<16} {values[0] * 1000:10.1f} ms  (median {results[name]['median_seconds'] * 1000:.1f} ms)")
+    return results
+
+
+def compare(results: Dict, baseline: Dict, time_threshold: float) -> List[str]:
+    """Return a list of regressions of `results` relative to `baseline`"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        limit = max(previous["seconds"] * (1 + time_threshold), previous["seconds"] + NOISE_FLOOR_SECONDS)
+        if current["seconds"] > limit:
+            regressions.append(
+                f"{name}: {current['seconds'] * 1000:.1f} ms > {limit * 1000:.1f} ms "
+                f"(baseline {previous['seconds'] * 1000:.1f} ms)"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark server.py import and startup time")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh processes per metric")
+    parser.add_argument("--top", type=int, default=0, help="List the N slowest imports")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when results regress")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help="Allowed relative slowdown before failing (0.5 = 50%%)")
+    parser.add_argument("--output", type=Path, help="Also write results JSON to this file")
+    args = parser.parse_args()
+
+    print(f"Measuring server startup over {args.repeat} processes")
+    results = run_benchmarks(args.repeat, args.top)
+
+    document = {
+        "python": sys.version.split()[0],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2), encoding="utf-8")
+        print(f"\n✓ Baseline saved to {args.baseline}")
+
+    if args.check:
+        if not args.baseline.exists():
+            print(f"\n❌ No baseline found at {args.baseline}; run with --save-baseline first")
+            return 1
+
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline.get("results", {}), args.time_threshold)
+        if regressions:
+            print("\n❌ Startup regressions detected:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\n✓ No regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
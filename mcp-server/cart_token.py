@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Signed cart tokens
+Encodes a cart as a compact, HMAC-signed token that clients send back with
+each call, so any server replica can rebuild the cart without shared storage.
+
+Token format: "1.<payload>.<signature>", both parts base64url without padding.
+The payload is zlib-compressed JSON holding only stable product keys and
+quantities grouped by store, the cart revision and the issue time. The
+revision lets a replica tell whether its own copy of the cart is newer than
+the client's token. The signature also covers the session id, so a token is
+only accepted for the session it was issued to.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+TOKEN_VERSION = "1"
+SIGNATURE_BYTES = 16
+# Tokens larger than this are rejected before any decoding work
+MAX_TOKEN_LENGTH = 16384
+
+# (store, product key, quantity)
+CartEntry = Tuple[str, str, int]
+
+
+class InvalidCartToken(ValueError):
+    """The token is malformed, tampered with, issued to another session or expired"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(secret: bytes, session_id: str, payload: str) -> str:
+    message = f"{TOKEN_VERSION}.{session_id}.{payload}".encode("utf-8")
+    return _b64encode(hmac.new(secret, message, hashlib.sha256).digest()[:SIGNATURE_BYTES])
+
+
+def encode_cart(entries: List[CartEntry], revision: int, secret: bytes, session_id: str,
+                now: Optional[float] = None) -> str:
+    """Encode cart entries and their revision into a signed token"""
+    stores = {}
+    for store, key, quantity in entries:
+        stores.setdefault(store, []).append([key, quantity])
+
+    issued = int(time.time() if now is None else now)
+    raw = json.dumps({"t": issued, "r": revision, "c": stores}, ensure_ascii=False, separators=(",", ":"))
+    payload = _b64encode(zlib.compress(raw.encode("utf-8"), 9))
+    return f"{TOKEN_VERSION}.{payload}.{_sign(secret, session_id, payload)}"
+
+
+def decode_cart(token: str, secret: bytes, session_id: str, max_age: Optional[float] = None,
+                now: Optional[float] = None) -> Tuple[int, List[CartEntry]]:
+    """Verify a token and return (revision, cart entries); raises InvalidCartToken"""
+    if not isinstance(token, str) or len(token) > MAX_TOKEN_LENGTH:
+        raise InvalidCartToken("token missing or too large")
+
+    parts = token.split(".")
+    if len(parts) != 3 or parts[0] != TOKEN_VERSION:
+        raise InvalidCartToken("unknown token format")
+
+    _, payload, signature = parts
+    if not hmac.compare_digest(signature, _sign(secret, session_id, payload)):
+        raise InvalidCartToken("bad signature")
+
+    try:
+        data = json.loads(zlib.decompress(_b64decode(payload)))
+        issued = int(data["t"])
+        revision = int(data["r"])
+        entries = [
+            (store, str(key), int(quantity))
+            for store, items in data["c"].items()
+            for key, quantity in items
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError, zlib.error) as e:
+        raise InvalidCartToken(f"unreadable payload: {e}")
+
+    if max_age is not None and (time.time() if now is None else now) - issued > max_age:
+        raise InvalidCartToken("token expired")
+
+    return revision, [entry for entry in entries if entry[2] > 0]
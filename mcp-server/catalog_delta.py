@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Catalog delta format shared by the server and the fetcher
+A scrape writes products.delta.json next to products.json, listing the
+products added, changed and removed since the previous scrape, keyed by
+product_key(). The JS scraper keeps its own copy in catalog-delta.js;
+testdata/product_keys.json pins both to the same keys.
+"""
+
+import re
+from typing import Dict
+
+# Incremental catalog updates written next to products.json
+DELTA_FILENAME = "products.delta.json"
+
+_item_id = re.compile(r"-(i\d+)/?$")
+
+
+def product_key(product: Dict) -> str:
+    """Stable key for a product across scrapes.
+
+    Store URLs end with the item id (e.g. '...-i281'); falls back to the
+    URL, then the name.
+    """
+    url = product.get("url") or ""
+    match = _item_id.search(url)
+    if match:
+        return match.group(1)
+    return url or product.get("name") or ""
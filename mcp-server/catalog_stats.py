@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Grouped catalog statistics
+Count, min, max, median and mean of a value per group (e.g. price per
+category), computed for all groups at once with NumPy: one sort by
+(group, value) plus bincount, instead of a Python loop per group.
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+def grouped_stats(groups: Sequence[str], values: Sequence[Optional[float]]) -> Dict[str, Dict[str, float]]:
+    """Statistics of `values` per group; None values are ignored, empty groups are omitted"""
+    values = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    names, codes = np.unique(np.asarray(groups, dtype=object).astype(str), return_inverse=True)
+
+    valid = ~np.isnan(values)
+    values, codes = values[valid], codes[valid]
+    if not len(values):
+        return {}
+
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=len(names))
+    sums = np.bincount(codes, weights=values, minlength=len(names))
+
+    present = np.nonzero(counts)[0]
+    counts = counts[present]
+    starts = np.cumsum(counts) - counts
+    lower = sorted_values[starts + (counts - 1) // 2]
+    upper = sorted_values[starts + counts // 2]
+
+    return {
+        str(names[group]): {
+            "count": int(count),
+            "min": float(sorted_values[start]),
+            "max": float(sorted_values[start + count - 1]),
+            "median": float((low + high) / 2),
+            "mean": float(total / count),
+        }
+        for group, count, start, low, high, total in zip(
+            present, counts, starts, lower, upper, sums[present]
+        )
+    }
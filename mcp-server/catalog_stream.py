@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Streaming catalog reader
+Yields the records of the "products" array of a products.json one at a
+time, reading the file in chunks, so neither the file nor a parse tree of
+the whole catalog is ever held in memory. The complete records in each
+chunk are decoded together with json's C decoder; when that fails they are
+decoded one by one, so a malformed record is skipped on its own instead of
+failing the whole file. Other top-level fields (scrapedAt, totalProducts,
+...) are collected in `meta`.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, TextIO, Union
+
+CHUNK_SIZE = 1 << 15
+# A value still incomplete after this many characters is treated as malformed
+# rather than buffering the rest of the file looking for its end
+MAX_VALUE_SIZE = 1 << 20
+ARRAY_KEY = "products"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that matter for finding where a value ends
+_STRUCTURE = re.compile(r'["\[\]{},]')
+_STRING_REST = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+# A record is followed by ',' or the end of the array
+_RECORD_END = re.compile(r"[ \t\n\r]*[,\]]")
+# Where reading can resume after a malformed record: the next record or the array end
+_RESUME = re.compile(r',[ \t\n\r]*\{|\][ \t\n\r]*(?:\}|,[ \t\n\r]*"[^"\\]*"[ \t\n\r]*:)')
+
+
+class CatalogFormatError(ValueError):
+    """The file is not a JSON object (records inside it may still be malformed)"""
+
+
+def _value_end(buffer: str, pos: int) -> Optional[int]:
+    """End of the JSON value starting at `pos`, or None if the buffer ends first.
+
+    Only brackets and strings are tracked, which is enough to find the
+    extent of a value that does not decode. A value at depth 0 ends at the
+    next ',' or at the ']' closing the enclosing array.
+    """
+    depth = 0
+    i = pos
+    while True:
+        match = _STRUCTURE.search(buffer, i)
+        if match is None:
+            return None
+        char, i = match.group(), match.end()
+        if char == '"':
+            rest = _STRING_REST.match(buffer, i)
+            if rest is None:
+                return None
+            i = rest.end()
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            if depth == 0:
+                return match.start()
+            depth -= 1
+            if depth == 0:
+                return i
+        elif depth == 0:
+            return match.start()
+
+
+class CatalogStream:
+    """Iterate the product records of a products.json file (a path or an open text file)"""
+
+    def __init__(self, source: Union[Path, str, TextIO], chunk_size: int = CHUNK_SIZE):
+        self.source = source
+        self.path = str(getattr(source, "name", source))
+        self.chunk_size = chunk_size
+        self.meta: Dict[str, Any] = {}
+        # Records that did not decode
+        self.skipped = 0
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self) -> Iterator[Any]:
+        if isinstance(self.source, (str, Path)):
+            with open(self.source, "r", encoding="utf-8") as f:
+                yield from self._read(f)
+        else:
+            yield from self._read(self.source)
+
+    def _read(self, f: TextIO) -> Iterator[Any]:
+        self._file = f
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        # Records before this buffer position are decoded one by one
+        self._batch_failed = -1
+        yield from self._object()
+
+    # Buffer handling
+
+    def _fill(self) -> bool:
+        """Read another chunk, dropping what was consumed; False at end of file"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._batch_failed -= self._pos
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise CatalogFormatError(f"Expected '{char}' in {self.path}")
+        self._pos += 1
+
+    def _decode(self) -> Any:
+        """Decode the next complete value, reading more of the file as needed"""
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                end = _value_end(self._buffer, self._pos)
+                if end is None and len(self._buffer) - self._pos < MAX_VALUE_SIZE and self._fill():
+                    continue
+                raise
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue  # A number may continue in the next chunk
+            self._pos = end
+            return value
+
+    def _skip_value(self) -> None:
+        """Move past a record that does not decode.
+
+        The quotes and brackets of a malformed record cannot be trusted (it
+        may be cut off mid-string), so it is taken to end before the next
+        record that decodes, or where the array ends.
+        """
+        search = self._pos + 1
+        while True:
+            match = _RESUME.search(self._buffer, search)
+            if match is not None:
+                if match.group().startswith("]"):
+                    self._pos = match.start()
+                    return
+                start = match.end() - 1
+                end = _value_end(self._buffer, start)
+                complete = end is not None and _WHITESPACE.match(self._buffer, end).end() < len(self._buffer)
+                if complete or self._eof or len(self._buffer) - start > MAX_VALUE_SIZE:
+                    if complete and _RECORD_END.match(self._buffer, end):
+                        try:
+                            self._decoder.decode(self._buffer[start:end])
+                            self._pos = match.start()
+                            return
+                        except json.JSONDecodeError:
+                            pass
+                    search = match.end()
+                    continue
+                search = match.start()
+
+            # Read on, keeping the malformed record and the search position
+            offset = search - self._pos
+            if self._fill():
+                search = self._pos + offset
+            elif match is None:
+                self._pos = len(self._buffer)
+                return
+
+    # Grammar
+
+    def _object(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            self._peek()
+            key = self._decode()
+            self._expect(":")
+            if key == ARRAY_KEY and self._peek() == "[":
+                self._pos += 1
+                yield from self._records()
+            else:
+                self._peek()
+                self.meta[key] = self._decode()
+
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise CatalogFormatError(f"Expected ',' or '}}' in {self.path}")
+
+    def _batch(self) -> Optional[list]:
+        """Decode every complete record in the buffer with one call, or None.
+
+        The buffer is cut after its last '}' and decoded as an array. A cut
+        inside a string or a nested value cannot decode, so success means the
+        cut fell between records. Decoding records together also lets them
+        share key strings, as they would in a json.load of the whole file.
+        """
+        if self._pos < self._batch_failed:
+            return None
+        cut = self._buffer.rfind("}", self._pos) + 1
+        if not cut:
+            return None
+        # In the last chunk that '}' closes the whole file; the records end
+        # before the ']' closing the array
+        array_end = self._buffer.rfind("]", self._pos, cut)
+        cuts = [cut] if array_end < 0 else [self._buffer.rfind("}", self._pos, array_end) + 1, cut]
+        for candidate in cuts:
+            if candidate <= self._pos:
+                continue
+            try:
+                records = self._decoder.decode("[" + self._buffer[self._pos:candidate] + "]")
+            except json.JSONDecodeError:
+                continue
+            self._pos = candidate
+            return records
+        self._batch_failed = cut
+        return None
+
+    def _records(self) -> Iterator[Any]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            if self._peek() == "":
+                raise CatalogFormatError(f"Unterminated '{ARRAY_KEY}' array in {self.path}")
+            records = self._batch()
+            if records is not None:
+                yield from records
+            else:
+                try:
+                    yield self._decode()
+                except json.JSONDecodeError:
+                    self.skipped += 1
+                    self._skip_value()
+
+            char = self._peek()
+            if char == "]":
+                self._pos += 1
+                return
+            if char == ",":
+                self._pos += 1
+            elif char == "":
+                raise CatalogFormatError(f"Unterminated '{ARRAY_KEY}' array in {self.path}")
+            else:
+                # Trailing garbage after a record belongs to a malformed record
+                self.skipped += 1
+                self._skip_value()
+                char = self._peek()
+                if char == "]":
+                    self._pos += 1
+                    return
+                if char == ",":
+                    self._pos += 1
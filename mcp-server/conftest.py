@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures
+Every test gets its own catalog snapshot and price history dirs, so
+loading the real store never writes into mcp-server/.cache.
+"""
+
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, monkeypatch):
+    """Point the server's on-disk caches at a per-test temp dir"""
+    monkeypatch.setattr(server, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    monkeypatch.setattr(server, "PRICE_HISTORY_DIR", tmp_path / "history")
+    return tmp_path
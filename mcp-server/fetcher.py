@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Browserless catalog fetcher
+Fetches the store's category listing pages over a pooled async HTTP client and
+parses them into the products.json schema written by scraper.js, without
+launching a browser.
+
+- Bounded concurrency over one keep-alive connection pool
+- Polite per-host rate limiting
+- Conditional requests (ETag / Last-Modified); unchanged pages are answered
+  with 304 and their previously parsed products are reused
+
+Refresh a store's catalog (and write products.delta.json for the server):
+  python fetcher.py --output ../stores/nitzat-haduvdevan/data
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from catalog_delta import DELTA_FILENAME, product_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://www.nizat.com"
+DEFAULT_OUTPUT_DIR = Path(__file__).parent.parent / "stores" / "nitzat-haduvdevan" / "data"
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".cache" / "fetcher" / "pages.json"
+OUTPUT_FILENAME = "products.json"
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Category selection, same keywords as scraper.js (snacks and dry goods only)
+EXCLUDE_KEYWORDS = ["פירות", "ירקות", "ירוקים", "נבטים", "ירקניה", "אגוז", "זרעים", "גרעינים"]
+INCLUDE_KEYWORDS = [
+    "חטיפ", "דגנים", "קטניות", "פסטה", "לחמים", "מאפים", "ממרח", "שימור", "בוקר", "שוקולד", "חומרי",
+    "אפייה", "בישול", "תבלינים", "קמח", "שמן", "סוכר", "מלח", "קקאו", "קוקוס", "רטב",
+]
+PLACEHOLDER_IMAGES = ["Q659875_80_40.png", "productsimages/mfrimages/thumbs/Q659875_80_40.png"]
+
+PRODUCT_ROW_ID = "rptproducts_tr"
+PRODUCT_IMAGE_ID = "ContentPlaceHolder1_products_rptproducts_imgProductPic"
+IMAGE_ATTRIBUTES = ["src", "data-src", "data-lazy-src", "data-original", "data-srcset", "data-lazy", "srcset"]
+VOID_TAGS = {"img", "br", "hr", "input", "meta", "link", "source", "wbr"}
+
+_price_number = re.compile(r"[\d,.]+")
+_style_url = re.compile(r"""url\(['"]?([^'")\s]+)['"]?\)""")
+
+
+class LinkParser(HTMLParser):
+    """Collects (text, href) for every link on a page"""
+
+    def __init__(self):
+        super().__init__()
+        self.links: List[Tuple[str, str]] = []
+        self._href: Optional[str] = None
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._href = dict(attrs).get("href")
+            self._text = []
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append((" ".join("".join(self._text).split()), self._href))
+            self._href = None
+
+
+class ProductRowParser(HTMLParser):
+    """Extracts name, price, url and image from the store's product repeater rows"""
+
+    def __init__(self, category: str):
+        super().__init__()
+        self.category = category
+        self.products: List[Dict] = []
+        self._row: Optional[Dict] = None
+        self._row_depth = 0
+        self._links: List[Tuple[str, str]] = []
+        self._link_href: Optional[str] = None
+        self._link_text: List[str] = []
+        self._price_tag: Optional[str] = None
+        self._price_depth = 0
+        self._price_text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "tr":
+            if PRODUCT_ROW_ID in (attrs.get("id") or ""):
+                self._finish_row()
+                self._row = {"price": None, "image": None}
+                self._row_depth = 1
+                self._links = []
+                return
+            if self._row is not None:
+                self._row_depth += 1
+
+        if self._row is None:
+            return
+
+        if tag == "img" and (attrs.get("id") or "").startswith(PRODUCT_IMAGE_ID) and not self._row["image"]:
+            self._row["image"] = image_source(attrs)
+        elif tag == "a":
+            self._link_href = attrs.get("href")
+            self._link_text = []
+
+        if self._price_tag is None and self._row["price"] is None and tag not in VOID_TAGS:
+            marker = f"{attrs.get('class') or ''} {attrs.get('id') or ''}".lower()
+            if "price" in marker:
+                self._price_tag, self._price_depth, self._price_text = tag, 1, []
+        elif tag == self._price_tag:
+            self._price_depth += 1
+
+    def handle_data(self, data):
+        if self._link_href is not None:
+            self._link_text.append(data)
+        if self._price_tag is not None:
+            self._price_text.append(data)
+
+    def handle_endtag(self, tag):
+        if self._row is None:
+            return
+
+        if tag == "a" and self._link_href is not None:
+            self._links.append((" ".join("".join(self._link_text).split()), self._link_href))
+            self._link_href = None
+
+        if tag == self._price_tag:
+            self._price_depth -= 1
+            if self._price_depth == 0:
+                match = _price_number.search("".join(self._price_text))
+                self._row["price"] = match.group(0) if match else None
+                self._price_tag = None
+
+        if tag == "tr":
+            self._row_depth -= 1
+            if self._row_depth == 0:
+                self._finish_row()
+
+    def close(self):
+        super().close()
+        self._finish_row()
+
+    def _finish_row(self) -> None:
+        if self._row is None:
+            return
+        row, self._row = self._row, None
+
+        # Prefer the product link (store item urls end with the id, e.g. '-i8085')
+        name = url = None
+        for text, href in self._links:
+            if href and "-i" in href and 3 < len(text) < 200:
+                name, url = text, href
+                break
+        if name is None:
+            for text, href in self._links:
+                if 10 < len(text) < 200:
+                    name, url = text, href
+                    break
+
+        if name and row["image"]:
+            self.products.append({
+                "name": name,
+                "price": row["price"],
+                "category": self.category,
+                "url": url,
+                "image": row["image"],
+            })
+
+
+def image_source(attrs: Dict[str, Optional[str]]) -> Optional[str]:
+    """Image URL of an <img>, including lazy-loading attributes and inline styles"""
+    for name in IMAGE_ATTRIBUTES:
+        value = (attrs.get(name) or "").strip()
+        if value:
+            return value
+    match = _style_url.search(attrs.get("style") or "")
+    return match.group(1) if match else None
+
+
+def parse_category_links(html: str) -> List[Dict[str, str]]:
+    """Candidate category links (name, url) from the home page, deduplicated"""
+    parser = LinkParser()
+    parser.feed(html)
+    parser.close()
+
+    categories = []
+    seen_urls, seen_names = set(), set()
+    for text, href in parser.links:
+        if not href or not text or not 2 < len(text) < 100 or href.startswith(("#", "javascript:")):
+            continue
+        if href in seen_urls or text in seen_names:
+            continue
+        seen_urls.add(href)
+        seen_names.add(text)
+        categories.append({"name": text, "url": href})
+    return categories
+
+
+def filter_categories(categories: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Keep snack and dry goods categories, as scraper.js does"""
+    selected = []
+    for category in categories:
+        name = category["name"].lower()
+        if any(keyword in name for keyword in EXCLUDE_KEYWORDS):
+            continue
+        if any(keyword in name for keyword in INCLUDE_KEYWORDS):
+            selected.append(category)
+    return selected
+
+
+def parse_products(html: str, category: str) -> List[Dict]:
+    """Products on a category page, deduplicated by name"""
+    parser = ProductRowParser(category)
+    parser.feed(html)
+    parser.close()
+
+    unique, seen = [], set()
+    for product in parser.products:
+        if product["name"] not in seen:
+            seen.add(product["name"])
+            unique.append(product)
+    return unique
+
+
+def is_complete(product: Dict) -> bool:
+    """Only products with a real image and a price are kept"""
+    image = (product.get("image") or "").strip()
+    price = (product.get("price") or "").strip()
+    return bool(image and price) and not any(placeholder in image for placeholder in PLACEHOLDER_IMAGES)
+
+
+def absolute_url(base_url: str, url: str) -> str:
+    if url.startswith("http"):
+        return url
+    if url.startswith("/"):
+        return f"{base_url}{url}"
+    return f"{base_url}/{url}"
+
+
+class HostRateLimiter:
+    """Spaces requests to each host at least 1/rate seconds apart"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, host: str) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class CatalogFetcher:
+    """Fetches and parses the store catalog; use as an async context manager.
+
+    `cache` maps page URLs to their validators and parsed result, so it can
+    be persisted between runs (see load_page_cache / save_page_cache).
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, concurrency: int = 8, rate: float = 4.0,
+                 cache: Optional[Dict[str, Dict]] = None, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.cache = cache if cache is not None else {}
+        self.timeout = timeout
+        self.requests = 0
+        self.not_modified = 0
+        self._rate_limiter = HostRateLimiter(rate)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "CatalogFetcher":
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self._client = httpx.AsyncClient(
+            limits=limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "he"}
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+        self._client = None
+
+    async def fetch_page(self, url: str, parse: Callable[[str], Any]) -> Optional[Any]:
+        """GET a page and return parse(html); an unchanged page (304) reuses the cached parse"""
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with self._semaphore:
+            await self._rate_limiter.wait(urlsplit(url).netloc)
+            self.requests += 1
+            try:
+                response = await self._client.get(url, headers=headers)
+            except httpx.HTTPError as e:
+                logger.warning(f"Fetch failed for {url}: {e}")
+                return None
+
+        if response.status_code == 304 and cached:
+            self.not_modified += 1
+            return cached["data"]
+
+        if response.status_code != 200:
+            logger.warning(f"{url} returned {response.status_code}")
+            return None
+
+        data = parse(response.text)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.cache[url] = {"etag": etag, "last_modified": last_modified, "data": data}
+        else:
+            self.cache.pop(url, None)
+        return data
+
+    async def fetch_catalog(self, max_categories: Optional[int] = None, max_products: Optional[int] = None) -> Dict:
+        """Fetch every selected category concurrently and build the products.json document"""
+        categories = await self.fetch_page(self.base_url, parse_category_links)
+        if categories is None:
+            raise RuntimeError(f"Store home page unavailable: {self.base_url}")
+
+        categories = filter_categories(categories)[:max_categories]
+        logger.info(f"Fetching {len(categories)} categories")
+
+        pages = await asyncio.gather(*(
+            self.fetch_page(
+                absolute_url(self.base_url, category["url"]),
+                lambda html, name=category["name"]: parse_products(html, name)
+            )
+            for category in categories
+        ))
+
+        # Same selection as scraper.js: complete products, each image used once, in category order
+        products = []
+        used_images = set()
+        for category, page_products in zip(categories, pages):
+            for product in page_products or []:
+                if max_products is not None and len(products) >= max_products:
+                    break
+                if is_complete(product) and product["image"] not in used_images:
+                    used_images.add(product["image"])
+                    products.append(product)
+
+        return {
+            "scrapedAt": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "totalProducts": len(products),
+            "products": products,
+        }
+
+
+def build_catalog_delta(previous: Dict, current: Dict) -> Dict:
+    """Added/changed/removed products between two catalogs, like buildCatalogDelta in scraper.js"""
+    previous_by_key = {product_key(product): product for product in previous["products"]}
+    current_keys = set()
+    added, changed = [], []
+
+    for product in current["products"]:
+        key = product_key(product)
+        current_keys.add(key)
+        before = previous_by_key.get(key)
+        if before is None:
+            added.append(product)
+        elif before != product:
+            changed.append(product)
+
+    return {
+        "baseScrapedAt": previous.get("scrapedAt"),
+        "scrapedAt": current["scrapedAt"],
+        "added": added,
+        "changed": changed,
+        "removed": [key for key in previous_by_key if key not in current_keys],
+    }
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def write_catalog(output: Dict, data_dir: Path) -> Path:
+    """Write products.json, plus a delta against the previous products.json when one exists"""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    output_path = data_dir / OUTPUT_FILENAME
+    delta_path = data_dir / DELTA_FILENAME
+    text = json.dumps(output, ensure_ascii=False, indent=2)
+
+    previous = None
+    if output_path.exists():
+        try:
+            previous = json.loads(output_path.read_text(encoding="utf-8"))
+        except ValueError:
+            logger.warning("Previous products.json is unreadable, skipping delta")
+
+    if previous and isinstance(previous.get("products"), list):
+        delta = build_catalog_delta(previous, output)
+        # The hash tells the server which products.json this delta produces
+        delta["sha256"] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        # Written before products.json so the delta is in place when the new file is noticed
+        _write_atomic(delta_path, json.dumps(delta, ensure_ascii=False, indent=2))
+        logger.info(f"Delta: {len(delta['added'])} added, {len(delta['changed'])} changed, {len(delta['removed'])} removed")
+    elif delta_path.exists():
+        delta_path.unlink()
+
+    _write_atomic(output_path, text)
+    return output_path
+
+
+def load_page_cache(path: Path) -> Dict[str, Dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_page_cache(path: Path, cache: Dict[str, Dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, json.dumps(cache, ensure_ascii=False))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fetch the store catalog without a browser")
+    parser.add_argument("--base-url", default=os.getenv("STORE_BASE_URL", DEFAULT_BASE_URL))
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT_DIR, help="Directory to write products.json to")
+    parser.add_argument("--cache", type=Path, default=DEFAULT_CACHE_PATH, help="Conditional request cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the request cache")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0, help="Requests per second per host")
+    parser.add_argument("--max-categories", type=int, default=20)
+    parser.add_argument("--max-products", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    cache = {} if args.no_cache else load_page_cache(args.cache)
+
+    async def run() -> Tuple[Dict, CatalogFetcher]:
+        async with CatalogFetcher(args.base_url, args.concurrency, args.rate, cache) as fetcher:
+            output = await fetcher.fetch_catalog(args.max_categories, args.max_products)
+        return output, fetcher
+
+    started = time.perf_counter()
+    output, fetcher = asyncio.run(run())
+    elapsed = time.perf_counter() - started
+
+    if not args.no_cache:
+        save_page_cache(args.cache, cache)
+
+    output_path = write_catalog(output, args.output)
+    print(f"✓ {output['totalProducts']} products in {elapsed:.1f}s "
+          f"({fetcher.requests} requests, {fetcher.not_modified} not modified) → {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Product image proxy cache
+Fetches store images from the origin once and keeps them in a size-bounded
+on-disk LRU cache, so widgets load images from the MCP server instead of
+fanning out to the store website.
+
+Pre-warm the cache for a store after a scrape:
+  python image_cache.py --prewarm ../stores/nitzat-haduvdevan/data/products.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+import httpx
+
+from singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ORIGIN = "https://www.nizat.com"
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".cache" / "images"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Only product images are proxied; anything else would make this an open proxy
+ALLOWED_PREFIXES = ("ProductsImages/", "productsimages/")
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def normalize_image_path(path: str) -> Optional[str]:
+    """Return the origin-relative image path, or None if it may not be proxied"""
+    path = (path or "").lstrip("/")
+    if not path.startswith(ALLOWED_PREFIXES) or ".." in path.split("/"):
+        return None
+    return path
+
+
+def content_type_for(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+class ImageCache:
+    """Size-bounded on-disk LRU cache of image bytes keyed by origin path.
+
+    Recency is kept in memory and mirrored to file mtimes, so the LRU order
+    survives restarts. Safe to share between threads.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        if not self.cache_dir.exists():
+            return
+        files = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.is_file() and not entry.name.endswith(".tmp")),
+            key=lambda entry: entry.stat().st_mtime_ns
+        )
+        for entry in files:
+            size = entry.stat().st_size
+            self._entries[entry.name] = size
+            self.total_bytes += size
+
+    def _file_name(self, path: str) -> str:
+        suffix = Path(path).suffix.lower()
+        return hashlib.sha256(path.encode("utf-8")).hexdigest() + suffix
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        return self._file_name(path) in self._entries
+
+    def get(self, path: str) -> Optional[bytes]:
+        """Return cached bytes for `path` and mark it most recently used"""
+        name = self._file_name(path)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+
+        file_path = self.cache_dir / name
+        try:
+            data = file_path.read_bytes()
+            os.utime(file_path)
+        except OSError:
+            with self._lock:
+                size = self._entries.pop(name, 0)
+                self.total_bytes -= size
+            return None
+        return data
+
+    def put(self, path: str, data: bytes) -> None:
+        """Store bytes for `path`, evicting least recently used images over the size bound"""
+        if len(data) > self.max_bytes:
+            return
+
+        name = self._file_name(path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_dir / f"{name}.{threading.get_ident()}.tmp"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, self.cache_dir / name)
+
+        with self._lock:
+            self.total_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            while self.total_bytes > self.max_bytes and self._entries:
+                evicted, size = self._entries.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    (self.cache_dir / evicted).unlink()
+                except OSError:
+                    pass
+
+
+async def fetch_image(cache: ImageCache, client: httpx.AsyncClient, origin: str, path: str,
+                      flights: Optional[AsyncSingleFlight] = None) -> Optional[bytes]:
+    """Return image bytes from the cache, fetching and caching them from the origin on a miss.
+
+    Disk reads, writes and evictions run in a worker thread so they do not
+    block the event loop. With `flights`, concurrent misses for the same
+    path share one origin fetch.
+    """
+    data = await asyncio.to_thread(cache.get, path)
+    if data is not None:
+        return data
+    if flights is None:
+        return await _fetch_from_origin(cache, client, origin, path)
+    return await flights.do(path, lambda: _fetch_from_origin(cache, client, origin, path))
+
+
+async def _fetch_from_origin(cache: ImageCache, client: httpx.AsyncClient, origin: str, path: str) -> Optional[bytes]:
+    try:
+        response = await client.get(f"{origin.rstrip('/')}/{path}")
+    except httpx.HTTPError as e:
+        logger.warning(f"Image fetch failed for {path}: {e}")
+        return None
+
+    if response.status_code != 200:
+        logger.warning(f"Image origin returned {response.status_code} for {path}")
+        return None
+
+    await asyncio.to_thread(cache.put, path, response.content)
+    return response.content
+
+
+async def prewarm(cache: ImageCache, origin: str, paths: Iterable[str], concurrency: int = 8) -> int:
+    """Fetch every not-yet-cached image in `paths`; returns the number fetched"""
+    pending = {}
+    for raw_path in paths:
+        path = normalize_image_path(raw_path)
+        if path and path not in cache:
+            pending[path] = True
+
+    if not pending:
+        return 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        async def fetch_one(path: str) -> bool:
+            async with semaphore:
+                return await fetch_image(cache, client, origin, path) is not None
+
+        results = await asyncio.gather(*(fetch_one(path) for path in pending))
+
+    fetched = sum(results)
+    logger.info(f"Pre-warmed image cache: {fetched}/{len(pending)} images fetched")
+    return fetched
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pre-warm the product image cache")
+    parser.add_argument("--prewarm", type=Path, required=True, help="products.json to read image paths from")
+    parser.add_argument("--origin", default=os.getenv("IMAGE_ORIGIN", DEFAULT_ORIGIN))
+    parser.add_argument("--cache-dir", type=Path, default=Path(os.getenv("IMAGE_CACHE_DIR", str(DEFAULT_CACHE_DIR))))
+    parser.add_argument("--max-bytes", type=int, default=int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))))
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.prewarm, "r", encoding="utf-8") as f:
+        products = json.load(f).get("products", [])
+
+    cache = ImageCache(args.cache_dir, args.max_bytes)
+    paths = [product.get("image", "") for product in products]
+    fetched = asyncio.run(prewarm(cache, args.origin, paths, args.concurrency))
+    print(f"✓ {fetched} images fetched, cache holds {len(cache)} images ({cache.total_bytes} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Price history across scrapes
+Every ingested catalog is appended to a small columnar store:
+
+    index.json   product keys (column order) and one entry per scrape
+    product.u4   product column: index into the keys
+    delta.i4     price change in agorot since that product's previous record
+
+A scrape only appends records for products whose price changed (a new
+product's first record is its full price), so the columns grow with the
+number of price changes rather than catalog size times scrapes. Both
+columns are memory-mapped and queries slice them by scrape, reading only
+the records they need. index.json is replaced atomically after the columns
+are written; bytes past its record count (an interrupted append) are ignored
+and overwritten by the next append.
+"""
+
+import bisect
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+INDEX_FILENAME = "index.json"
+PRODUCT_COLUMN = ("product.u4", np.uint32)
+DELTA_COLUMN = ("delta.i4", np.int32)
+
+
+def to_agorot(price: Optional[float]) -> Optional[int]:
+    return None if price is None else int(round(price * 100))
+
+
+class PriceHistory:
+    """Append-only price history of one store"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._columns: Optional[tuple] = None  # (record count, products, deltas)
+        self.keys: List[str] = []
+        # One entry per scrape: {"scrapedAt", "records" (cumulative), "products" (keys known)}
+        self.scrapes: List[Dict] = []
+
+        index_path = self.directory / INDEX_FILENAME
+        if index_path.exists():
+            index = json.loads(index_path.read_bytes())
+            self.keys = index["keys"]
+            self.scrapes = index["scrapes"]
+        self._key_ids = {key: i for i, key in enumerate(self.keys)}
+
+    @property
+    def records(self) -> int:
+        return self.scrapes[-1]["records"] if self.scrapes else 0
+
+    def _read_columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        count = self.records
+        if self._columns is None or self._columns[0] != count:
+            columns = []
+            for filename, dtype in (PRODUCT_COLUMN, DELTA_COLUMN):
+                if count:
+                    columns.append(np.memmap(self.directory / filename, dtype=dtype, mode="r", shape=(count,)))
+                else:
+                    columns.append(np.empty(0, dtype=dtype))
+            self._columns = (count, *columns)
+        return self._columns[1], self._columns[2]
+
+    def _current(self, end: Optional[int] = None) -> np.ndarray:
+        """Price in agorot of every product after the first `end` records"""
+        products, deltas = self._read_columns()
+        end = self.records if end is None else end
+        return np.bincount(products[:end], weights=deltas[:end], minlength=len(self.keys)).astype(np.int64)
+
+    def append(self, scraped_at: str, prices: Dict[str, Optional[float]]) -> bool:
+        """Record one scrape; scrapes not newer than the last recorded one are ignored"""
+        with self._lock:
+            if not scraped_at or (self.scrapes and scraped_at <= self.scrapes[-1]["scrapedAt"]):
+                return False
+
+            current = self._current()
+            keys = list(self.keys)
+            key_ids = dict(self._key_ids)
+            new_products, new_deltas = [], []
+            for key, price in prices.items():
+                agorot = to_agorot(price)
+                if agorot is None:
+                    continue
+                product = key_ids.get(key)
+                if product is None:
+                    product = key_ids[key] = len(keys)
+                    keys.append(key)
+                    previous = 0
+                else:
+                    previous = int(current[product])
+                if agorot != previous:
+                    new_products.append(product)
+                    new_deltas.append(agorot - previous)
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for (filename, dtype), values in ((PRODUCT_COLUMN, new_products), (DELTA_COLUMN, new_deltas)):
+                with open(self.directory / filename, "ab") as f:
+                    f.truncate(self.records * np.dtype(dtype).itemsize)
+                    f.write(np.asarray(values, dtype=dtype).tobytes())
+
+            scrapes = self.scrapes + [{
+                "scrapedAt": scraped_at,
+                "records": self.records + len(new_products),
+                "products": len(keys),
+            }]
+            tmp_path = self.directory / (INDEX_FILENAME + ".tmp")
+            tmp_path.write_text(json.dumps({"keys": keys, "scrapes": scrapes}), encoding="utf-8")
+            os.replace(tmp_path, self.directory / INDEX_FILENAME)
+
+            self.keys, self._key_ids, self.scrapes = keys, key_ids, scrapes
+            return True
+
+    def _scrape_at(self, when: str) -> int:
+        """Index of the last scrape at or before `when` (ISO timestamp or date), -1 if none"""
+        return bisect.bisect_right([scrape["scrapedAt"] for scrape in self.scrapes], when) - 1
+
+    def changes_since(self, since: str) -> List[Dict]:
+        """Products whose price differs from the scrape at or before `since` (or the first scrape)"""
+        if not self.scrapes:
+            return []
+        base = max(self._scrape_at(since), 0)
+        start = self.scrapes[base]["records"]
+        known = self.scrapes[base]["products"]
+
+        products, deltas = self._read_columns()
+        net = np.bincount(products[start:], weights=deltas[start:], minlength=len(self.keys))
+        changed = np.nonzero(net)[0]
+        current = self._current()
+
+        return [
+            {
+                "key": self.keys[product],
+                "before": None if product >= known else (current[product] - net[product]) / 100,
+                "now": current[product] / 100,
+            }
+            for product in changed.tolist()
+        ]
+
+    def series(self, key: str) -> List[Tuple[str, float]]:
+        """(scrapedAt, price) at every scrape where the price of `key` changed"""
+        product = self._key_ids.get(key)
+        if product is None:
+            return []
+        products, deltas = self._read_columns()
+        positions = np.nonzero(products == product)[0]
+        prices = np.cumsum(deltas[positions].astype(np.int64))
+        # The scrape a record belongs to is the first whose cumulative count exceeds it
+        ends = [scrape["records"] for scrape in self.scrapes]
+        scrape_ids = np.searchsorted(ends, positions, side="right")
+        return [(self.scrapes[s]["scrapedAt"], p / 100) for s, p in zip(scrape_ids.tolist(), prices.tolist())]
+
+    def lowest(self, key: str) -> Optional[Tuple[float, str]]:
+        """Lowest price ever recorded for `key` and the first scrape it was seen at"""
+        history = self.series(key)
+        if not history:
+            return None
+        scraped_at, price = min(history, key=lambda entry: entry[1])
+        return price, scraped_at
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+On-demand sampling profiler for request handlers
+While at least one profiled call is running, a background thread samples the
+stacks of all busy threads (the event loop and worker threads doing catalog
+work) at a fixed interval. Samples are aggregated in memory and dumped as
+collapsed stacks ("frame;frame;frame count"), the input format of
+flamegraph.pl and speedscope.
+
+Nothing runs while no call is being profiled, so the only cost for
+unprofiled calls is the decision itself.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_MAX_STACKS = 20000
+MAX_DEPTH = 128
+TRUNCATED_STACK = "[truncated]"
+
+# Innermost frames of threads that are waiting rather than working
+IDLE_FRAMES = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("selectors", "select"),
+    ("thread", "_worker"),
+    ("queue", "get"),
+    ("socketserver", "serve_forever"),
+}
+
+
+def _frame_label(frame) -> tuple:
+    code = frame.f_code
+    return Path(code.co_filename).stem, code.co_name
+
+
+def collapse_stack(frame) -> Optional[str]:
+    """Collapsed "module:function;..." stack from root to `frame`, or None for an idle thread"""
+    if _frame_label(frame) in IDLE_FRAMES:
+        return None
+
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        module, function = _frame_label(frame)
+        labels.append(f"{module}:{function}")
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Aggregates stack samples taken while profiled calls are active"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, max_stacks: int = DEFAULT_MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks: Counter = Counter()
+        self.calls: Dict[str, Dict[str, float]] = {}
+        self._active = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def profile(self, label: str):
+        """Sample stacks for the duration of the block and record its wall time under `label`"""
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._active -= 1
+                stats = self.calls.setdefault(label, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+                stats["calls"] += 1
+                stats["seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                if self._active == 0:
+                    self._thread = None
+                    return
+            self.sample(skip_thread=own_id)
+            time.sleep(self.interval)
+
+    def sample(self, skip_thread: Optional[int] = None) -> None:
+        """Record one stack sample of every busy thread"""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            stack = collapse_stack(frame)
+            if stack is None:
+                continue
+            with self._lock:
+                if stack not in self.stacks and len(self.stacks) >= self.max_stacks:
+                    stack = TRUNCATED_STACK
+                self.stacks[stack] += 1
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "samples": sum(self.stacks.values()),
+                "stacks": len(self.stacks),
+                "calls": {label: dict(stats) for label, stats in self.calls.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.calls.clear()
@@ -5,13 +5,42 @@ Enables browsing and ordering from Weft stores via ChatGPT
 """
 
 import os
+import re
+import asyncio
+import contextlib
 import json
+import time
+import bisect
+import pickle
+import queue
+import hashlib
+import hmac
+import io
 import logging
-from typing import List, Dict, Any
+import math
+import random
+import socket
+import threading
+import zlib
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional
 from pathlib import Path
+import httpx
 from dotenv import load_dotenv
 from fastmcp import FastMCP, Context
 from mcp import types
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+import admission
+import autocomplete
+import cart_token
+import catalog_stream
+from catalog_delta import DELTA_FILENAME, product_key
+import image_cache
+import profiling
+import singleflight
+import transliteration
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,15 +60,119 @@ WIDGET_MIME_TYPE = "text/html+skybridge"
 PRODUCTS_WIDGET_URI = "ui://widget/products.html"
 CART_WIDGET_URI = "ui://widget/cart.html"
 
+# Prebuilt catalog snapshots, keyed by the hash of the source products.json
+# and of the code that builds catalogs from it
+SNAPSHOT_DIR = Path(os.getenv("CATALOG_SNAPSHOT_DIR", str(Path(__file__).parent / ".cache" / "catalog")))
+SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOTS", "1") != "0"
+SNAPSHOT_VERSION = 4
+# Modules whose code shapes a snapshot (items, indexes, keys); editing any of
+# them invalidates existing snapshots without a SNAPSHOT_VERSION bump
+SNAPSHOT_SOURCES = ("server.py", "transliteration.py", "catalog_delta.py", "image_cache.py")
+
+# Price history: every ingested scrape is appended to a columnar store per store
+PRICE_HISTORY_DIR = Path(os.getenv("PRICE_HISTORY_DIR", str(Path(__file__).parent / ".cache" / "history")))
+PRICE_HISTORY_ENABLED = os.getenv("PRICE_HISTORY", "1") != "0"
+PRICE_CHANGES_LIMIT = 50
+
+# Shopping-list search: queries per call and results kept per query
+SHOPPING_LIST_MAX_QUERIES = 30
+SHOPPING_LIST_LIMIT = 20
+
+# Sort orders supported by search_products
+SORT_OPTIONS = ("price_asc", "price_desc", "price_per_kg")
+
+# Package sizes in product names, e.g. '500 גרם', '1 ק"ג', '1/2 ק"ג', '750 מ"ל'
+SIZE_PATTERN = re.compile(
+    r'(\d+(?:[.,]\d+)?(?:/\d+)?)\s*'
+    r'(ק["\'`״]?ג|קילו|גר(?:ם|\')?|ג\'|מ["\'`״]?ל|ליטר|kg|gr?|ml|l)(?![א-תa-z])',
+    re.IGNORECASE
+)
+SIZE_UNIT_GRAMS = {"kg": 1000.0, "g": 1.0, "ml": 1.0, "l": 1000.0}
+
+# Image proxy: when IMAGE_PROXY_BASE_URL (this server's public URL) is set,
+# widget images point at /images/... on this server instead of the store site
+IMAGE_ORIGIN = os.getenv("IMAGE_ORIGIN", image_cache.DEFAULT_ORIGIN)
+IMAGE_PROXY_BASE_URL = os.getenv("IMAGE_PROXY_BASE_URL", "").rstrip("/")
+IMAGE_CACHE_DIR = Path(os.getenv("IMAGE_CACHE_DIR", str(image_cache.DEFAULT_CACHE_DIR)))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(image_cache.DEFAULT_MAX_BYTES)))
+IMAGE_PREWARM = os.getenv("IMAGE_PREWARM", "1") != "0"
+
 # In-memory cart storage: {session_id: {product_key: {product, quantity}}}
 user_carts = {}
 
+# Cart mutations are guarded by striped locks: each session maps to one of
+# CART_LOCK_STRIPES locks, so updates within a session are ordered while
+# different sessions rarely contend.
+CART_LOCK_STRIPES = int(os.getenv("CART_LOCK_STRIPES", "64"))
+_cart_locks = [threading.Lock() for _ in range(max(1, CART_LOCK_STRIPES))]
+
+# Every cart mutation bumps the session's cart version; the rendered
+# view_cart result is memoized per version: {session_id: (version, cart, result)}
+cart_versions: Dict[str, int] = {}
+_cart_views: Dict[str, tuple] = {}
+
+# Stateless carts: with CART_TOKEN_SECRET set, cart tools also return the cart
+# as a signed token in _meta.cartToken. Clients send it back (params._meta.cartToken
+# or a _cartToken argument) so any replica can rebuild the cart.
+CART_TOKEN_SECRET = os.getenv("CART_TOKEN_SECRET", "").encode("utf-8")
+CART_TOKEN_MAX_AGE = float(os.getenv("CART_TOKEN_MAX_AGE", str(7 * 24 * 3600)))
+CART_TOOLS = {"add_to_cart", "update_cart", "view_cart", "remove_from_cart", "clear_cart"}
+# Last token issued per session: {session_id: (version, cart, token)}
+_cart_tokens: Dict[str, tuple] = {}
+
+# Data derived from a catalog (similarity vectors, ...), rebuilt when the catalog
+# is replaced or updated: {(store_name, kind): (catalog, generation, value)}
+_derived_cache: Dict[tuple, tuple] = {}
+SIMILAR_PRODUCTS_LIMIT = 20
+AUTOCOMPLETE_LIMIT = autocomplete.TOP_K
+
+# Admission control: concurrent tool calls per class, wait queue bounds and a
+# per-session token bucket. Overloaded calls fail fast with a retryable error.
+TOOL_CLASSES = {
+    "list_stores": "read",
+    "search_products": "read",
+    "search_shopping_list": "read",
+    "view_cart": "read",
+    "debug_session": "read",
+    "similar_products": "read",
+    "category_price_stats": "read",
+    "autocomplete": "read",
+    "price_history": "read",
+    "add_to_cart": "cart",
+    "update_cart": "cart",
+    "remove_from_cart": "cart",
+    "clear_cart": "cart",
+}
+admission_controller = admission.AdmissionController(
+    limits={
+        "read": int(os.getenv("ADMISSION_READ_CONCURRENCY", "16")),
+        "cart": int(os.getenv("ADMISSION_CART_CONCURRENCY", "8")),
+    },
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT_MS", "2000")) / 1000,
+    rate=float(os.getenv("SESSION_RATE_PER_SEC", "10")),
+    burst=int(os.getenv("SESSION_BURST", "20")),
+)
+
+# Identical concurrent catalog loads, searches and image fetches share one computation
+catalog_loads = singleflight.SingleFlight()
+search_flights = singleflight.AsyncSingleFlight()
+image_fetches = singleflight.AsyncSingleFlight()
+
+# On-demand profiling: a fraction of tool and resource calls (PROFILE_SAMPLE_RATE),
+# plus calls asking for it with _meta.profile or an "X-Profile: 1" header when
+# PROFILE_ON_DEMAND=1, are stack-sampled. Collapsed stacks are served at /debug/profile.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ON_DEMAND = os.getenv("PROFILE_ON_DEMAND", "0") == "1"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+profiler = profiling.StackSampler(interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000)
+
 # Initialize MCP server
 mcp = FastMCP("Nitzat Haduvdevan Store", port=PORT, host="0.0.0.0", stateless_http=True)
 
 
 def load_store_products(store_name: str) -> List[Dict]:
-    """Load products from a specific store's JSON file"""
+    """Load products from a specific store's JSON file, skipping malformed records"""
     store_path = STORES_DIR / store_name / "data" / "products.json"
     
     if not store_path.exists():
@@ -47,14 +180,885 @@ def load_store_products(store_name: str) -> List[Dict]:
         return []
     
     try:
-        with open(store_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('products', [])
+        return list(valid_products(catalog_stream.CatalogStream(store_path)))
     except Exception as e:
         logger.error(f"Error loading store data: {e}")
         return []
 
 
+def is_valid_product(record: Any) -> bool:
+    """Whether a products.json record can be indexed: an object with a name and text fields"""
+    if not isinstance(record, dict):
+        return False
+    name = record.get('name')
+    return (
+        isinstance(name, str) and bool(name.strip())
+        and isinstance(record.get('category', ''), str)
+        and isinstance(record.get('url', ''), str)
+        and isinstance(record.get('image', ''), str)
+    )
+
+
+def valid_products(stream: catalog_stream.CatalogStream) -> Iterator[Dict]:
+    """Records of a catalog stream that can be indexed; the others are skipped and logged"""
+    invalid = 0
+    for record in stream:
+        if is_valid_product(record):
+            yield record
+        else:
+            invalid += 1
+
+    skipped = invalid + stream.skipped
+    if skipped:
+        logger.warning(f"Skipped {skipped} malformed product records in {stream.path}")
+
+
+# StoreCatalog attributes mapping a term to a posting list of product indices
+POSTING_INDEXES = ("category_index", "trigram_index", "alias_index")
+
+
+class StoreCatalog:
+    """Products of a single store with prebuilt lookup structures.
+
+    `items` holds the MCP widget format of every product, and the trigram and
+    category indexes let searches touch only candidate products instead of
+    scanning the whole store. Product indices never shift within a catalog:
+    removed products are tombstoned and new products are appended. Clients
+    see `store:product_key` ids instead (`key_index` maps keys to indices),
+    since a fresh load of the same products numbers them differently.
+    """
+
+    def __init__(self, store_name: str, products: List[Dict], source_hash: str = "", scraped_at: str = ""):
+        self.store_name = store_name
+        self.source_hash = source_hash
+        self.scraped_at = scraped_at
+        self.generation = 0
+        self.products: List[Dict] = []
+        self.items: List[Dict] = []
+        self.names_lower: List[str] = []
+        self.categories_lower: List[str] = []
+        self.key_index: Dict[str, int] = {}
+        self.removed: set = set()
+        # Numeric columns parsed once at load, plus (value, index) lists kept
+        # sorted so price ranges and orderings are answered by binary search
+        self.prices: List[Optional[float]] = []
+        self.sizes_grams: List[Optional[float]] = []
+        self.prices_per_kg: List[Optional[float]] = []
+        self.price_sorted: List[tuple] = []
+        self.price_per_kg_sorted: List[tuple] = []
+        self.category_index: Dict[str, List[int]] = {}
+        self.trigram_index: Dict[str, List[int]] = {}
+        # English dictionary terms and transliteration keys -> products
+        self.alias_index: Dict[str, List[int]] = {}
+
+        # Bulk load: postings and sorted numeric lists are built once at the
+        # end instead of being kept sorted on every append
+        self._bulk = True
+        for product in products:
+            self._append(product)
+        self._bulk = False
+        self._build_indexes()
+        self.price_sorted = sorted((price, idx) for idx, price in enumerate(self.prices) if price is not None)
+        self.price_per_kg_sorted = sorted(
+            (value, idx) for idx, value in enumerate(self.prices_per_kg) if value is not None
+        )
+
+    def __len__(self) -> int:
+        return len(self.products) - len(self.removed)
+
+    def _build_indexes(self) -> None:
+        """The postings _index() would add for every product, built in one pass.
+
+        Indices are visited in order, so appending keeps each posting list
+        sorted without the per-term checks of the incremental path.
+        """
+        category_index = self.category_index
+        trigram_index = self.trigram_index
+        alias_index = self.alias_index
+        alias_keys = transliteration.alias_keys
+        for idx, (name, category) in enumerate(zip(self.names_lower, self.categories_lower)):
+            category_index.setdefault(category, []).append(idx)
+            for trigram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                trigram_index.setdefault(trigram, []).append(idx)
+            for key in alias_keys(name):
+                alias_index.setdefault(key, []).append(idx)
+
+    def _append(self, product: Dict) -> int:
+        idx = len(self.products)
+        self.products.append(product)
+        self.items.append(transform_product_to_mcp_format(product, self.store_name))
+        self.names_lower.append(product.get('name', '').lower())
+        self.categories_lower.append(product.get('category', '').lower())
+        self.prices.append(None)
+        self.sizes_grams.append(None)
+        self.prices_per_kg.append(None)
+        self._set_numeric(idx)
+        self.key_index[product_key(product)] = idx
+        self._index(idx)
+        return idx
+
+    def _set_numeric(self, idx: int) -> None:
+        # Parsed once by transform_product_to_mcp_format
+        item = self.items[idx]
+        self.prices[idx] = item["price"]
+        self.sizes_grams[idx] = item["size_grams"]
+        self.prices_per_kg[idx] = item["price_per_kg"]
+
+    def _postings(self, idx: int):
+        name = self.names_lower[idx]
+        yield self.category_index, self.categories_lower[idx]
+        for trigram in set(name[i:i + 3] for i in range(len(name) - 2)):
+            yield self.trigram_index, trigram
+        for key in transliteration.alias_keys(name):
+            yield self.alias_index, key
+
+    def _index(self, idx: int) -> None:
+        if self._bulk:
+            return  # Indexed all at once by _build_indexes()
+
+        for index, term in self._postings(idx):
+            posting = index.setdefault(term, [])
+            if not posting or posting[-1] < idx:
+                posting.append(idx)
+            else:
+                bisect.insort(posting, idx)
+        for column, ordered in ((self.prices, self.price_sorted), (self.prices_per_kg, self.price_per_kg_sorted)):
+            if column[idx] is not None:
+                bisect.insort(ordered, (column[idx], idx))
+
+    def _unindex(self, idx: int) -> None:
+        for column, ordered in ((self.prices, self.price_sorted), (self.prices_per_kg, self.price_per_kg_sorted)):
+            if column[idx] is not None:
+                pos = bisect.bisect_left(ordered, (column[idx], idx))
+                if pos < len(ordered) and ordered[pos] == (column[idx], idx):
+                    del ordered[pos]
+
+        for index, term in self._postings(idx):
+            posting = index.get(term)
+            if not posting:
+                continue
+            pos = bisect.bisect_left(posting, idx)
+            if pos < len(posting) and posting[pos] == idx:
+                del posting[pos]
+            if not posting:
+                del index[term]
+
+    def _replace(self, idx: int, product: Dict) -> None:
+        self._unindex(idx)
+        self.products[idx] = product
+        self.items[idx] = transform_product_to_mcp_format(product, self.store_name)
+        self.names_lower[idx] = product.get('name', '').lower()
+        self.categories_lower[idx] = product.get('category', '').lower()
+        self._set_numeric(idx)
+        self._index(idx)
+
+    def is_active(self, idx: int) -> bool:
+        """Whether `idx` refers to a product that is still in the catalog"""
+        return 0 <= idx < len(self.products) and idx not in self.removed
+
+    def lookup(self, product_id: str) -> Optional[int]:
+        """Index of the active product with this id (see `product_id_for`), or None"""
+        store_name, _, key = (product_id or "").partition(':')
+        if store_name != self.store_name:
+            return None
+        return self.key_index.get(key)
+
+    def copy(self) -> "StoreCatalog":
+        """An independent copy to apply a delta to while readers keep using this one.
+
+        Containers and posting lists are copied; product and item dicts are
+        never modified in place, so they are shared.
+        """
+        clone = StoreCatalog.__new__(StoreCatalog)
+        for key, value in vars(self).items():
+            if key in POSTING_INDEXES:
+                value = {term: list(posting) for term, posting in value.items()}
+            elif isinstance(value, (list, dict, set)):
+                value = type(value)(value)
+            setattr(clone, key, value)
+        return clone
+
+    def apply_delta(self, delta: Dict) -> Dict[str, int]:
+        """Apply added/changed/removed products in place, touching only their index entries.
+
+        Only call this on a catalog no reader can see yet (see `copy`).
+        """
+        counts = {"added": 0, "changed": 0, "removed": 0}
+
+        for key in delta.get('removed', []):
+            idx = self.key_index.pop(key, None)
+            if idx is None:
+                continue
+            self._unindex(idx)
+            self.removed.add(idx)
+            counts["removed"] += 1
+
+        for product in delta.get('changed', []) + delta.get('added', []):
+            idx = self.key_index.get(product_key(product))
+            if idx is None:
+                self._append(product)
+                counts["added"] += 1
+            else:
+                self._replace(idx, product)
+                counts["changed"] += 1
+
+        self.scraped_at = delta.get('scrapedAt', self.scraped_at)
+        self.generation += 1
+        return counts
+
+    def search(self, search: str = "", category: str = None) -> List[int]:
+        """Return indices of products whose name contains `search` and whose category matches"""
+        return self.search_many([search], category)[0]
+
+    def search_many(self, searches: List[str], category: str = None) -> List[List[int]]:
+        """`search` for several queries at once.
+
+        The category filter is resolved once, repeated queries are answered
+        once and trigram posting lists are shared between queries.
+        """
+        if category:
+            category_lower = category.lower()
+            in_category = self.category_index.get(category_lower, [])
+        else:
+            in_category = None
+        trigram_postings: Dict[str, List[int]] = {}
+        results: Dict[str, List[int]] = {}
+
+        for query in dict.fromkeys((search or "").lower() for search in searches):
+            candidates = in_category if in_category is not None else range(len(self.products))
+
+            if not query:
+                matches = list(candidates)
+            else:
+                if len(query) >= 3:
+                    # Every trigram of the query must appear in a matching name
+                    for trigram in {query[i:i + 3] for i in range(len(query) - 2)} - trigram_postings.keys():
+                        trigram_postings[trigram] = self.trigram_index.get(trigram, [])
+                    postings = sorted(
+                        (trigram_postings[query[i:i + 3]] for i in range(len(query) - 2)),
+                        key=len
+                    )
+                    allowed = set(postings[0])
+                    for posting in postings[1:]:
+                        if not allowed:
+                            break
+                        allowed.intersection_update(posting)
+                    if category and allowed:
+                        allowed.intersection_update(candidates)
+                    candidates = sorted(allowed)
+
+                names = self.names_lower
+                matches = [idx for idx in candidates if query in names[idx]]
+
+                if transliteration.is_latin_query(query):
+                    alias_matches = self._alias_search(query)
+                    if category:
+                        alias_matches = {idx for idx in alias_matches if self.categories_lower[idx] == category_lower}
+                    if alias_matches:
+                        matches = sorted(alias_matches.union(matches))
+
+            if self.removed:
+                matches = [idx for idx in matches if idx not in self.removed]
+            results[query] = matches
+
+        return [results[(search or "").lower()] for search in searches]
+
+    def query(self, search: str = "", category: str = None, min_price: float = None,
+              max_price: float = None, sort: str = None) -> List[int]:
+        """Search with optional price range and ordering.
+
+        Price bounds are resolved by binary search over the presorted price
+        list; sorted results walk the presorted lists instead of sorting.
+        """
+        matches = self.search(search, category) if (search or category) else None
+        if min_price is None and max_price is None and not sort:
+            return matches if matches is not None else self.search()
+
+        allowed = set(matches) if matches is not None else None
+
+        if min_price is not None or max_price is not None:
+            lo = 0 if min_price is None else bisect.bisect_left(self.price_sorted, (min_price, -1))
+            hi = (len(self.price_sorted) if max_price is None
+                  else bisect.bisect_right(self.price_sorted, (max_price, float('inf'))))
+            in_range = self.price_sorted[lo:hi]
+            if allowed is None:
+                allowed = {idx for _, idx in in_range}
+            else:
+                allowed.intersection_update(idx for _, idx in in_range)
+        else:
+            in_range = self.price_sorted
+
+        if self.removed:
+            allowed = (allowed if allowed is not None else set(range(len(self.products)))) - self.removed
+
+        if sort in ("price_asc", "price_desc"):
+            ordered = [idx for _, idx in in_range if allowed is None or idx in allowed]
+            if sort == "price_desc":
+                ordered.reverse()
+            if min_price is None and max_price is None:
+                # Products without a parseable price go last
+                priced = set(ordered)
+                ordered += [idx for idx in range(len(self.products))
+                            if idx not in priced and self.prices[idx] is None and (allowed is None or idx in allowed)]
+            return ordered
+
+        if sort == "price_per_kg":
+            ordered = [idx for _, idx in self.price_per_kg_sorted if allowed is None or idx in allowed]
+            # Products without a parseable package size go last, in catalog order
+            sized = set(ordered)
+            pool = sorted(allowed) if allowed is not None else range(len(self.products))
+            return ordered + [idx for idx in pool if idx not in sized]
+
+        return sorted(allowed) if allowed is not None else list(range(len(self.products)))
+
+    def _alias_search(self, query: str) -> set:
+        """Products matching every word of an English query via the alias index"""
+        result = None
+        for alternatives in transliteration.query_keys(query):
+            word_matches = set()
+            for key in alternatives:
+                word_matches.update(self.alias_index.get(key, ()))
+            result = word_matches if result is None else result & word_matches
+            if not result:
+                return set()
+        return result or set()
+
+    def to_snapshot(self) -> Dict:
+        """Plain-data state used for warm-start snapshots"""
+        state = dict(vars(self))
+        state["code_hash"] = snapshot_code_hash()
+        state["image_base"] = IMAGE_PROXY_BASE_URL
+        return state
+
+    @classmethod
+    def from_snapshot(cls, state: Dict) -> "StoreCatalog":
+        """Rebuild a catalog from `to_snapshot` state without re-indexing"""
+        catalog = cls.__new__(cls)
+        for key, value in state.items():
+            if key not in ("code_hash", "image_base"):
+                setattr(catalog, key, value)
+        return catalog
+
+
+# In-memory catalogs: {store_name: (file signature, StoreCatalog)}
+_catalogs: Dict[str, tuple] = {}
+# Open price histories: {directory: PriceHistory}
+_price_histories: Dict[Path, Any] = {}
+_price_history_lock = threading.Lock()
+# Background history appends, run one at a time in the order catalogs were loaded
+_price_history_queue: "queue.Queue" = queue.Queue()
+_price_history_worker: Optional[threading.Thread] = None
+_catalog_lock = threading.Lock()
+_ready = threading.Event()
+
+
+@lru_cache(maxsize=1)
+def snapshot_code_hash() -> str:
+    """Hash of SNAPSHOT_VERSION and the source of SNAPSHOT_SOURCES"""
+    digest = hashlib.sha256(str(SNAPSHOT_VERSION).encode("utf-8"))
+    for name in SNAPSHOT_SOURCES:
+        digest.update((Path(__file__).parent / name).read_bytes())
+    return digest.hexdigest()
+
+
+def _snapshot_path(store_name: str, source_hash: str) -> Path:
+    return SNAPSHOT_DIR / f"{store_name}-{source_hash[:16]}-{snapshot_code_hash()[:12]}.pickle"
+
+
+def _load_snapshot(store_name: str, source_hash: str) -> Optional[StoreCatalog]:
+    """Load a prebuilt catalog snapshot matching the source hash, if any"""
+    snapshot_path = _snapshot_path(store_name, source_hash)
+    if not SNAPSHOT_ENABLED or not snapshot_path.exists():
+        return None
+
+    try:
+        with open(snapshot_path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get("code_hash") != snapshot_code_hash() or state.get("source_hash") != source_hash:
+            return None
+        # Widget items embed image URLs, so they depend on the proxy setting
+        if state.get("image_base") != IMAGE_PROXY_BASE_URL:
+            return None
+        return StoreCatalog.from_snapshot(state)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable catalog snapshot {snapshot_path}: {e}")
+        return None
+
+
+def _save_snapshot(catalog: StoreCatalog) -> None:
+    """Persist a catalog snapshot and drop stale snapshots of the same store"""
+    if not SNAPSHOT_ENABLED:
+        return
+
+    snapshot_path = _snapshot_path(catalog.store_name, catalog.source_hash)
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(catalog.to_snapshot(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+
+        for stale in SNAPSHOT_DIR.glob(f"{catalog.store_name}-*.pickle"):
+            if stale != snapshot_path:
+                stale.unlink(missing_ok=True)
+    except Exception as e:
+        logger.warning(f"Could not write catalog snapshot {snapshot_path}: {e}")
+
+
+def _apply_pending_delta(data_dir: Path, catalog: StoreCatalog, source_hash: str) -> Optional[StoreCatalog]:
+    """Return a copy of `catalog` with the delta file next to products.json applied.
+
+    The delta must be based on the catalog's scrapedAt and describe exactly the
+    products.json that is now on disk; otherwise None is returned and the
+    caller does a full load.
+    The snapshot is not rewritten here, keeping a refresh to a copy of the
+    indexes plus the delta; the next cold start rebuilds it from products.json.
+    """
+    delta_path = data_dir / DELTA_FILENAME
+    if not delta_path.exists():
+        return None
+
+    try:
+        delta = json.loads(delta_path.read_bytes())
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable catalog delta {delta_path}: {e}")
+        return None
+
+    if delta.get('baseScrapedAt') != catalog.scraped_at or delta.get('sha256') != source_hash:
+        return None
+
+    updated = catalog.copy()
+    counts = updated.apply_delta(delta)
+    updated.source_hash = source_hash
+    logger.info(f"Applied catalog delta to {catalog.store_name}: {counts}")
+    return updated
+
+
+def apply_catalog_delta(store_name: str, delta: Dict) -> Dict[str, int]:
+    """Replace the live catalog of a store with a copy that has `delta` applied.
+
+    Raises ValueError when the store is unknown or the delta was computed
+    against a different scrape than the one currently loaded.
+    """
+    catalog = get_store_catalog(store_name)
+    if catalog is None:
+        raise ValueError(f"Unknown store: {store_name}")
+
+    with _catalog_lock:
+        signature, catalog = _catalogs.get(store_name, (None, catalog))
+        if delta.get('baseScrapedAt') != catalog.scraped_at:
+            raise ValueError(
+                f"Delta base {delta.get('baseScrapedAt')} does not match loaded catalog {catalog.scraped_at}"
+            )
+        # Readers hold no lock, so the delta goes into a copy that replaces the catalog at once
+        updated = catalog.copy()
+        counts = updated.apply_delta(delta)
+        _catalogs[store_name] = (signature, updated)
+        record_price_history(updated, background=True)
+
+    logger.info(f"Applied catalog delta to {store_name}: {counts}")
+    return counts
+
+
+def get_store_catalog(store_name: str) -> Optional[StoreCatalog]:
+    """Return the cached catalog for a store, reloading it when products.json changes"""
+    store_path = STORES_DIR / store_name / "data" / "products.json"
+
+    try:
+        stat = store_path.stat()
+    except OSError:
+        logger.error(f"Store data not found: {store_path}")
+        return None
+
+    signature = (str(store_path), stat.st_mtime_ns, stat.st_size)
+    cached = _catalogs.get(store_name)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    return catalog_loads.do((store_name, signature), _load_store_catalog, store_name, store_path, signature)
+
+
+def _load_store_catalog(store_name: str, store_path: Path, signature: tuple) -> Optional[StoreCatalog]:
+    """Load (or refresh from a delta) the catalog of a store for the given file signature"""
+    with _catalog_lock:
+        cached = _catalogs.get(store_name)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        started = time.perf_counter()
+        try:
+            source = open(store_path, 'rb')
+        except OSError as e:
+            logger.error(f"Error loading store data: {e}")
+            return None
+
+        with source:
+            catalog, source_name = _read_store_catalog(store_name, store_path, source, cached)
+        if catalog is None:
+            return None
+
+        _catalogs[store_name] = (signature, catalog)
+        _schedule_image_prewarm(catalog)
+        record_price_history(catalog, background=True)
+        logger.info(
+            f"Loaded {len(catalog)} products for {store_name} from {source_name} "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return catalog
+
+
+def _read_store_catalog(store_name: str, store_path: Path, source, cached: Optional[tuple]) -> tuple:
+    """Build a catalog from an open products.json: delta, snapshot or full streaming parse.
+
+    Hashing and parsing read the same open file, so both see the same
+    contents even if the scraper replaces products.json meanwhile. Neither
+    holds the whole file in memory: it is hashed in chunks and products are
+    indexed one record at a time as they are decoded.
+    """
+    source_hash = hashlib.file_digest(source, "sha256").hexdigest()
+
+    # A scraper delta against the live catalog is applied in place
+    if cached:
+        catalog = _apply_pending_delta(store_path.parent, cached[1], source_hash)
+        if catalog is not None:
+            return catalog, "delta"
+
+    catalog = _load_snapshot(store_name, source_hash)
+    if catalog is not None:
+        return catalog, "snapshot"
+
+    source.seek(0)
+    stream = catalog_stream.CatalogStream(io.TextIOWrapper(source, encoding='utf-8'))
+    try:
+        catalog = StoreCatalog(store_name, valid_products(stream), source_hash=source_hash)
+    except Exception as e:
+        logger.error(f"Error loading store data: {e}")
+        return None, None
+    # Top-level fields are only known once the stream has been read
+    catalog.scraped_at = stream.meta.get('scrapedAt', '')
+    _save_snapshot(catalog)
+    return catalog, "products.json"
+
+
+def get_price_history(store_name: str, directory: Optional[Path] = None):
+    """Return the price history of a store, opening it on first use"""
+    import price_history  # NumPy is only loaded once price history is first needed
+
+    directory = directory or PRICE_HISTORY_DIR / store_name
+    with _price_history_lock:
+        history = _price_histories.get(directory)
+        if history is None:
+            history = _price_histories[directory] = price_history.PriceHistory(directory)
+    return history
+
+
+def record_price_history(catalog: StoreCatalog, background: bool = False) -> None:
+    """Append the catalog's current prices unless its scrape is already recorded.
+
+    With `background`, prices are copied now and appended by a worker
+    thread, so loading NumPy and writing the history stay off the catalog
+    load path. Appends run one at a time in call order: an older scrape
+    appended after a newer one would be dropped as "not newer".
+    """
+    if not (PRICE_HISTORY_ENABLED and catalog.scraped_at):
+        return
+    store_name, scraped_at = catalog.store_name, catalog.scraped_at
+    directory = PRICE_HISTORY_DIR / store_name
+    prices = {key: catalog.prices[idx] for key, idx in catalog.key_index.items()}
+
+    def append():
+        try:
+            if get_price_history(store_name, directory).append(scraped_at, prices):
+                logger.info(f"Recorded prices of {store_name} scraped at {scraped_at}")
+        except Exception as e:
+            logger.warning(f"Could not record price history for {store_name}: {e}")
+
+    if background:
+        _start_price_history_worker()
+        _price_history_queue.put(append)
+    else:
+        append()
+
+
+def _start_price_history_worker() -> None:
+    global _price_history_worker
+    with _price_history_lock:
+        if _price_history_worker is None:
+            _price_history_worker = threading.Thread(
+                target=_run_price_history_queue, name="price-history", daemon=True
+            )
+            _price_history_worker.start()
+
+
+def _run_price_history_queue() -> None:
+    while True:
+        append = _price_history_queue.get()
+        try:
+            append()
+        finally:
+            _price_history_queue.task_done()
+
+
+_image_cache: Optional[image_cache.ImageCache] = None
+_image_client = None
+
+
+def catalog_derived(store_name: str, catalog: "StoreCatalog", kind: str, build) -> Any:
+    """Return build(catalog), cached until the catalog is replaced or its generation changes"""
+    key = (store_name, kind)
+    cached = _derived_cache.get(key)
+    if cached and cached[0] is catalog and cached[1] == catalog.generation:
+        return cached[2]
+
+    started = time.perf_counter()
+    value = build(catalog)
+    _derived_cache[key] = (catalog, catalog.generation, value)
+    logger.info(f"Built {kind} for {store_name} in {time.perf_counter() - started:.3f}s")
+    return value
+
+
+def build_similarity_index(catalog: "StoreCatalog"):
+    """Product vectors from the catalog's name trigram and category postings"""
+    import similarity  # NumPy is only loaded once similarity is first needed
+
+    def features():
+        for trigram, postings in catalog.trigram_index.items():
+            yield trigram, postings, 1.0
+        for category, postings in catalog.category_index.items():
+            yield f"category:{category}", postings, similarity.CATEGORY_WEIGHT
+
+    active = [catalog.is_active(idx) for idx in range(len(catalog.products))]
+    return similarity.SimilarityIndex(len(catalog.products), features(), active)
+
+
+def build_price_stats(catalog: "StoreCatalog") -> List[Dict]:
+    """Price and price-per-kg statistics per category over the active products"""
+    import catalog_stats  # NumPy is only loaded once statistics are first needed
+
+    active = [idx for idx in range(len(catalog.products)) if catalog.is_active(idx)]
+    categories = [catalog.products[idx].get('category', '') for idx in active]
+    prices = catalog_stats.grouped_stats(categories, [catalog.prices[idx] for idx in active])
+    per_kg = catalog_stats.grouped_stats(categories, [catalog.prices_per_kg[idx] for idx in active])
+
+    def rounded(stats: Optional[Dict]) -> Optional[Dict]:
+        if stats is None:
+            return None
+        return {key: value if key == "count" else round(value, 2) for key, value in stats.items()}
+
+    return [
+        dict(category=category, **rounded(stats), price_per_kg=rounded(per_kg.get(category)))
+        for category, stats in sorted(prices.items(), key=lambda entry: -entry[1]["count"])
+    ]
+
+
+def build_completions(catalog: "StoreCatalog") -> autocomplete.CompletionTrie:
+    """Name words weighted by how many products contain them, and categories by product count"""
+    word_counts: Dict[str, int] = {}
+    for idx, name in enumerate(catalog.names_lower):
+        if catalog.is_active(idx):
+            for word in autocomplete.name_words(name):
+                word_counts[word] = word_counts.get(word, 0) + 1
+
+    def terms():
+        for word, count in word_counts.items():
+            yield word, word, "word", count
+        for postings in catalog.category_index.values():
+            active = [idx for idx in postings if catalog.is_active(idx)]
+            if active:
+                name = catalog.products[active[0]].get('category', '')
+                yield autocomplete.normalize(name), name, "category", len(active)
+
+    return autocomplete.CompletionTrie(terms())
+
+
+def get_image_cache() -> image_cache.ImageCache:
+    """Return the process-wide image cache, creating it on first use"""
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = image_cache.ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+    return _image_cache
+
+
+def build_image_paths(catalog: "StoreCatalog") -> frozenset:
+    """Proxyable image paths of the catalog's active products"""
+    paths = (
+        image_cache.normalize_image_path(product.get('image', ''))
+        for idx, product in enumerate(catalog.products) if catalog.is_active(idx)
+    )
+    return frozenset(path for path in paths if path)
+
+
+def is_catalog_image(path: str) -> bool:
+    """Whether `path` is the image of a product in a store catalog"""
+    for store_name in get_available_stores():
+        catalog = get_store_catalog(store_name)
+        if catalog and path in catalog_derived(store_name, catalog, "image_paths", build_image_paths):
+            return True
+    return False
+
+
+def _schedule_image_prewarm(catalog: StoreCatalog) -> None:
+    """Fetch a freshly loaded catalog's images into the cache in the background"""
+    if not (IMAGE_PROXY_BASE_URL and IMAGE_PREWARM):
+        return
+
+    paths = [product.get('image', '') for product in catalog.products]
+    threading.Thread(
+        target=lambda: asyncio.run(image_cache.prewarm(get_image_cache(), IMAGE_ORIGIN, paths)),
+        name=f"image-prewarm-{catalog.store_name}",
+        daemon=True
+    ).start()
+
+
+def warm_start() -> None:
+    """Load every store catalog (from snapshots when possible) and mark the server ready"""
+    for store_name in get_available_stores():
+        catalog = get_store_catalog(store_name)
+        count = len(catalog) if catalog else 0
+        print(f"  - {store_name}: {count} products")
+        if catalog:
+            catalog_derived(store_name, catalog, "completions", build_completions)
+    _ready.set()
+    logger.info("Catalogs loaded, server is ready")
+
+
+def warm_start_after_bind(port: int, timeout: float = 30.0) -> None:
+    """Run warm_start once the HTTP port accepts connections (or after `timeout`).
+
+    Catalog parsing is CPU work that would otherwise compete with the
+    server's own startup for the GIL and delay binding the port.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.01)
+    warm_start()
+
+
+def cart_lock(session_id: str) -> threading.Lock:
+    """Return the lock stripe guarding a session's cart"""
+    return _cart_locks[zlib.crc32(session_id.encode('utf-8')) % len(_cart_locks)]
+
+
+def _cart_changed(session_id: str) -> None:
+    """Bump a cart's version and drop its memoized view (call with the cart lock held)"""
+    cart_versions[session_id] = cart_versions.get(session_id, 0) + 1
+    _cart_views.pop(session_id, None)
+
+
+def cart_token_for(session_id: str) -> str:
+    """Signed token for a session's current cart (memoized per cart version)"""
+    with cart_lock(session_id):
+        cart = user_carts.get(session_id)
+        version = cart_versions.get(session_id, 0)
+        cached = _cart_tokens.get(session_id)
+        if cached and cached[0] == version and cached[1] is cart:
+            return cached[2]
+
+        entries = [
+            (item['store'], product_key(item['product']), item['quantity'])
+            for item in (cart or {}).values()
+        ]
+        token = cart_token.encode_cart(entries, version, CART_TOKEN_SECRET, session_id)
+        _cart_tokens[session_id] = (version, cart, token)
+    return token
+
+
+def restore_cart_from_token(session_id: str, token: str) -> None:
+    """Rebuild a session's cart from a client token unless this replica's copy is as new"""
+    try:
+        revision, entries = cart_token.decode_cart(token, CART_TOKEN_SECRET, session_id, CART_TOKEN_MAX_AGE)
+    except cart_token.InvalidCartToken as e:
+        logger.warning(f"Ignoring cart token for session {session_id}: {e}")
+        return
+
+    if cart_versions.get(session_id, -1) >= revision:
+        return
+
+    cart = {}
+    for store_name, key, quantity in entries:
+        catalog = get_store_catalog(store_name)
+        index = catalog.key_index.get(key) if catalog else None
+        if index is None or not catalog.is_active(index):
+            continue  # No longer sold
+        cart[product_id_for(store_name, catalog.products[index])] = {
+            'product': catalog.products[index],
+            'store': store_name,
+            'quantity': quantity
+        }
+
+    with cart_lock(session_id):
+        if cart_versions.get(session_id, -1) >= revision:
+            return
+        user_carts[session_id] = cart
+        cart_versions[session_id] = revision
+        _cart_views.pop(session_id, None)
+    logger.info(f"Restored cart for session {session_id} from token (revision {revision}, {len(cart)} items)")
+
+
+def with_cart_token(result: types.ServerResult, session_id: str) -> types.ServerResult:
+    """Copy of a tool result with the session's cart token in _meta"""
+    call_result = result.root
+    meta = dict(call_result.meta or {})
+    meta["cartToken"] = cart_token_for(session_id)
+    return types.ServerResult(call_result.model_copy(update={"meta": meta}))
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """Parse a scraped price such as '9.9' or '1,234.50' into a float"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_quantity(value: Any, minimum: int = 1) -> Optional[int]:
+    """A cart quantity as an int, or None unless it is a whole number >= minimum.
+
+    Integral floats (2.0) count as whole numbers; bools and strings do not.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if isinstance(value, float) and not value.is_integer():
+        return None
+    return int(value) if value >= minimum else None
+
+
+def parse_size_grams(name: str) -> Optional[float]:
+    """Package size in grams (or millilitres) parsed from a product name"""
+    match = SIZE_PATTERN.search(name or '')
+    if not match:
+        return None
+
+    amount_text, unit = match.groups()
+    if '/' in amount_text:
+        numerator, denominator = amount_text.split('/', 1)
+        amount = float(numerator) / float(denominator) if float(denominator) else 0.0
+    else:
+        amount = float(amount_text.replace(',', '.'))
+
+    unit = unit.lower()
+    if unit.startswith('ק') or unit == 'kg':
+        grams = amount * SIZE_UNIT_GRAMS["kg"]
+    elif unit.startswith('ל') or unit == 'l':
+        grams = amount * SIZE_UNIT_GRAMS["l"]
+    else:
+        grams = amount
+
+    return grams if grams > 0 else None
+
+
+def price_per_kg(price: Optional[float], grams: Optional[float]) -> Optional[float]:
+    if price is None or not grams:
+        return None
+    return round(price * 1000.0 / grams, 2)
+
+
 def get_available_stores() -> List[str]:
     """Get list of available stores (restricted to Nitzat Haduvdevan)"""
     if not STORES_DIR.exists():
@@ -67,22 +1071,40 @@ def get_available_stores() -> List[str]:
     return []
 
 
-def transform_product_to_mcp_format(product: Dict, index: int, store_name: str) -> Dict:
+def product_id_for(store_name: str, product: Dict) -> str:
+    """Product id given to clients: "store:product_key".
+
+    Built from the product rather than its catalog index, so it is the same
+    on every replica whether its catalog was loaded in full or had deltas
+    applied.
+    """
+    return f"{store_name}:{product_key(product)}"
+
+
+def transform_product_to_mcp_format(product: Dict, store_name: str) -> Dict:
     """Transform Weft product format to MCP widget format"""
-    # Create unique ID combining store name and index
-    product_key = f"{store_name}:{index}"
     
     # Build full image URL from the official store website
     image_url = product.get('image', '')
     if image_url and not image_url.startswith('http'):
         # Remove leading slash if present
         image_url = image_url.lstrip('/')
-        # Construct full URL to the site's CDN/domain
-        image_url = f"https://www.nizat.com/{image_url}"
+        if IMAGE_PROXY_BASE_URL and image_cache.normalize_image_path(image_url):
+            # Served (and cached) by this server's /images route
+            image_url = f"{IMAGE_PROXY_BASE_URL}/images/{image_url}"
+        else:
+            # Construct full URL to the site's CDN/domain
+            image_url = f"{IMAGE_ORIGIN}/{image_url}"
+    
+    price = parse_price(product.get('price'))
+    size_grams = parse_size_grams(product.get('name', ''))
     
     return {
-        "id": product_key,
+        "id": product_id_for(store_name, product),
         "name": product.get('name', 'Unknown Product'),
+        "price": price,
+        "size_grams": size_grams,
+        "price_per_kg": price_per_kg(price, size_grams),
         "price_formatted": f"{product.get('price', '0')} ₪",
         "image": image_url,
         "category": product.get('category', ''),
@@ -98,6 +1120,12 @@ def transform_product_to_mcp_format(product: Dict, index: int, store_name: str)
 @mcp._mcp_server.list_resources()
 async def list_resources() -> List[types.Resource]:
     """List available widget resources"""
+    return resource_definitions()
+
+
+@lru_cache(maxsize=1)
+def resource_definitions() -> List[types.Resource]:
+    """Widget resource definitions, built on the first list request"""
     return [
         types.Resource(
             name="Products Widget",
@@ -132,6 +1160,12 @@ async def list_resources() -> List[types.Resource]:
 
 async def handle_read_resource(req: types.ReadResourceRequest) -> types.ServerResult:
     """Read widget HTML content"""
+    meta = req.params.meta.model_dump(exclude_none=True) if req.params.meta else {}
+    with profile_scope(f"resource:{req.params.uri}", meta):
+        return await _read_resource(req)
+
+
+async def _read_resource(req: types.ReadResourceRequest) -> types.ServerResult:
     uri = str(req.params.uri)
     logger.info(f"handle_read_resource called for URI: {uri}")
 
@@ -212,6 +1246,12 @@ async def handle_read_resource(req: types.ReadResourceRequest) -> types.ServerRe
 @mcp._mcp_server.list_tools()
 async def list_tools() -> List[types.Tool]:
     """List available tools with widget metadata"""
+    return tool_definitions()
+
+
+@lru_cache(maxsize=1)
+def tool_definitions() -> List[types.Tool]:
+    """Tool definitions, built on the first list request instead of on every one"""
     return [
         types.Tool(
             name="list_stores",
@@ -229,9 +1269,12 @@ async def list_tools() -> List[types.Tool]:
             description="""Search for Nitzat Haduvdevan products.
             
             You can search by:
-            - Product name (Hebrew or English)
+            - Product name (Hebrew or English, e.g. 'quinoa', 'basmati rice', 'red lentils')
             - Category (e.g., 'דגנים', 'אגוזים', 'קטניות')
-            - Use empty search to see all products""",
+            - Price range (min_price / max_price, in ₪)
+            - Use empty search to see all products
+            
+            Results can be sorted by price or by price per kg.""",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -242,6 +1285,19 @@ async def list_tools() -> List[types.Tool]:
                     "category": {
                         "type": "string",
                         "description": "Optional: filter by category"
+                    },
+                    "min_price": {
+                        "type": "number",
+                        "description": "Optional: minimum price in ₪"
+                    },
+                    "max_price": {
+                        "type": "number",
+                        "description": "Optional: maximum price in ₪ (e.g. 20 for 'under 20 ₪')"
+                    },
+                    "sort": {
+                        "type": "string",
+                        "enum": list(SORT_OPTIONS),
+                        "description": "Optional: 'price_asc' (cheapest first), 'price_desc', or 'price_per_kg' (best value first)"
                     }
                 },
                 "required": ["search"]
@@ -257,6 +1313,132 @@ async def list_tools() -> List[types.Tool]:
                 "readOnlyHint": True,
             }
         ),
+        types.Tool(
+            name="search_shopping_list",
+            title="Search Shopping List",
+            description="""Search for every item of a shopping list in one call, e.g. "rice, lentils, flour and tahini".
+
+            Returns the matching products grouped per item. Use this instead of one search_products call per item.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "description": f"The items to search for, one search term each (up to {SHOPPING_LIST_MAX_QUERIES})",
+                        "items": {"type": "string"}
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": f"Products to return per item (1-{SHOPPING_LIST_LIMIT})",
+                        "default": 5
+                    }
+                },
+                "required": ["queries"]
+            },
+            _meta={
+                "openai/outputTemplate": PRODUCTS_WIDGET_URI,
+                "openai/widgetAccessible": True,
+                "openai/resultCanProduceWidget": True,
+            },
+            annotations={
+                "destructiveHint": False,
+                "openWorldHint": False,
+                "readOnlyHint": True,
+            }
+        ),
+        types.Tool(
+            name="similar_products",
+            title="Similar Products",
+            description="""Find the products most similar to a given product (alternatives, similar items).
+
+            Use this instead of guessing follow-up searches, e.g. after a product was added to the cart.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "product_id": {"type": "string", "description": "The product ID (format: 'store:key')"},
+                    "limit": {
+                        "type": "integer",
+                        "description": f"Number of similar products to return (1-{SIMILAR_PRODUCTS_LIMIT})",
+                        "default": 5
+                    }
+                },
+                "required": ["product_id"]
+            },
+            _meta={
+                "openai/outputTemplate": PRODUCTS_WIDGET_URI,
+                "openai/widgetAccessible": True,
+                "openai/resultCanProduceWidget": True,
+            },
+            annotations={
+                "destructiveHint": False,
+                "openWorldHint": False,
+                "readOnlyHint": True,
+            }
+        ),
+        types.Tool(
+            name="category_price_stats",
+            title="Category Price Statistics",
+            description="""Price statistics per category: number of products, min, max, median and mean price, and price per kg where the package size is known.
+
+            Use this for questions like "what's the price range for legumes?" instead of searching all products.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "description": "Optional: a single category (e.g. 'קטניות'). Omit for all categories."}
+                },
+                "required": []
+            },
+            annotations={
+                "destructiveHint": False,
+                "openWorldHint": False,
+                "readOnlyHint": True,
+            }
+        ),
+        types.Tool(
+            name="autocomplete",
+            title="Autocomplete",
+            description="""Complete a partial query: the most common product-name words and category names starting with a prefix.
+
+            Use this to turn a vague or partial query (e.g. 'אור') into a precise search_products term in one step.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "prefix": {"type": "string", "description": "The beginning of a word or category name"},
+                    "limit": {
+                        "type": "integer",
+                        "description": f"Number of completions to return (1-{AUTOCOMPLETE_LIMIT})",
+                        "default": 8
+                    }
+                },
+                "required": ["prefix"]
+            },
+            annotations={
+                "destructiveHint": False,
+                "openWorldHint": False,
+                "readOnlyHint": True,
+            }
+        ),
+        types.Tool(
+            name="price_history",
+            title="Price History",
+            description="""Price changes across store updates.
+
+            Without product_id: products whose price changed since a date (default: since the previous update).
+            With product_id: that product's price history and the lowest price seen.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "product_id": {"type": "string", "description": "Optional: a product ID (format: 'store:key')"},
+                    "since": {"type": "string", "description": "Optional: ISO date, e.g. '2025-11-01'"}
+                },
+                "required": []
+            },
+            annotations={
+                "destructiveHint": False,
+                "openWorldHint": False,
+                "readOnlyHint": True,
+            }
+        ),
         types.Tool(
             name="add_to_cart",
             title="Add to Cart",
@@ -264,12 +1446,49 @@ async def list_tools() -> List[types.Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "product_id": {"type": "string", "description": "The product ID (format: 'store:index')"},
+                    "product_id": {"type": "string", "description": "The product ID (format: 'store:key')"},
                     "quantity": {"type": "integer", "description": "Number of items", "default": 1}
                 },
                 "required": ["product_id"]
             }
         ),
+        types.Tool(
+            name="update_cart",
+            title="Update Cart",
+            description="""Add, update or remove many cart items in a single call.
+
+            Use this instead of repeated add_to_cart calls when building a shopping list.
+            All operations are applied together: if any operation is invalid, the cart is left unchanged.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "operations": {
+                        "type": "array",
+                        "description": "Cart operations to apply in order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "product_id": {"type": "string", "description": "The product ID (format: 'store:key')"},
+                                "quantity": {"type": "integer", "description": "Quantity to add or set", "default": 1},
+                                "action": {
+                                    "type": "string",
+                                    "enum": ["add", "set", "remove"],
+                                    "description": "'add' increases the quantity, 'set' replaces it (0 removes), 'remove' deletes the item",
+                                    "default": "add"
+                                }
+                            },
+                            "required": ["product_id"]
+                        }
+                    }
+                },
+                "required": ["operations"]
+            },
+            _meta={
+                "openai/outputTemplate": CART_WIDGET_URI,
+                "openai/widgetAccessible": True,
+                "openai/resultCanProduceWidget": True,
+            }
+        ),
         types.Tool(
             name="view_cart",
             title="View Cart",
@@ -333,15 +1552,36 @@ def list_stores_func() -> str:
     if not stores:
         return "לא נמצאה חנות נתמכת. ודא שקיים קובץ data/products.json תחת stores/nitzat-haduvdevan."
     
-    products = load_store_products(DEFAULT_STORE)
-    count = len(products)
+    catalog = get_store_catalog(DEFAULT_STORE)
+    count = len(catalog) if catalog else 0
     return f"🏪 **חנויות זמינות:**\n• **Nitzat Haduvdevan**\n  מוצרים: {count}\n"
 
 
-def search_products(search: str = "", store: str = None, category: str = None) -> types.CallToolResult:
+def search_products(search: str = "", store: str = None, category: str = None,
+                    min_price: float = None, max_price: float = None, sort: str = None) -> types.CallToolResult:
     """Search for products in the Nitzat Haduvdevan store"""
-    logger.info(f"search_products called with search='{search}', store='{store}', category='{category}'")
+    logger.info(
+        f"search_products called with search='{search}', store='{store}', category='{category}', "
+        f"min_price={min_price}, max_price={max_price}, sort={sort}"
+    )
     
+    def invalid(message: str) -> types.CallToolResult:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text=f"❌ {message}")],
+            structuredContent={"products": [], "error": message},
+            isError=True
+        )
+
+    if sort and sort not in SORT_OPTIONS:
+        return invalid(f"Unknown sort '{sort}', expected one of {', '.join(SORT_OPTIONS)}")
+    bounds = []
+    for name, value in (("min_price", min_price), ("max_price", max_price)):
+        price = None if value in (None, "") else parse_price(value)
+        if value not in (None, "") and (isinstance(value, bool) or price is None or not math.isfinite(price)):
+            return invalid(f"ערך לא תקין ל-{name}: '{value}' (יש לציין מספר)")
+        bounds.append(price)
+    min_price, max_price = bounds
+
     try:
         all_products = []
         stores_to_search = get_available_stores()
@@ -369,19 +1609,13 @@ def search_products(search: str = "", store: str = None, category: str = None) -
             )
         
         for store_name in stores_to_search:
-            products = load_store_products(store_name)
+            catalog = get_store_catalog(store_name)
+            if catalog is None:
+                continue
             
-            for idx, product in enumerate(products):
-                # Apply filters
-                if search and search.lower() not in product.get('name', '').lower():
-                    continue
-                
-                if category and category.lower() != product.get('category', '').lower():
-                    continue
-                
-                # Transform and add
-                transformed = transform_product_to_mcp_format(product, idx, store_name)
-                all_products.append(transformed)
+            # Indexed lookup; items are already in MCP widget format
+            for idx in catalog.query(search, category, min_price, max_price, sort):
+                all_products.append(catalog.items[idx])
         
         if not all_products:
             return types.CallToolResult(
@@ -396,10 +1630,11 @@ def search_products(search: str = "", store: str = None, category: str = None) -
         
         # Format for text output
         text_result = []
-        for product in all_products:
+        for product in all_products[:10]:
+            per_kg = f"\n  מחיר לק\"ג: {product['price_per_kg']:.2f} ₪" if product.get('price_per_kg') else ""
             text_result.append(
                 f"• {product['name']}\n"
-                f"  מחיר: {product['price_formatted']}\n"
+                f"  מחיר: {product['price_formatted']}{per_kg}\n"
                 f"  קטגוריה: {product['category']}\n"
                 f"  מזהה: {product['id']}"
             )
@@ -429,45 +1664,252 @@ def search_products(search: str = "", store: str = None, category: str = None) -
         )
 
 
+def search_shopping_list(queries: List[str], limit: int = 5) -> types.CallToolResult:
+    """Search several items of a shopping list in one pass, with results grouped per query"""
+    logger.info(f"search_shopping_list called with {len(queries or [])} queries, limit={limit}")
+
+    queries = [str(query).strip() for query in (queries or []) if str(query).strip()]
+    if not queries:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text="❌ יש לציין לפחות מוצר אחד לחיפוש")],
+            structuredContent={"results": [], "products": []},
+            isError=True
+        )
+    queries = queries[:SHOPPING_LIST_MAX_QUERIES]
+    limit = max(1, min(int(limit or 5), SHOPPING_LIST_LIMIT))
+
+    catalog = get_store_catalog(DEFAULT_STORE)
+    if catalog is None:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text="חנות Nitzat Haduvdevan אינה זמינה (חסר קובץ products.json).")],
+            structuredContent={"results": [], "products": []}
+        )
+
+    results = []
+    products = []
+    text_result = []
+    for query, matches in zip(queries, catalog.search_many(queries)):
+        items = [catalog.items[idx] for idx in matches[:limit]]
+        results.append({"query": query, "total": len(matches), "products": items})
+        products.extend(items)
+
+        if items:
+            lines = [f"  • {item['name']} - {item['price_formatted']} (מזהה: {item['id']})" for item in items]
+            text_result.append(f"🔎 **{query}** ({len(matches)} מוצרים):\n" + "\n".join(lines))
+        else:
+            text_result.append(f"🔎 **{query}**: לא נמצאו מוצרים")
+
+    return types.CallToolResult(
+        content=[types.TextContent(type="text", text="\n\n".join(text_result))],
+        structuredContent={"results": results, "products": products}
+    )
+
+
+def similar_products(product_id: str, limit: int = 5) -> types.CallToolResult:
+    """Products most similar to a given product (by name and category)"""
+    def error_result(message: str) -> types.CallToolResult:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text=f"❌ {message}")],
+            structuredContent={"products": [], "error": message},
+            isError=True
+        )
+
+    store_name, _, key = (product_id or "").partition(':')
+    catalog = get_store_catalog(store_name) if key else None
+    index = catalog.lookup(product_id) if catalog else None
+    if index is None:
+        return error_result("מוצר לא נמצא. יש להשתמש במזהה שהתקבל מחיפוש המוצרים.")
+
+    limit = max(1, min(int(limit or 5), SIMILAR_PRODUCTS_LIMIT))
+    neighbours = catalog_derived(store_name, catalog, "similarity", build_similarity_index).most_similar(index, limit)
+
+    source = catalog.items[index]
+    products = []
+    text_result = []
+    for idx, score in neighbours:
+        item = dict(catalog.items[idx], similarity=round(score, 3))
+        products.append(item)
+        text_result.append(
+            f"• {item['name']}\n"
+            f"  מחיר: {item['price_formatted']}\n"
+            f"  קטגוריה: {item['category']}\n"
+            f"  מזהה: {item['id']}"
+        )
+
+    header = f"מוצרים דומים ל{source['name']}:" if products else "לא נמצאו מוצרים דומים"
+    return types.CallToolResult(
+        content=[types.TextContent(type="text", text=header + "\n\n" + "\n\n".join(text_result))],
+        structuredContent={"products": products, "source": source}
+    )
+
+
+def category_price_stats(category: str = None) -> types.CallToolResult:
+    """Per-category price statistics (count, min, max, median, mean, price per kg)"""
+    catalog = get_store_catalog(DEFAULT_STORE)
+    if catalog is None:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text="חנות Nitzat Haduvdevan אינה זמינה (חסר קובץ products.json).")],
+            structuredContent={"categories": []}
+        )
+
+    stats = catalog_derived(DEFAULT_STORE, catalog, "price_stats", build_price_stats)
+    if category:
+        stats = [entry for entry in stats if entry["category"].lower() == category.lower()]
+    if not stats:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text="לא נמצאה קטגוריה מתאימה")],
+            structuredContent={"categories": []}
+        )
+
+    text_result = []
+    for entry in stats:
+        line = (
+            f"• {entry['category']}: {entry['count']} מוצרים, "
+            f"{entry['min']:.2f}–{entry['max']:.2f} ₪, חציון {entry['median']:.2f} ₪, ממוצע {entry['mean']:.2f} ₪"
+        )
+        if entry["price_per_kg"]:
+            line += f"\n  לק\"ג: {entry['price_per_kg']['min']:.2f}–{entry['price_per_kg']['max']:.2f} ₪, חציון {entry['price_per_kg']['median']:.2f} ₪"
+        text_result.append(line)
+
+    return types.CallToolResult(
+        content=[types.TextContent(type="text", text="📊 **מחירים לפי קטגוריה:**\n\n" + "\n".join(text_result))],
+        structuredContent={"categories": stats}
+    )
+
+
+def autocomplete_products(prefix: str = "", limit: int = 8) -> types.CallToolResult:
+    """Popular product-name words and categories starting with `prefix`"""
+    catalog = get_store_catalog(DEFAULT_STORE)
+    if catalog is None:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text="חנות Nitzat Haduvdevan אינה זמינה (חסר קובץ products.json).")],
+            structuredContent={"prefix": prefix, "suggestions": []}
+        )
+
+    limit = max(1, min(int(limit or 8), AUTOCOMPLETE_LIMIT))
+    completions = catalog_derived(DEFAULT_STORE, catalog, "completions", build_completions).complete(prefix, limit)
+    suggestions = [{"text": text, "type": kind, "count": count} for text, kind, count in completions]
+
+    text = ", ".join(s["text"] for s in suggestions) if suggestions else "אין השלמות מתאימות"
+    return types.CallToolResult(
+        content=[types.TextContent(type="text", text=text)],
+        structuredContent={"prefix": prefix, "suggestions": suggestions}
+    )
+
+
+def price_history_func(product_id: str = None, since: str = None) -> types.CallToolResult:
+    """Price changes since a date, or the price history and lowest price of one product"""
+    def error_result(message: str) -> types.CallToolResult:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text=f"❌ {message}")],
+            structuredContent={"changes": [], "error": message},
+            isError=True
+        )
+
+    catalog = get_store_catalog(DEFAULT_STORE)
+    if catalog is None:
+        return error_result("חנות Nitzat Haduvdevan אינה זמינה (חסר קובץ products.json).")
+    history = get_price_history(DEFAULT_STORE)
+    if not history.scrapes:
+        return error_result("אין עדיין היסטוריית מחירים.")
+
+    if product_id:
+        index = catalog.lookup(product_id)
+        if index is None:
+            return error_result("מוצר לא נמצא. יש להשתמש במזהה שהתקבל מחיפוש המוצרים.")
+        item = catalog.items[index]
+        key = product_key(catalog.products[index])
+        series = [{"scrapedAt": scraped_at, "price": price} for scraped_at, price in history.series(key)]
+        lowest = history.lowest(key)
+        lowest = {"price": lowest[0], "scrapedAt": lowest[1]} if lowest else None
+
+        lines = [f"• {entry['scrapedAt'][:10]}: {entry['price']:.2f} ₪" for entry in series]
+        text = f"📈 **היסטוריית מחיר: {item['name']}**\n\n" + "\n".join(lines)
+        if lowest:
+            text += f"\n\nהמחיר הנמוך ביותר: {lowest['price']:.2f} ₪ ({lowest['scrapedAt'][:10]})"
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text=text)],
+            structuredContent={"product": item, "history": series, "lowest": lowest}
+        )
+
+    # Default: changes since the previous scrape
+    if not since:
+        since = history.scrapes[-2]["scrapedAt"] if len(history.scrapes) > 1 else history.scrapes[-1]["scrapedAt"]
+
+    changes = []
+    for change in history.changes_since(since):
+        idx = catalog.key_index.get(change["key"])
+        if idx is None or change["before"] is None:
+            continue
+        item = catalog.items[idx]
+        changes.append({
+            "id": item["id"],
+            "name": item["name"],
+            "category": item["category"],
+            "before": change["before"],
+            "now": change["now"],
+            "change_percent": round((change["now"] - change["before"]) / change["before"] * 100, 1) if change["before"] else None,
+        })
+    changes.sort(key=lambda change: -abs(change["now"] - change["before"]))
+    changes = changes[:PRICE_CHANGES_LIMIT]
+
+    if not changes:
+        text = f"לא היו שינויי מחיר מאז {since[:10]}"
+    else:
+        text = f"💰 **שינויי מחיר מאז {since[:10]}:**\n\n" + "\n".join(
+            f"• {change['name']}: {change['before']:.2f} ₪ → {change['now']:.2f} ₪" for change in changes
+        )
+    return types.CallToolResult(
+        content=[types.TextContent(type="text", text=text)],
+        structuredContent={"since": since, "changes": changes}
+    )
+
+
 async def add_to_cart(ctx: Context, product_id: str, quantity: int = 1) -> str:
     """Add a product to cart"""
     session_id = ctx.session_id
     
+    count = parse_quantity(quantity)
+    if count is None:
+        return f"❌ כמות לא תקינה ({quantity}). יש לציין מספר שלם חיובי."
+    quantity = count
+    
     try:
-        # Parse product_id (format: "store:index")
+        # Parse product_id (format: "store:product_key")
         if ':' not in product_id:
             return "❌ מזהה מוצר לא תקין. יש להשתמש במזהה שהתקבל מחיפוש המוצרים."
         
-        store_name, index_str = product_id.split(':', 1)
-        index = int(index_str)
+        store_name = product_id.split(':', 1)[0]
         
         # Load product
-        products = load_store_products(store_name)
-        if index >= len(products):
+        catalog = get_store_catalog(store_name)
+        index = catalog.lookup(product_id) if catalog else None
+        if index is None:
             return "❌ מוצר לא נמצא"
         
-        product = products[index]
+        product = catalog.products[index]
         
-        # Initialize cart if needed
-        if session_id not in user_carts:
-            user_carts[session_id] = {}
-        
-        # Add to cart
-        if product_id in user_carts[session_id]:
-            user_carts[session_id][product_id]['quantity'] += quantity
-        else:
-            user_carts[session_id][product_id] = {
-                'product': product,
-                'store': store_name,
-                'quantity': quantity
-            }
-        
-        # Calculate total
-        total = sum(
-            float(item['product']['price']) * item['quantity']
-            for item in user_carts[session_id].values()
-        )
-        items_count = len(user_carts[session_id])
+        with cart_lock(session_id):
+            # Initialize cart if needed
+            cart = user_carts.setdefault(session_id, {})
+            
+            # Add to cart
+            if product_id in cart:
+                cart[product_id]['quantity'] += quantity
+            else:
+                cart[product_id] = {
+                    'product': product,
+                    'store': store_name,
+                    'quantity': quantity
+                }
+            _cart_changed(session_id)
+            
+            # Calculate total
+            total = sum(
+                float(item['product']['price']) * item['quantity']
+                for item in cart.values()
+            )
+            items_count = len(cart)
         
         return f"✓ המוצר נוסף לעגלה!\n\n{product['name']}\nכמות: {quantity}\n\nסה\"כ פריטים בעגלה: {items_count}\nסכום כולל: {total:.2f} ₪"
     
@@ -476,11 +1918,119 @@ async def add_to_cart(ctx: Context, product_id: str, quantity: int = 1) -> str:
         return f"❌ שגיאה בהוספה לעגלה: {str(e)}"
 
 
+async def update_cart(ctx: Context, operations: List[Dict]) -> types.CallToolResult:
+    """Apply a batch of cart operations atomically and return the updated cart"""
+    session_id = ctx.session_id
+
+    def error_result(message: str) -> types.CallToolResult:
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text=f"❌ {message}\n\nהעגלה לא שונתה.")],
+            structuredContent={"error": message},
+            isError=True
+        )
+
+    if not isinstance(operations, list) or not operations:
+        return error_result("יש לספק רשימת פעולות לא ריקה")
+
+    with cart_lock(session_id):
+        # Work on a copy so a failing operation leaves the cart untouched
+        cart = {pid: dict(item) for pid, item in user_carts.get(session_id, {}).items()}
+        catalogs = {}
+
+        for position, op in enumerate(operations, start=1):
+            if not isinstance(op, dict):
+                return error_result(f"פעולה {position}: פורמט לא תקין")
+
+            product_id = op.get('product_id') or ''
+            action = op.get('action', 'add')
+            quantity = op.get('quantity', 1)
+
+            if action not in ('add', 'set', 'remove'):
+                return error_result(f"פעולה {position}: סוג פעולה לא מוכר '{action}'")
+
+            if action == 'remove':
+                cart.pop(product_id, None)
+                continue
+
+            # 'set' to 0 removes the item; 'add' needs at least one
+            count = parse_quantity(quantity, minimum=1 if action == 'add' else 0)
+            if count is None:
+                return error_result(f"פעולה {position}: כמות לא תקינה ({quantity})")
+            quantity = count
+
+            if action == 'set' and quantity == 0:
+                cart.pop(product_id, None)
+                continue
+
+            if ':' not in product_id:
+                return error_result(f"פעולה {position}: מזהה מוצר לא תקין '{product_id}'")
+
+            store_name = product_id.split(':', 1)[0]
+
+            # Load each store's catalog once per batch
+            if store_name not in catalogs:
+                catalogs[store_name] = get_store_catalog(store_name)
+            catalog = catalogs[store_name]
+
+            index = catalog.lookup(product_id) if catalog else None
+            if index is None:
+                return error_result(f"פעולה {position}: מוצר לא נמצא '{product_id}'")
+
+            if product_id in cart and action == 'add':
+                cart[product_id]['quantity'] += quantity
+            elif product_id in cart:
+                cart[product_id]['quantity'] = quantity
+            else:
+                cart[product_id] = {
+                    'product': catalog.products[index],
+                    'store': store_name,
+                    'quantity': quantity
+                }
+
+        user_carts[session_id] = cart
+        _cart_changed(session_id)
+
+    logger.info(f"update_cart applied {len(operations)} operations for session {session_id}")
+
+    cart_result = await view_cart(ctx)
+    summary = f"✓ בוצעו {len(operations)} פעולות בעגלה\n\n"
+    return types.CallToolResult(
+        content=[
+            types.TextContent(
+                type="text",
+                text=summary + cart_result.content[0].text
+            )
+        ],
+        structuredContent=cart_result.structuredContent
+    )
+
+
 async def view_cart(ctx: Context) -> types.CallToolResult:
     """View cart contents with visual widget"""
     session_id = ctx.session_id
     
-    if session_id not in user_carts or not user_carts[session_id]:
+    # Snapshot the cart so rendering never sees a half-applied mutation.
+    # An unchanged cart (same version, same dict) reuses its last rendering.
+    with cart_lock(session_id):
+        cart = user_carts.get(session_id)
+        version = cart_versions.get(session_id, 0)
+        cached = _cart_views.get(session_id)
+        if cached and cached[0] == version and cached[1] is cart:
+            return cached[2]
+        cart_items = [(pid, dict(item)) for pid, item in (cart or {}).items()]
+    
+    result = _render_cart(cart_items, version)
+    
+    with cart_lock(session_id):
+        if cart_versions.get(session_id, 0) == version and user_carts.get(session_id) is cart:
+            _cart_views[session_id] = (version, cart, result)
+    
+    return result
+
+
+def _render_cart(cart_items: List[tuple], version: int) -> types.CallToolResult:
+    """Build the view_cart result for a snapshot of cart items"""
+    if not cart_items:
         return types.CallToolResult(
             content=[
                 types.TextContent(
@@ -488,14 +2038,14 @@ async def view_cart(ctx: Context) -> types.CallToolResult:
                     text="העגלה ריקה 🛒"
                 )
             ],
-            structuredContent={"items": [], "total": 0}
+            structuredContent={"items": [], "total": 0, "version": version}
         )
     
     items = []
     total = 0
     text_result = ["🛒 **העגלה שלך:**\n"]
     
-    for product_id, item in user_carts[session_id].items():
+    for product_id, item in cart_items:
         product = item['product']
         quantity = item['quantity']
         store_name = item['store']
@@ -503,11 +2053,8 @@ async def view_cart(ctx: Context) -> types.CallToolResult:
         line_total = price * quantity
         total += line_total
         
-        # Get product index from product_id (format: "store:index")
-        index = int(product_id.split(':')[1])
-        
         # Transform product to get proper image URL
-        transformed = transform_product_to_mcp_format(product, index, store_name)
+        transformed = transform_product_to_mcp_format(product, store_name)
         
         # Add to items array for widget
         items.append({
@@ -535,7 +2082,7 @@ async def view_cart(ctx: Context) -> types.CallToolResult:
                 text="\n".join(text_result)
             )
         ],
-        structuredContent={"items": items, "total": total}
+        structuredContent={"items": items, "total": total, "version": version}
     )
 
 
@@ -543,21 +2090,23 @@ async def remove_from_cart(ctx: Context, product_id: str) -> str:
     """Remove item from cart"""
     session_id = ctx.session_id
     
-    if session_id not in user_carts or product_id not in user_carts[session_id]:
-        return "❌ המוצר לא נמצא בעגלה"
-    
-    product_name = user_carts[session_id][product_id]['product']['name']
-    del user_carts[session_id][product_id]
-    
-    if not user_carts[session_id]:
-        return f"✓ {product_name} הוסר מהעגלה!\n\nהעגלה ריקה כעת."
-    
-    # Calculate new total
-    total = sum(
-        float(item['product']['price']) * item['quantity']
-        for item in user_carts[session_id].values()
-    )
-    items_count = len(user_carts[session_id])
+    with cart_lock(session_id):
+        cart = user_carts.get(session_id)
+        if not cart or product_id not in cart:
+            return "❌ המוצר לא נמצא בעגלה"
+        
+        product_name = cart.pop(product_id)['product']['name']
+        _cart_changed(session_id)
+        
+        if not cart:
+            return f"✓ {product_name} הוסר מהעגלה!\n\nהעגלה ריקה כעת."
+        
+        # Calculate new total
+        total = sum(
+            float(item['product']['price']) * item['quantity']
+            for item in cart.values()
+        )
+        items_count = len(cart)
     
     return f"✓ {product_name} הוסר מהעגלה!\n\nסה\"כ פריטים: {items_count}\nסכום כולל: {total:.2f} ₪"
 
@@ -566,8 +2115,10 @@ async def clear_cart(ctx: Context) -> str:
     """Clear entire cart"""
     session_id = ctx.session_id
     
-    if session_id in user_carts:
-        user_carts[session_id] = {}
+    with cart_lock(session_id):
+        if session_id in user_carts:
+            user_carts[session_id] = {}
+            _cart_changed(session_id)
     
     return "✓ העגלה נוקתה"
 
@@ -576,9 +2127,11 @@ async def debug_session(ctx: Context) -> str:
     """Debug session information"""
     session_id = ctx.session_id
     
-    # Gather session stats
-    total_sessions = len(user_carts)
-    cart = user_carts.get(session_id, {})
+    # Gather session stats (copy first: other sessions may mutate concurrently)
+    all_carts = dict(user_carts)
+    total_sessions = len(all_carts)
+    with cart_lock(session_id):
+        cart = dict(all_carts.get(session_id, {}))
     items_count = len(cart)
     
     # Calculate total for this session
@@ -600,9 +2153,9 @@ async def debug_session(ctx: Context) -> str:
     # Show other sessions (without exposing their contents)
     if total_sessions > 1:
         result.append("**Other Active Sessions:**")
-        for sid in user_carts.keys():
+        for sid, other_cart in all_carts.items():
             if sid != session_id:
-                other_cart_size = len(user_carts[sid])
+                other_cart_size = len(other_cart)
                 result.append(f"  - Session `{sid[:12]}...`: {other_cart_size} items")
     elif total_sessions == 1:
         result.append("**No other active sessions**")
@@ -627,12 +2180,21 @@ async def handle_call_tool(req: types.CallToolRequest) -> types.ServerResult:
     
     logger.info(f"handle_call_tool called: {tool_name}")
     logger.info(f"Arguments: {arguments}")
+
+    tool_class = TOOL_CLASSES.get(tool_name)
+    if tool_class is None:
+        return types.ServerResult(
+            types.CallToolResult(
+                content=[types.TextContent(type="text", text=f"Unknown tool: {tool_name}")],
+                isError=True
+            )
+        )
     
     # Extract session_id - try multiple sources
     session_id = None
     
     # Try to extract from request metadata
-    params_meta = getattr(req.params, '_meta', {})
+    params_meta = req.params.meta.model_dump(exclude_none=True) if req.params.meta else {}
     request_meta = getattr(req, '_meta', {})
     
     # Log what we received for debugging
@@ -649,6 +2211,8 @@ async def handle_call_tool(req: types.CallToolRequest) -> types.ServerResult:
         arguments.get('_sessionId')  # Sometimes in arguments
     )
     
+    # Anonymous calls are not rate limited per session (see AdmissionController.admit)
+    rate_key = session_id or None
     if session_id:
         logger.info(f"✓ Using session ID: {session_id}")
     else:
@@ -659,6 +2223,61 @@ async def handle_call_tool(req: types.CallToolRequest) -> types.ServerResult:
     
     logger.info(f"Final Session ID: {session_id}")
     
+    with profile_scope(f"tool:{tool_name}", params_meta):
+        try:
+            async with admission_controller.admit(tool_class, rate_key):
+                use_cart_token = bool(CART_TOKEN_SECRET) and tool_name in CART_TOOLS
+                if use_cart_token:
+                    token = params_meta.get('cartToken') or arguments.get('_cartToken')
+                    if token:
+                        restore_cart_from_token(session_id, token)
+
+                result = await _dispatch_tool(tool_name, arguments, session_id)
+                if use_cart_token:
+                    result = with_cart_token(result, session_id)
+                return result
+        except admission.Overloaded as e:
+            logger.warning(f"Rejected {tool_name} for session {session_id}: {e.reason}")
+            return types.ServerResult(overloaded_result(e))
+
+
+def profile_scope(label: str, meta: Dict):
+    """Profiling context for one handler call; a no-op unless the call is selected"""
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return profiler.profile(label)
+    if PROFILE_ON_DEMAND and _profile_requested(meta):
+        return profiler.profile(label)
+    return contextlib.nullcontext()
+
+
+def _profile_requested(meta: Dict) -> bool:
+    if meta.get("profile"):
+        return True
+    try:
+        request = mcp._mcp_server.request_context.request
+    except LookupError:
+        return False
+    return request is not None and request.headers.get("x-profile") == "1"
+
+
+def overloaded_result(error: admission.Overloaded) -> types.CallToolResult:
+    """Retryable error returned when a call is shed under load"""
+    retry_after = max(1, round(error.retry_after))
+    return types.CallToolResult(
+        content=[
+            types.TextContent(
+                type="text",
+                text=f"⏳ השרת עמוס כרגע. אפשר לנסות שוב בעוד {retry_after} שניות."
+            )
+        ],
+        structuredContent={"error": error.reason, "retryable": True, "retryAfter": retry_after},
+        isError=True,
+        _meta={"retryable": True, "retryAfterMs": int(error.retry_after * 1000), "reason": error.reason}
+    )
+
+
+async def _dispatch_tool(tool_name: str, arguments: Dict, session_id: str) -> types.ServerResult:
+    """Run an admitted tool call"""
     try:
         if tool_name == "list_stores":
             result = list_stores_func()
@@ -672,7 +2291,54 @@ async def handle_call_tool(req: types.CallToolRequest) -> types.ServerResult:
             search = arguments.get("search", "")
             store = arguments.get("store")
             category = arguments.get("category")
-            result = search_products(search=search, store=store, category=category)
+            search_args = dict(
+                search=search,
+                store=store,
+                category=category,
+                min_price=arguments.get("min_price"),
+                max_price=arguments.get("max_price"),
+                sort=arguments.get("sort")
+            )
+            # Identical concurrent searches (matching is case-insensitive) share one run;
+            # catalog work runs off the event loop so admission keeps responding under load
+            key = repr((
+                str(search or "").lower(), store, str(category).lower() if category else None,
+                search_args["min_price"], search_args["max_price"], search_args["sort"]
+            ))
+            result = await search_flights.do(key, lambda: asyncio.to_thread(search_products, **search_args))
+            return types.ServerResult(result)
+        
+        elif tool_name == "search_shopping_list":
+            result = await asyncio.to_thread(
+                search_shopping_list,
+                queries=arguments.get("queries", []),
+                limit=arguments.get("limit", 5)
+            )
+            return types.ServerResult(result)
+        
+        elif tool_name == "similar_products":
+            result = await asyncio.to_thread(
+                similar_products,
+                product_id=arguments.get("product_id"),
+                limit=arguments.get("limit", 5)
+            )
+            return types.ServerResult(result)
+        
+        elif tool_name == "category_price_stats":
+            result = await asyncio.to_thread(category_price_stats, category=arguments.get("category"))
+            return types.ServerResult(result)
+        
+        elif tool_name == "autocomplete":
+            # A trie lookup is microseconds, cheaper than a thread hop
+            result = autocomplete_products(prefix=arguments.get("prefix", ""), limit=arguments.get("limit", 8))
+            return types.ServerResult(result)
+        
+        elif tool_name == "price_history":
+            result = await asyncio.to_thread(
+                price_history_func,
+                product_id=arguments.get("product_id"),
+                since=arguments.get("since")
+            )
             return types.ServerResult(result)
         
         elif tool_name == "add_to_cart":
@@ -688,6 +2354,13 @@ async def handle_call_tool(req: types.CallToolRequest) -> types.ServerResult:
                 )
             )
         
+        elif tool_name == "update_cart":
+            operations = arguments.get("operations", [])
+            from types import SimpleNamespace
+            ctx = SimpleNamespace(session_id=session_id)
+            result = await update_cart(ctx, operations)
+            return types.ServerResult(result)
+        
         elif tool_name == "view_cart":
             from types import SimpleNamespace
             ctx = SimpleNamespace(session_id=session_id)
@@ -748,17 +2421,81 @@ mcp._mcp_server.request_handlers[types.CallToolRequest] = handle_call_tool
 mcp._mcp_server.request_handlers[types.ReadResourceRequest] = handle_read_resource
 
 
+@mcp.custom_route("/ready", methods=["GET"])
+async def readiness(request: Request) -> JSONResponse:
+    """Readiness probe: 200 once store catalogs are loaded, 503 before"""
+    if not _ready.is_set():
+        return JSONResponse({"status": "loading"}, status_code=503)
+
+    stores = {}
+    for store_name, (_, catalog) in list(_catalogs.items()):
+        stores[store_name] = {"products": len(catalog), "scrapedAt": catalog.scraped_at}
+    return JSONResponse({
+        "status": "ready",
+        "stores": stores,
+        "admission": admission_controller.stats(),
+        "coalescing": {
+            "catalog_loads": catalog_loads.stats(),
+            "searches": search_flights.stats(),
+            "images": image_fetches.stats(),
+        },
+    })
+
+
+@mcp.custom_route("/debug/profile", methods=["GET"])
+async def profile_dump(request: Request) -> Response:
+    """Collapsed stacks of profiled calls (?format=summary for per-call timings, ?reset=1 to clear)"""
+    if PROFILE_SAMPLE_RATE <= 0 and not PROFILE_ON_DEMAND:
+        return Response("Not found", status_code=404)
+    if PROFILE_TOKEN and not hmac.compare_digest(request.query_params.get("token", ""), PROFILE_TOKEN):
+        return Response("Forbidden", status_code=403)
+
+    if request.query_params.get("format") == "summary":
+        response = JSONResponse(profiler.summary())
+    else:
+        response = Response(profiler.collapsed(), media_type="text/plain")
+
+    if request.query_params.get("reset") == "1":
+        profiler.reset()
+    return response
+
+
+@mcp.custom_route("/images/{path:path}", methods=["GET"])
+async def image_proxy(request: Request) -> Response:
+    """Serve a product image from the disk cache, fetching it from the store once.
+
+    Only images of catalog products are served, so arbitrary origin paths
+    cannot fill (and evict from) the cache.
+    """
+    global _image_client
+    path = image_cache.normalize_image_path(request.path_params.get("path", ""))
+    if path is None or not await asyncio.to_thread(is_catalog_image, path):
+        return Response("Not found", status_code=404)
+
+    if _image_client is None:
+        _image_client = httpx.AsyncClient(timeout=30.0)
+
+    data = await image_cache.fetch_image(get_image_cache(), _image_client, IMAGE_ORIGIN, path, image_fetches)
+    if data is None:
+        return Response("Image unavailable", status_code=502)
+
+    return Response(
+        data,
+        media_type=image_cache.content_type_for(path),
+        headers={"Cache-Control": image_cache.CACHE_CONTROL}
+    )
+
+
 if __name__ == "__main__":
     print(f"Starting Weft MCP Server on port {PORT}")
     print(f"MCP endpoint: http://0.0.0.0:{PORT}/mcp")
+    print(f"Readiness probe: http://0.0.0.0:{PORT}/ready")
     print(f"Loading stores from: {STORES_DIR}")
+    print(f"\nAvailable stores ({len(get_available_stores())}):")
     
-    # List available stores
-    stores = get_available_stores()
-    print(f"\nAvailable stores ({len(stores)}):")
-    for store in stores:
-        products = load_store_products(store)
-        print(f"  - {store}: {len(products)} products")
+    # Load catalogs in the background once the port is bound;
+    # /ready reports 503 until they are available
+    threading.Thread(target=warm_start_after_bind, args=(PORT,), name="catalog-warm-start", daemon=True).start()
     
     mcp.run(transport="http")
 
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Product similarity
+Products become TF-IDF weighted character-trigram vectors (plus their
+category), L2-normalised so a dot product is the cosine similarity. A
+product only has a few dozen terms, so the vectors are stored sparse, as
+NumPy index arrays in both row (CSR) and column (CSC) order: memory grows
+with the number of (product, term) pairs, a few hundred bytes per product,
+not with catalog size times vocabulary. The scores against one product
+are summed over the columns (posting lists) of its own terms.
+
+The features are taken from the catalog's existing search index posting
+lists, so nothing is re-tokenised when the vectors are built.
+"""
+
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Category weight relative to a single name trigram
+CATEGORY_WEIGHT = 2.0
+
+
+class SimilarityIndex:
+    """Sparse L2-normalised product vectors for one catalog version"""
+
+    def __init__(self, size: int, features: Iterable[Tuple[str, Sequence[int], float]],
+                 active: Sequence[bool]):
+        """`features` yields (term, posting list of product indices, weight) triples"""
+        postings = []
+        term_weights = []
+        for _, rows, weight in features:
+            if rows:
+                postings.append(np.asarray(rows, dtype=np.int32))
+                term_weights.append(weight)
+
+        lengths = np.fromiter((len(rows) for rows in postings), dtype=np.int64, count=len(postings))
+        # Column (term) order: each term's products are its posting list
+        self.column_start = np.concatenate(([0], np.cumsum(lengths)))
+        self.column_rows = np.concatenate(postings) if postings else np.zeros(0, dtype=np.int32)
+
+        # Rare terms say more about a product than ones shared by half the catalog
+        idf = np.log((1 + size) / (1 + lengths.astype(np.float32))) + 1
+        values = np.repeat(idf * np.asarray(term_weights, dtype=np.float32), lengths)
+        norms = np.sqrt(np.bincount(self.column_rows, weights=np.square(values), minlength=size))
+        values /= norms[self.column_rows].astype(np.float32)
+        self.column_values = values.astype(np.float32, copy=False)
+
+        # Row (product) order, to look up the terms of one product
+        order = np.argsort(self.column_rows, kind="stable")
+        self.row_start = np.concatenate(([0], np.cumsum(np.bincount(self.column_rows, minlength=size))))
+        self.row_terms = np.repeat(np.arange(len(postings), dtype=np.int32), lengths)[order]
+        self.row_values = self.column_values[order]
+
+        self.size = size
+        self.active = np.asarray(active, dtype=bool)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the vectors"""
+        return sum(array.nbytes for array in (
+            self.column_start, self.column_rows, self.column_values,
+            self.row_start, self.row_terms, self.row_values,
+        ))
+
+    def most_similar(self, idx: int, k: int) -> List[Tuple[int, float]]:
+        """The k active products most similar to product `idx`, as (index, cosine similarity)"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        start, end = self.row_start[idx], self.row_start[idx + 1]
+        for term, value in zip(self.row_terms[start:end].tolist(), self.row_values[start:end].tolist()):
+            # Posting lists hold each product once, so the fancy-indexed += is exact
+            column = slice(self.column_start[term], self.column_start[term + 1])
+            scores[self.column_rows[column]] += self.column_values[column] * value
+        scores[~self.active] = -np.inf
+        scores[idx] = -np.inf
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]  # Best first, ties by index
+        return [(int(i), float(scores[i])) for i in top]
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Admission control tests
+Checks concurrency limits, wait queues and per-session rate limits
+(run with: python -m pytest test_admission.py)
+"""
+
+import asyncio
+
+import pytest
+from mcp import types
+
+import admission
+import server
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = admission.TokenBucket(rate=2, burst=3, now=0)
+
+    assert [bucket.take(now=0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(now=0) == pytest.approx(0.5)
+    assert bucket.take(now=0.5) == 0
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = admission.AdmissionController({"read": 1}, max_queue=0, max_wait=5, rate=0, burst=1)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow_call():
+            async with controller.admit("read", "a"):
+                await release.wait()
+
+        holder = asyncio.create_task(slow_call())
+        await asyncio.sleep(0)
+        with pytest.raises(admission.Overloaded) as error:
+            async with controller.admit("read", "b"):
+                pass
+        release.set()
+        await holder
+        return error.value
+
+    assert asyncio.run(run()).reason == "queue_full"
+    assert controller.rejected == {"queue_full": 1}
+    assert controller.limits["read"].active == 0
+
+
+def test_waiters_time_out_and_queue_drains_in_order():
+    controller = admission.AdmissionController({"cart": 1}, max_queue=2, max_wait=0.05, rate=0, burst=1)
+    order = []
+
+    async def call(name, hold):
+        async with controller.admit("cart", name):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def run():
+        first = asyncio.create_task(call("first", 0.01))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(call("second", 0))
+        await asyncio.gather(first, second)
+
+        # A holder that outlasts max_wait makes the waiter give up
+        slow = asyncio.create_task(call("slow", 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(admission.Overloaded) as error:
+            await call("late", 0)
+        await slow
+        return error.value
+
+    assert asyncio.run(run()).reason == "wait_timeout"
+    assert order == ["first", "second", "slow"]
+    assert controller.limits["cart"].active == 0
+    assert controller.limits["cart"].queued == 0
+
+
+def test_rate_limited_call_returns_retryable_error(monkeypatch):
+    monkeypatch.setattr(server, "admission_controller", admission.AdmissionController(
+        {"read": 4, "cart": 4}, max_queue=4, max_wait=1, rate=0.01, burst=2
+    ))
+
+    def call(session_id):
+        request = types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(name="view_cart", arguments={"_sessionId": session_id})
+        )
+        return asyncio.run(server.handle_call_tool(request)).root
+
+    assert not call("admission-a").isError
+    assert not call("admission-a").isError
+
+    rejected = call("admission-a")
+    assert rejected.isError
+    assert rejected.meta["retryable"] is True
+    assert rejected.structuredContent["error"] == "rate_limited"
+
+    # Other sessions are unaffected
+    assert not call("admission-b").isError
+
+
+def test_anonymous_clients_do_not_throttle_each_other(monkeypatch):
+    controller = admission.AdmissionController(
+        {"read": 4, "cart": 4}, max_queue=4, max_wait=1, rate=0.01, burst=2
+    )
+    monkeypatch.setattr(server, "admission_controller", controller)
+
+    def call(name="view_cart"):
+        request = types.CallToolRequest(method="tools/call", params=types.CallToolRequestParams(name=name))
+        return asyncio.run(server.handle_call_tool(request)).root
+
+    # Well past the per-session burst, as if from several clients without session ids
+    assert not any(call().isError for _ in range(5))
+    assert controller.stats()["rejected"] == {}
+
+    unknown = call("no_such_tool")
+    assert unknown.isError
+    assert controller.admitted == 5
+
+
+def test_every_listed_tool_has_an_admission_class():
+    tools = asyncio.run(server.list_tools())
+    assert {tool.name for tool in tools} == set(server.TOOL_CLASSES)
+    # Definitions are built once, on the first list request
+    assert asyncio.run(server.list_tools()) is tools
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Autocomplete tests
+Uses the real store data (run with: python -m pytest test_autocomplete.py)
+"""
+
+import pytest
+
+import autocomplete
+import server
+
+
+def test_completions_are_ordered_by_popularity():
+    trie = autocomplete.CompletionTrie([
+        ("rice", "rice", "word", 3),
+        ("rye", "rye", "word", 1),
+        ("rich", "rich", "word", 5),
+        ("ricotta cheese", "Ricotta Cheese", "category", 3),
+    ], top_k=3)
+
+    assert trie.complete("ri") == [("rich", "word", 5), ("rice", "word", 3), ("Ricotta Cheese", "category", 3)]
+    assert trie.complete("R", limit=1) == [("rich", "word", 5)]
+    assert trie.complete("ricotta  ch") == [("Ricotta Cheese", "category", 3)]
+    assert trie.complete("rx") == []
+    # Each node keeps at most top_k completions
+    assert len(trie.complete("r", limit=10)) == 3
+
+
+def test_name_words_skip_numbers_and_duplicates():
+    assert autocomplete.name_words('אורז בסמטי 500 גרם - אורז') == ["אורז", "בסמטי", "גרם"]
+
+
+def test_autocomplete_tool_matches_catalog_counts():
+    catalog = server.get_store_catalog(server.DEFAULT_STORE)
+    result = server.autocomplete_products("אור", limit=3)
+    suggestions = result.structuredContent["suggestions"]
+
+    assert len(suggestions) == 3
+    assert all(s["text"].startswith("אור") for s in suggestions)
+    counts = [s["count"] for s in suggestions]
+    assert counts == sorted(counts, reverse=True)
+    for s in suggestions:
+        assert s["count"] == sum(s["text"] in autocomplete.name_words(name) for name in catalog.names_lower)
+
+
+def test_autocomplete_includes_categories():
+    suggestions = server.autocomplete_products("קטנ").structuredContent["suggestions"]
+    assert {"text": "קטניות", "type": "category", "count": len(server.get_store_catalog(server.DEFAULT_STORE).category_index["קטניות"])} in suggestions
+
+
+@pytest.mark.parametrize("prefix", ["zzz", "אורזזז"])
+def test_unknown_prefix_has_no_suggestions(prefix):
+    result = server.autocomplete_products(prefix)
+    assert not result.isError
+    assert result.structuredContent["suggestions"] == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Cart behaviour tests
+Calls the cart functions in server.py directly (no running server needed)
+
+Run with: python -m pytest test_cart.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import server
+
+STORE = server.DEFAULT_STORE
+
+
+def product_id(idx: int) -> str:
+    """Client id of the store's idx-th product"""
+    return server.get_store_catalog(STORE).items[idx]["id"]
+
+
+def make_ctx(session_id: str) -> SimpleNamespace:
+    """Build a minimal context object like handle_call_tool does"""
+    server.user_carts.pop(session_id, None)
+    return SimpleNamespace(session_id=session_id)
+
+
+def test_update_cart_applies_all_operations():
+    """A batch adds, sets and removes items in one call"""
+    ctx = make_ctx("test-batch")
+    asyncio.run(server.add_to_cart(ctx, product_id(3), 1))
+
+    result = asyncio.run(server.update_cart(ctx, [
+        {"product_id": product_id(0), "quantity": 2},
+        {"product_id": product_id(1)},
+        {"product_id": product_id(0), "quantity": 1, "action": "add"},
+        {"product_id": product_id(1), "quantity": 5, "action": "set"},
+        {"product_id": product_id(3), "action": "remove"},
+    ]))
+
+    cart = server.user_carts["test-batch"]
+    assert not result.isError
+    assert set(cart) == {product_id(0), product_id(1)}
+    assert cart[product_id(0)]["quantity"] == 3
+    assert cart[product_id(1)]["quantity"] == 5
+    assert len(result.structuredContent["items"]) == 2
+
+
+def test_update_cart_is_atomic():
+    """An invalid operation leaves the cart unchanged"""
+    ctx = make_ctx("test-batch-atomic")
+    asyncio.run(server.add_to_cart(ctx, product_id(0), 1))
+
+    result = asyncio.run(server.update_cart(ctx, [
+        {"product_id": product_id(0), "quantity": 4, "action": "set"},
+        {"product_id": f"{STORE}:999999", "quantity": 1},
+    ]))
+
+    cart = server.user_carts["test-batch-atomic"]
+    assert result.isError
+    assert list(cart) == [product_id(0)]
+    assert cart[product_id(0)]["quantity"] == 1
+
+
+def test_update_cart_rejects_boolean_quantities():
+    """True/False are not quantities even though bool subclasses int"""
+    ctx = make_ctx("test-batch-bool")
+
+    for quantity, action in ((True, "add"), (False, "set")):
+        result = asyncio.run(server.update_cart(ctx, [
+            {"product_id": product_id(0), "quantity": quantity, "action": action},
+        ]))
+        assert result.isError
+    assert not server.user_carts.get("test-batch-bool")
+
+
+def test_add_to_cart_rejects_invalid_quantities():
+    ctx = make_ctx("test-add-quantity")
+
+    for quantity in (-1, 0, 1.5, "3", True, None):
+        result = asyncio.run(server.add_to_cart(ctx, product_id(0), quantity))
+        assert result.startswith("❌"), quantity
+    assert not server.user_carts.get("test-add-quantity")
+
+
+def test_integral_float_quantities_are_accepted():
+    ctx = make_ctx("test-float-quantity")
+
+    asyncio.run(server.add_to_cart(ctx, product_id(0), 2.0))
+    result = asyncio.run(server.update_cart(ctx, [
+        {"product_id": product_id(0), "quantity": 1.0},
+        {"product_id": product_id(1), "quantity": 3.0, "action": "set"},
+    ]))
+
+    assert not result.isError
+    cart = server.user_carts["test-float-quantity"]
+    assert cart[product_id(0)]["quantity"] == 3
+    assert cart[product_id(1)]["quantity"] == 3
+    assert all(type(item["quantity"]) is int for item in cart.values())
+
+
+def test_view_cart_is_memoized_until_cart_changes():
+    """Repeated views reuse the rendering; every mutation invalidates it"""
+    ctx = make_ctx("test-view-version")
+    asyncio.run(server.add_to_cart(ctx, product_id(0), 1))
+
+    first = asyncio.run(server.view_cart(ctx))
+    assert asyncio.run(server.view_cart(ctx)) is first
+
+    asyncio.run(server.add_to_cart(ctx, product_id(0), 2))
+    second = asyncio.run(server.view_cart(ctx))
+    assert second is not first
+    assert second.structuredContent["version"] > first.structuredContent["version"]
+    assert second.structuredContent["items"][0]["quantity"] == 3
+
+    asyncio.run(server.remove_from_cart(ctx, product_id(0)))
+    assert asyncio.run(server.view_cart(ctx)).structuredContent["items"] == []
+
+    # Dropping the cart outright is also noticed
+    asyncio.run(server.add_to_cart(ctx, product_id(1), 1))
+    asyncio.run(server.view_cart(ctx))
+    server.user_carts.pop("test-view-version")
+    assert asyncio.run(server.view_cart(ctx)).structuredContent["items"] == []
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
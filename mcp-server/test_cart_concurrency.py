@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Cart concurrency stress test
+Hammers the cart functions from many threads at once and checks that no
+update is lost (run with: python -m pytest test_cart_concurrency.py)
+"""
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import server
+
+STORE = server.DEFAULT_STORE
+SESSIONS = [f"stress-session-{i}" for i in range(4)]
+WORKERS = 32
+ROUNDS = 60
+
+
+async def hammer_cart(worker: int, products: list) -> None:
+    """Mix single adds and batch adds across every session"""
+    for round_no in range(ROUNDS):
+        ctx = SimpleNamespace(session_id=SESSIONS[(worker + round_no) % len(SESSIONS)])
+        product_id = products[round_no % len(products)]
+
+        if round_no % 2:
+            await server.add_to_cart(ctx, product_id, 1)
+        else:
+            await server.update_cart(ctx, [{"product_id": product_id, "quantity": 1}])
+        await server.view_cart(ctx)
+
+
+def test_no_lost_updates_under_parallel_load():
+    """Every add from every thread must be reflected in the final carts"""
+    for session_id in SESSIONS:
+        server.user_carts.pop(session_id, None)
+    products = [item["id"] for item in server.get_store_catalog(STORE).items[:5]]
+
+    # Force frequent thread switches to make races likely
+    previous_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            list(pool.map(lambda w: asyncio.run(hammer_cart(w, products)), range(WORKERS)))
+    finally:
+        sys.setswitchinterval(previous_interval)
+
+    total_quantity = sum(
+        item["quantity"]
+        for session_id in SESSIONS
+        for item in server.user_carts[session_id].values()
+    )
+    assert total_quantity == WORKERS * ROUNDS
+
+    for session_id in SESSIONS:
+        server.user_carts.pop(session_id, None)
+
+
+def test_sessions_map_to_stable_lock_stripes():
+    """The same session always gets the same lock"""
+    assert server.cart_lock("stress-a") is server.cart_lock("stress-a")
+    stripes = {id(server.cart_lock(f"stress-{i}")) for i in range(1000)}
+    assert len(stripes) > 1
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
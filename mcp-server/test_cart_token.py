@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Signed cart token tests
+Checks token verification and that a cart survives a hop to another replica
+(run with: python -m pytest test_cart_token.py)
+"""
+
+import asyncio
+
+import pytest
+from mcp import types
+
+import cart_token
+import server
+
+STORE = server.DEFAULT_STORE
+SECRET = b"test-secret"
+
+
+def product_id(idx: int) -> str:
+    """Client id of the store's idx-th product"""
+    return server.get_store_catalog(STORE).items[idx]["id"]
+
+
+def test_token_round_trip_and_verification():
+    entries = [(STORE, "1234", 2), (STORE, "5678", 1), ("other-store", "42", 3)]
+    token = cart_token.encode_cart(entries, 7, SECRET, "session-a", now=1000)
+
+    assert cart_token.decode_cart(token, SECRET, "session-a", max_age=60, now=1030) == (7, entries)
+
+    prefix, payload, signature = token.split(".")
+    tampered = f"{prefix}.{payload[:-2]}AA.{signature}"
+    for bad_token, session_id, now in [
+        (tampered, "session-a", 1000),
+        (token, "session-b", 1000),  # issued to another session
+        (token, "session-a", 2000),  # expired
+        ("garbage", "session-a", 1000),
+    ]:
+        with pytest.raises(cart_token.InvalidCartToken):
+            cart_token.decode_cart(bad_token, SECRET, session_id, max_age=60, now=now)
+
+    with pytest.raises(cart_token.InvalidCartToken):
+        cart_token.decode_cart(token, b"other-secret", "session-a")
+
+
+def test_token_stays_compact():
+    entries = [(STORE, str(100000 + i), i % 5 + 1) for i in range(30)]
+    assert len(cart_token.encode_cart(entries, 30, SECRET, "s")) < 400
+
+
+def call_tool(name, arguments, meta=None):
+    params = {"name": name, "arguments": arguments}
+    if meta:
+        params["_meta"] = meta
+    request = types.CallToolRequest.model_validate({"method": "tools/call", "params": params})
+    return asyncio.run(server.handle_call_tool(request)).root
+
+
+def test_cart_moves_between_replicas_with_token(monkeypatch):
+    monkeypatch.setattr(server, "CART_TOKEN_SECRET", SECRET)
+    session = {"sessionId": "token-session"}
+    server.user_carts.pop("token-session", None)
+
+    call_tool("add_to_cart", {"product_id": product_id(2), "quantity": 3}, session)
+    result = call_tool("add_to_cart", {"product_id": product_id(5)}, session)
+    token = result.meta["cartToken"]
+
+    # Simulate a replica that has never seen this session
+    server.user_carts.pop("token-session")
+    server.cart_versions.pop("token-session")
+    server._cart_views.pop("token-session", None)
+
+    restored = call_tool("view_cart", {}, dict(session, cartToken=token))
+    quantities = {item["id"]: item["quantity"] for item in restored.structuredContent["items"]}
+    assert quantities == {product_id(2): 3, product_id(5): 1}
+    assert restored.meta["cartToken"] == token
+
+    # An older token does not roll back a newer local cart
+    call_tool("remove_from_cart", {"product_id": product_id(2)}, dict(session, cartToken=token))
+    view = call_tool("view_cart", {}, dict(session, cartToken=token))
+    assert [item["id"] for item in view.structuredContent["items"]] == [product_id(5)]
+
+    # Tokens are only honoured for the session they were issued to
+    server.user_carts.pop("token-other", None)
+    other = call_tool("view_cart", {}, {"sessionId": "token-other", "cartToken": token})
+    assert other.structuredContent["items"] == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
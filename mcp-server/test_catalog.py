@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Catalog and search index tests
+Uses the real store data plus temporary copies (run with: python -m pytest test_catalog.py)
+"""
+
+import asyncio
+import hashlib
+import json
+import shutil
+import sys
+import threading
+import time
+
+import pytest
+
+import server
+
+STORE = server.DEFAULT_STORE
+QUERIES = ["", "או", "אורז", "500 גרם", "אורגני", "ניצת הדובדבן", "zzz", "בסמטי מלא"]
+CATEGORIES = [None, "דגנים", "קטניות", "missing"]
+
+
+def linear_search(products, search, category):
+    """The original full-scan semantics of search_products"""
+    matches = []
+    for idx, product in enumerate(products):
+        if search and search.lower() not in product.get('name', '').lower():
+            continue
+        if category and category.lower() != product.get('category', '').lower():
+            continue
+        matches.append(idx)
+    return matches
+
+
+@pytest.fixture
+def temp_store(cache_dirs, monkeypatch):
+    """Copy the real store into a temp STORES_DIR (next to the per-test cache dirs)"""
+    source = server.STORES_DIR / STORE / "data" / "products.json"
+    data_dir = cache_dirs / "stores" / STORE / "data"
+    data_dir.mkdir(parents=True)
+    shutil.copy(source, data_dir / "products.json")
+
+    monkeypatch.setattr(server, "STORES_DIR", cache_dirs / "stores")
+    server._catalogs.clear()
+    yield data_dir / "products.json"
+    server._catalogs.clear()
+
+
+def test_indexed_search_matches_linear_scan():
+    catalog = server.get_store_catalog(STORE)
+    products = server.load_store_products(STORE)
+
+    for query in QUERIES:
+        for category in CATEGORIES:
+            assert catalog.search(query, category) == linear_search(products, query, category), (query, category)
+
+
+@pytest.mark.parametrize("name,grams", [
+    ("בורגול אורגני 500 גרם - ניצת הדובדבן", 500),
+    ('קינואה רויאל אורגנית 1 ק"ג - ניצת הדובדבן', 1000),
+    ("אורז מלא ארוך 1 ק`ג אורגני", 1000),
+    ('שעועית לוביה 1/2 ק"ג', 500),
+    ('שמן זית 750 מ"ל', 750),
+    ("קינואה טריו ( 3 צבעים) אורגני", None),
+])
+def test_parse_size_grams(name, grams):
+    assert server.parse_size_grams(name) == grams
+
+
+def test_price_range_and_sorting_match_scan():
+    catalog = server.get_store_catalog(STORE)
+    prices = [float(p["price"]) for p in catalog.products]
+
+    in_range = catalog.query("", None, 9.5, 15)
+    assert in_range == [idx for idx, price in enumerate(prices) if 9.5 <= price <= 15]
+
+    cheapest = catalog.query("אורז", None, None, 20, "price_asc")
+    assert sorted(cheapest) == [idx for idx in catalog.search("אורז") if prices[idx] <= 20]
+    assert [prices[idx] for idx in cheapest] == sorted(prices[idx] for idx in cheapest)
+
+    by_value = catalog.query("", "דגנים", sort="price_per_kg")
+    assert sorted(by_value) == catalog.search("", "דגנים")
+    per_kg = [catalog.prices_per_kg[idx] for idx in by_value if catalog.prices_per_kg[idx] is not None]
+    assert per_kg and per_kg == sorted(per_kg)
+    # Products without a parseable size come after every sized product
+    assert all(catalog.prices_per_kg[idx] is None for idx in by_value[len(per_kg):])
+
+
+def test_search_products_under_price():
+    result = server.search_products(search="", max_price=9, sort="price_desc")
+    prices = [item["price"] for item in result.structuredContent["products"]]
+    assert prices and max(prices) <= 9
+    assert prices == sorted(prices, reverse=True)
+
+
+@pytest.mark.parametrize("args", [
+    {"min_price": "abc"}, {"max_price": "nan"}, {"max_price": True}, {"sort": "cheapest"},
+])
+def test_search_products_rejects_invalid_filters(args):
+    result = server.search_products(search="", **args)
+    assert result.isError
+    assert result.structuredContent["products"] == []
+
+
+@pytest.mark.parametrize("query,hebrew", [
+    ("quinoa", "קינואה"),
+    ("basmati rice", "בסמטי"),
+    ("Red Lentils", "עדשים אדומות"),
+    ("spageti", "ספגטי"),
+    ("bulgar", "בורגול"),
+])
+def test_english_queries_find_hebrew_products(query, hebrew):
+    products = server.search_products(search=query).structuredContent["products"]
+    assert products
+    assert all(hebrew in product["name"] for product in products)
+
+
+def test_english_query_respects_category():
+    catalog = server.get_store_catalog(STORE)
+    assert catalog.search("lentils", "דגנים") == []
+    assert catalog.search("lentils", "קטניות")
+
+
+def test_search_many_matches_single_searches():
+    catalog = server.get_store_catalog(STORE)
+    queries = QUERIES + ["basmati", "אורז", "ORGANIC"]
+
+    for category in CATEGORIES:
+        assert catalog.search_many(queries, category) == [catalog.search(q, category) for q in queries]
+
+
+def test_shopping_list_groups_capped_results():
+    catalog = server.get_store_catalog(STORE)
+    result = server.search_shopping_list(["אורז", " lentils ", "", "zzz"], limit=2)
+    groups = result.structuredContent["results"]
+
+    assert [group["query"] for group in groups] == ["אורז", "lentils", "zzz"]
+    assert groups[0]["total"] == len(catalog.search("אורז"))
+    assert [p["id"] for p in groups[0]["products"]] == [catalog.items[idx]["id"] for idx in catalog.search("אורז")[:2]]
+    assert all("עדשים" in p["name"] for p in groups[1]["products"])
+    assert groups[2] == {"query": "zzz", "total": 0, "products": []}
+    assert len(result.structuredContent["products"]) == 4
+    assert server.search_shopping_list([]).isError
+
+
+def test_snapshot_is_reused_for_same_source(temp_store):
+    first = server.get_store_catalog(STORE)
+    snapshots = list(server.SNAPSHOT_DIR.glob(f"{STORE}-*.pickle"))
+    assert len(snapshots) == 1
+
+    server._catalogs.clear()
+    second = server.get_store_catalog(STORE)
+    assert second is not first
+    assert second.items == first.items
+    assert second.search("אורז") == first.search("אורז")
+
+
+def test_snapshot_from_other_code_is_rebuilt(temp_store, monkeypatch):
+    first = server.get_store_catalog(STORE)
+    assert server._load_snapshot(STORE, first.source_hash) is not None
+
+    # As after a deploy that changed the indexing code but not products.json
+    monkeypatch.setattr(server, "snapshot_code_hash", lambda: "changed-code")
+    assert server._load_snapshot(STORE, first.source_hash) is None
+
+    server._catalogs.clear()
+    assert server.get_store_catalog(STORE).items == first.items
+    snapshots = list(server.SNAPSHOT_DIR.glob(f"{STORE}-*.pickle"))
+    assert [path.name.endswith("-changed-code.pickle") for path in snapshots] == [True]
+
+
+def test_catalog_reloads_when_source_changes(temp_store):
+    assert len(server.get_store_catalog(STORE)) == 100
+
+    data = json.loads(temp_store.read_text(encoding="utf-8"))
+    data["products"] = data["products"][:10]
+    temp_store.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    assert len(server.get_store_catalog(STORE)) == 10
+    # The stale snapshot is replaced by the new one
+    assert len(list(server.SNAPSHOT_DIR.glob(f"{STORE}-*.pickle"))) == 1
+
+
+def test_malformed_records_do_not_fail_the_store(temp_store):
+    data = json.loads(temp_store.read_text(encoding="utf-8"))
+    records = [json.dumps(p, ensure_ascii=False) for p in data["products"]]
+    records[3] = records[3][:-1]  # unterminated object
+    records[5] = '{"price": "9.9"}'  # no name
+    temp_store.write_text(
+        '{"scrapedAt": "%s", "products": [%s]}' % (data["scrapedAt"], ", ".join(records)),
+        encoding="utf-8"
+    )
+
+    catalog = server.get_store_catalog(STORE)
+    assert len(catalog) == 98
+    assert catalog.scraped_at == data["scrapedAt"]
+    assert [p["name"] for p in catalog.products] == [
+        p["name"] for idx, p in enumerate(data["products"]) if idx not in (3, 5)
+    ]
+    assert len(server.load_store_products(STORE)) == 98
+
+
+def test_scraper_delta_is_applied_incrementally(temp_store):
+    catalog = server.get_store_catalog(STORE)
+    previous = json.loads(temp_store.read_text(encoding="utf-8"))
+    products = previous["products"]
+
+    removed = products[0]
+    changed = dict(products[1], name="אורז בדיקה מעודכן", price="1.5")
+    added = {"name": "קינואה חדשה 500 גרם", "price": "12.9", "category": "דגנים",
+             "url": "new-product-i999999", "image": "/ProductsImages/thumbs/new.jpg"}
+
+    current = {
+        "scrapedAt": "2030-01-01T00:00:00.000Z",
+        "products": [changed] + products[2:] + [added],
+    }
+    current["totalProducts"] = len(current["products"])
+    raw = json.dumps(current, ensure_ascii=False).encode("utf-8")
+
+    delta = {
+        "baseScrapedAt": previous["scrapedAt"],
+        "scrapedAt": current["scrapedAt"],
+        "added": [added],
+        "changed": [changed],
+        "removed": [server.product_key(removed)],
+        "sha256": hashlib.sha256(raw).hexdigest(),
+    }
+    (temp_store.parent / server.DELTA_FILENAME).write_text(json.dumps(delta, ensure_ascii=False), encoding="utf-8")
+    temp_store.write_bytes(raw)
+
+    updated = server.get_store_catalog(STORE)
+    assert updated is not catalog  # applied to a copy, which replaces the catalog
+    assert updated.generation == 1  # derived from the delta, not rebuilt
+    assert catalog.generation == 0 and catalog.is_active(0)
+    assert catalog.search("מעודכן") == []
+    assert len(updated) == 100
+    assert not updated.is_active(0)
+    assert updated.search("מעודכן") == [1]
+    assert updated.query("", None, None, 1.5) == [1]
+    assert 0 not in updated.query("", sort="price_asc")
+    assert updated.items[100]["name"] == added["name"]
+
+    # Indexed search still agrees with a scan over the active products
+    active = [(idx, p) for idx, p in enumerate(updated.products) if updated.is_active(idx)]
+    for query in QUERIES + ["קינואה"]:
+        expected = [idx for idx, p in active if query.lower() in p["name"].lower()]
+        assert updated.search(query) == expected, query
+
+
+def test_product_ids_match_after_delta_and_fresh_load():
+    products = server.load_store_products(STORE)
+    added = {"name": "קינואה חדשה 500 גרם", "price": "12.9", "category": "דגנים",
+             "url": "new-product-i999999", "image": "/ProductsImages/thumbs/new.jpg"}
+    current = products[1:] + [added]
+
+    # One replica applies the delta, another loads the new products.json
+    updated = server.StoreCatalog(STORE, products)
+    updated.apply_delta({"added": [added], "removed": [server.product_key(products[0])]})
+    fresh = server.StoreCatalog(STORE, current)
+
+    def by_id(catalog):
+        return {item["id"]: item for idx, item in enumerate(catalog.items) if catalog.is_active(idx)}
+
+    assert by_id(updated) == by_id(fresh)
+    assert len(by_id(fresh)) == len(current)
+    for product_id in by_id(fresh):
+        assert updated.products[updated.lookup(product_id)] is fresh.products[fresh.lookup(product_id)]
+    assert updated.lookup(server.product_id_for(STORE, products[0])) is None
+
+
+def test_searches_during_deltas_see_whole_versions(temp_store):
+    catalog = server.get_store_catalog(STORE)
+    base = catalog.scraped_at
+    original = catalog.products[1]
+    renamed = dict(original, name="זזזז אורז בדיקה מקביל", price="0.5")
+    versions = [
+        {"baseScrapedAt": base, "scrapedAt": "2030-01-01", "changed": [renamed]},
+        {"baseScrapedAt": "2030-01-01", "scrapedAt": base, "changed": [original]},
+    ]
+    before = (catalog.search("אורז"), catalog.query("", sort="price_asc"))
+    server.apply_catalog_delta(STORE, versions[0])
+    renamed_catalog = server.get_store_catalog(STORE)
+    after = (renamed_catalog.search("אורז"), renamed_catalog.query("", sort="price_asc"))
+    server.apply_catalog_delta(STORE, versions[1])
+    assert before != after
+
+    stop = threading.Event()
+    errors = []
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often to interleave readers with deltas
+
+    def apply_deltas():
+        deadline = time.monotonic() + 0.5
+        try:
+            while time.monotonic() < deadline:
+                server.apply_catalog_delta(STORE, versions[0])
+                server.apply_catalog_delta(STORE, versions[1])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    def read():
+        try:
+            while not stop.is_set():
+                live = server.get_store_catalog(STORE)
+                seen = (live.search("אורז"), live.query("", sort="price_asc"))
+                server.build_similarity_index(live)
+                # A catalog a reader holds never changes under it
+                assert seen in (before, after)
+                assert (live.search("אורז"), live.query("", sort="price_asc")) == seen
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(3)] + [threading.Thread(target=apply_deltas)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+
+
+def test_delta_with_wrong_base_is_rejected(temp_store):
+    server.get_store_catalog(STORE)
+    with pytest.raises(ValueError):
+        server.apply_catalog_delta(STORE, {"baseScrapedAt": "1999-01-01", "added": []})
+
+
+def test_readiness_reports_after_warm_start(temp_store):
+    server._ready.clear()
+    assert asyncio.run(server.readiness(None)).status_code == 503
+
+    server.warm_start()
+    response = asyncio.run(server.readiness(None))
+    assert response.status_code == 200
+    assert json.loads(response.body)["stores"][STORE]["products"] == 100
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
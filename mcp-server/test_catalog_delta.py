@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Product key tests
+The server, the fetcher and the JS scraper must key products the same way,
+or deltas would remove and re-add unchanged products. Both implementations
+are checked against testdata/product_keys.json
+(run with: python -m pytest test_catalog_delta.py)
+"""
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import catalog_delta
+import fetcher
+import server
+
+CASES = json.loads((Path(__file__).parent / "testdata" / "product_keys.json").read_text(encoding="utf-8"))
+JS_MODULE = Path(__file__).parent.parent / "catalog-delta.js"
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_product_key_matches_fixture(case):
+    assert catalog_delta.product_key(case["product"]) == case["key"]
+
+
+def test_server_and_fetcher_share_the_delta_format():
+    assert server.product_key is fetcher.product_key is catalog_delta.product_key
+    assert server.DELTA_FILENAME == fetcher.DELTA_FILENAME == catalog_delta.DELTA_FILENAME
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_scraper_product_key_matches_fixture():
+    script = (
+        "const { productKey } = require(process.argv[1]);"
+        "const cases = JSON.parse(require('fs').readFileSync(0, 'utf-8'));"
+        "console.log(JSON.stringify(cases.map(c => productKey(c.product))));"
+    )
+    result = subprocess.run(
+        ["node", "-e", script, str(JS_MODULE)],
+        input=json.dumps(CASES), capture_output=True, text=True, encoding="utf-8", check=True
+    )
+    assert json.loads(result.stdout) == [case["key"] for case in CASES]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
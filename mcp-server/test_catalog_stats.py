@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Category price statistics tests
+Compares the vectorized aggregation with a plain Python computation
+(run with: python -m pytest test_catalog_stats.py)
+"""
+
+import statistics
+
+import pytest
+
+import catalog_stats
+import server
+
+STORE = server.DEFAULT_STORE
+
+
+def test_grouped_stats_matches_python():
+    groups = ["b", "a", "b", "a", "b", "c", "a"]
+    values = [3.0, 10.0, 1.0, None, 2.5, None, 4.0]
+
+    stats = catalog_stats.grouped_stats(groups, values)
+
+    assert set(stats) == {"a", "b"}  # 'c' has no values
+    assert stats["a"] == {"count": 2, "min": 4.0, "max": 10.0, "median": 7.0, "mean": 7.0}
+    assert stats["b"] == {"count": 3, "min": 1.0, "max": 3.0, "median": 2.5, "mean": pytest.approx(6.5 / 3)}
+    assert catalog_stats.grouped_stats([], []) == {}
+
+
+def test_category_price_stats_match_catalog():
+    catalog = server.get_store_catalog(STORE)
+    result = server.category_price_stats()
+    categories = result.structuredContent["categories"]
+
+    assert sum(entry["count"] for entry in categories) == len(catalog)
+    for entry in categories:
+        prices = [float(p["price"]) for p in catalog.products if p["category"] == entry["category"]]
+        assert entry["count"] == len(prices)
+        assert entry["min"] == min(prices) and entry["max"] == max(prices)
+        assert entry["median"] == pytest.approx(statistics.median(prices), abs=0.01)
+        assert entry["mean"] == pytest.approx(statistics.mean(prices), abs=0.01)
+
+
+def test_single_category_and_unknown_category():
+    legumes = server.category_price_stats("קטניות").structuredContent["categories"]
+    assert [entry["category"] for entry in legumes] == ["קטניות"]
+    assert legumes[0]["price_per_kg"]["min"] <= legumes[0]["price_per_kg"]["max"]
+
+    assert server.category_price_stats("missing").structuredContent["categories"] == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Streaming catalog reader tests
+(run with: python -m pytest test_catalog_stream.py)
+"""
+
+import io
+import json
+
+import pytest
+
+import catalog_stream
+import server
+
+SOURCE = server.STORES_DIR / server.DEFAULT_STORE / "data" / "products.json"
+MALFORMED = (
+    '{"scrapedAt": "2030-01-01", "products": ['
+    '{"name": "a"}, {"name": "b" "oops"}, {"name": "c}"}, 12, {"name": "cut off, '
+    '{"name": "d", "tags": {"x": [1, "}"]}}'
+    '], "totalProducts": 5}'
+)
+
+
+def stream_text(text: str, chunk_size: int) -> catalog_stream.CatalogStream:
+    return catalog_stream.CatalogStream(io.StringIO(text), chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096, catalog_stream.CHUNK_SIZE])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_records_and_meta_match_json_load(chunk_size, indent):
+    data = json.loads(SOURCE.read_text(encoding="utf-8"))
+    stream = stream_text(json.dumps(data, ensure_ascii=False, indent=indent), chunk_size)
+
+    assert list(stream) == data["products"]
+    assert stream.meta == {key: value for key, value in data.items() if key != "products"}
+    assert stream.skipped == 0
+
+
+def test_last_chunk_is_decoded_as_one_batch():
+    # The whole file fits in one chunk, so its closing '}' is the last one in the buffer
+    stream = stream_text(SOURCE.read_text(encoding="utf-8"), catalog_stream.CHUNK_SIZE * 64)
+    batches = []
+    batch = stream._batch
+    stream._batch = lambda: batches.append(batch()) or batches[-1]
+
+    assert len(list(stream)) == 100
+    assert [len(records) for records in batches if records is not None] == [100]
+
+
+def test_reads_a_path():
+    stream = catalog_stream.CatalogStream(SOURCE)
+    assert len(list(stream)) == 100
+    assert stream.meta["scrapedAt"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_malformed_records_are_skipped_individually(chunk_size):
+    stream = stream_text(MALFORMED, chunk_size)
+
+    assert list(stream) == [{"name": "a"}, {"name": "c}"}, 12, {"name": "d", "tags": {"x": [1, "}"]}}]
+    assert stream.skipped == 2
+    assert stream.meta == {"scrapedAt": "2030-01-01", "totalProducts": 5}
+
+
+def test_valid_products_drops_records_that_cannot_be_indexed():
+    stream = stream_text(MALFORMED.replace('{"name": "a"}', '{"name": " ", "category": 3}'), 64)
+    assert [record["name"] for record in server.valid_products(stream)] == ["c}", "d"]
+
+
+@pytest.mark.parametrize("after", ["", ', "totalProducts": 2'])
+@pytest.mark.parametrize("chunk_size", [1, 4096])
+def test_garbage_after_the_last_record_is_skipped(after, chunk_size):
+    stream = stream_text('{"products": [{"a": 1}, {"b": 2}x]%s}' % after, chunk_size)
+
+    assert list(stream) == [{"a": 1}, {"b": 2}]
+    assert stream.skipped == 1
+    assert stream.meta == ({"totalProducts": 2} if after else {})
+
+
+@pytest.mark.parametrize("text", ["[]", '{"products": [{"name": "a"}', '{"products": 1 2}'])
+def test_broken_file_structure_raises(text):
+    with pytest.raises(catalog_stream.CatalogFormatError):
+        list(stream_text(text, 4))
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
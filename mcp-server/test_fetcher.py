@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Catalog fetcher tests
+Runs against a local stand-in for the store website (run with: python -m pytest test_fetcher.py)
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+
+import fetcher
+
+
+def product_row(n, name, price, image):
+    price_cell = f'<span class="product-price">₪ {price}</span>' if price else ""
+    return f"""
+    <tr id="ContentPlaceHolder1_products_rptproducts_tr_{n}">
+      <td><div id="ContentPlaceHolder1_productpic">
+        <img id="ContentPlaceHolder1_products_rptproducts_imgProductPic_{n}" data-src="{image}">
+      </div></td>
+      <td><a href="/product-{n}-i{n}">{name}</a><br>{price_cell}</td>
+      <td><table><tr><td><a href="/cart">הוסף לסל</a></td></tr></table></td>
+    </tr>"""
+
+
+HOME = """<html><body><nav>
+  <a href="/cat/grains">דגנים ואורז</a>
+  <a href="/cat/legumes">קטניות</a>
+  <a href="/cat/fruit">פירות יבשים</a>
+  <a href="#top">דגנים</a>
+  <a href="/about">אודות</a>
+</nav></body></html>"""
+
+PAGES = {
+    "/": HOME,
+    "/cat/grains": "<table>" + "".join([
+        product_row(1, "אורז בסמטי 500 גרם", "9.9", "/ProductsImages/thumbs/A1.jpg"),
+        product_row(2, "קינואה לבנה 1 ק\"ג", "24.9", "/ProductsImages/thumbs/A2.jpg"),
+        product_row(3, "בורגול ללא מחיר", None, "/ProductsImages/thumbs/A3.jpg"),
+        product_row(4, "מוצר עם לוגו", "5", "/productsimages/mfrimages/thumbs/Q659875_80_40.png"),
+    ]) + "</table>",
+    "/cat/legumes": "<table>" + "".join([
+        product_row(5, "עדשים אדומות 500 גרם", "1,234.50", "/ProductsImages/thumbs/B5.jpg"),
+        product_row(6, "אותה תמונה כמו אורז", "7", "/ProductsImages/thumbs/A1.jpg"),
+    ]) + "</table>",
+    "/cat/fruit": "<table>" + product_row(7, "צימוקים", "12", "/ProductsImages/thumbs/C7.jpg") + "</table>",
+}
+
+
+class StoreHandler(BaseHTTPRequestHandler):
+    """Serves PAGES with ETags and answers matching If-None-Match with 304"""
+    hits = []
+
+    def do_GET(self):
+        path = unquote(self.path)
+        StoreHandler.hits.append(path)
+        body = PAGES.get(path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        etag = '"' + hashlib.md5(body.encode("utf-8")).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def store_site():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StoreHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def fetch(base_url, cache=None, **kwargs):
+    async def run():
+        async with fetcher.CatalogFetcher(base_url, concurrency=4, rate=0, cache=cache) as catalog_fetcher:
+            return await catalog_fetcher.fetch_catalog(**kwargs), catalog_fetcher
+    return asyncio.run(run())
+
+
+def test_fetch_catalog_matches_scraper_schema(store_site):
+    output, _ = fetch(store_site)
+
+    assert output["totalProducts"] == len(output["products"]) == 3
+    assert output["scrapedAt"].endswith("Z")
+    assert output["products"][0] == {
+        "name": "אורז בסמטי 500 גרם",
+        "price": "9.9",
+        "category": "דגנים ואורז",
+        "url": "/product-1-i1",
+        "image": "/ProductsImages/thumbs/A1.jpg",
+    }
+    # No price, placeholder image, duplicate image and excluded category are all dropped
+    assert [p["name"] for p in output["products"]] == ["אורז בסמטי 500 גרם", 'קינואה לבנה 1 ק"ג', "עדשים אדומות 500 גרם"]
+    assert output["products"][2]["price"] == "1,234.50"
+    assert fetcher.product_key(output["products"][0]) == "i1"
+
+
+def test_unchanged_pages_are_revalidated_not_refetched(store_site):
+    cache = {}
+    first, _ = fetch(store_site, cache)
+
+    StoreHandler.hits.clear()
+    second, catalog_fetcher = fetch(store_site, cache)
+
+    assert second["products"] == first["products"]
+    assert catalog_fetcher.requests == 3
+    assert catalog_fetcher.not_modified == 3
+    # The cache survives a round trip through JSON
+    assert json.loads(json.dumps(cache)) == cache
+
+
+def test_max_products_limits_output(store_site):
+    output, _ = fetch(store_site, max_products=2)
+    assert output["totalProducts"] == 2
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    limiter = fetcher.HostRateLimiter(rate=50)
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.wait("store") for _ in range(6)), limiter.wait("other"))
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_write_catalog_writes_delta_for_server(tmp_path):
+    previous = {"scrapedAt": "2030-01-01T00:00:00.000Z", "products": [
+        {"name": "a", "price": "1", "category": "c", "url": "a-i1", "image": "/1.jpg"},
+        {"name": "b", "price": "2", "category": "c", "url": "b-i2", "image": "/2.jpg"},
+    ]}
+    current = {"scrapedAt": "2030-01-02T00:00:00.000Z", "products": [
+        {"name": "b", "price": "3", "category": "c", "url": "b-i2", "image": "/2.jpg"},
+        {"name": "d", "price": "4", "category": "c", "url": "d-i4", "image": "/4.jpg"},
+    ]}
+    fetcher.write_catalog(previous, tmp_path)
+    assert not (tmp_path / fetcher.DELTA_FILENAME).exists()
+
+    path = fetcher.write_catalog(current, tmp_path)
+    delta = json.loads((tmp_path / fetcher.DELTA_FILENAME).read_text(encoding="utf-8"))
+
+    assert delta["baseScrapedAt"] == previous["scrapedAt"]
+    assert [p["name"] for p in delta["added"]] == ["d"]
+    assert [p["price"] for p in delta["changed"]] == ["3"]
+    assert delta["removed"] == ["i1"]
+    assert delta["sha256"] == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
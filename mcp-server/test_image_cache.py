@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Image proxy cache tests
+Runs against a local stand-in for the store website (run with: python -m pytest test_image_cache.py)
+"""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+import image_cache
+import server
+import singleflight
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    """Serves a deterministic 'image' for every /ProductsImages/ path and counts hits"""
+    hits = {}
+
+    def do_GET(self):
+        OriginHandler.hits[self.path] = OriginHandler.hits.get(self.path, 0) + 1
+        if not self.path.startswith("/ProductsImages/"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = (self.path * 10).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def origin():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), OriginHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+async def fetch(cache, origin, path):
+    async with httpx.AsyncClient() as client:
+        return await image_cache.fetch_image(cache, client, origin, path)
+
+
+def test_image_is_fetched_from_origin_once(origin, tmp_path):
+    OriginHandler.hits.clear()
+    cache = image_cache.ImageCache(tmp_path)
+    path = "ProductsImages/thumbs/A1_250_180.jpg"
+
+    first = asyncio.run(fetch(cache, origin, path))
+    second = asyncio.run(fetch(cache, origin, path))
+
+    assert first == second == (f"/{path}" * 10).encode("utf-8")
+    assert OriginHandler.hits[f"/{path}"] == 1
+    # A new cache instance over the same directory sees the stored image
+    assert path in image_cache.ImageCache(tmp_path)
+
+
+def test_cache_evicts_least_recently_used(origin, tmp_path):
+    paths = [f"ProductsImages/thumbs/E{i}_250_180.jpg" for i in range(3)]
+    size = len((f"/{paths[0]}" * 10).encode("utf-8"))
+    cache = image_cache.ImageCache(tmp_path, max_bytes=size * 2)
+
+    asyncio.run(fetch(cache, origin, paths[0]))
+    asyncio.run(fetch(cache, origin, paths[1]))
+    cache.get(paths[0])  # paths[1] is now least recently used
+    asyncio.run(fetch(cache, origin, paths[2]))
+
+    assert paths[0] in cache and paths[2] in cache
+    assert paths[1] not in cache
+    assert cache.total_bytes <= size * 2
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_prewarm_fetches_catalog_images(origin, tmp_path):
+    cache = image_cache.ImageCache(tmp_path)
+    paths = [f"/ProductsImages/thumbs/P{i}_250_180.jpg" for i in range(20)] + ["/not-an-image"]
+
+    assert asyncio.run(image_cache.prewarm(cache, origin, paths, concurrency=4)) == 20
+    assert asyncio.run(image_cache.prewarm(cache, origin, paths, concurrency=4)) == 0
+
+
+def test_concurrent_misses_share_one_fetch(origin, tmp_path):
+    OriginHandler.hits.clear()
+    cache = image_cache.ImageCache(tmp_path)
+    flights = singleflight.AsyncSingleFlight()
+    path = "ProductsImages/thumbs/C1_250_180.jpg"
+
+    async def fetch_many():
+        async with httpx.AsyncClient() as client:
+            return await asyncio.gather(*(
+                image_cache.fetch_image(cache, client, origin, path, flights) for _ in range(10)
+            ))
+
+    results = asyncio.run(fetch_many())
+    assert results == [(f"/{path}" * 10).encode("utf-8")] * 10
+    assert OriginHandler.hits[f"/{path}"] == 1
+    assert flights.stats() == {"calls": 10, "coalesced": 9, "in_flight": 0}
+
+
+def image_request(path):
+    return Request({"type": "http", "method": "GET", "path_params": {"path": path}, "headers": []})
+
+
+def test_image_route_serves_with_long_cache_headers(origin, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "IMAGE_ORIGIN", origin)
+    monkeypatch.setattr(server, "_image_cache", image_cache.ImageCache(tmp_path))
+    monkeypatch.setattr(server, "_image_client", None)
+    catalog_image = server.get_store_catalog(server.DEFAULT_STORE).products[0]["image"].lstrip("/")
+
+    async def call_route():
+        ok = await server.image_proxy(image_request(catalog_image))
+        blocked = await server.image_proxy(image_request("admin/secret.txt"))
+        await server._image_client.aclose()
+        return ok, blocked
+
+    ok, blocked = asyncio.run(call_route())
+    assert ok.status_code == 200
+    assert ok.headers["cache-control"] == image_cache.CACHE_CONTROL
+    assert ok.media_type == "image/jpeg"
+    assert blocked.status_code == 404
+
+
+def test_image_route_only_serves_catalog_images(origin, tmp_path, monkeypatch):
+    OriginHandler.hits.clear()
+    monkeypatch.setattr(server, "IMAGE_ORIGIN", origin)
+    monkeypatch.setattr(server, "_image_cache", image_cache.ImageCache(tmp_path))
+    path = "ProductsImages/thumbs/NOT_IN_CATALOG_250_180.jpg"
+
+    response = asyncio.run(server.image_proxy(image_request(path)))
+
+    assert response.status_code == 404
+    assert OriginHandler.hits == {}
+    assert len(server.get_image_cache()) == 0
+
+
+def test_widget_images_point_at_proxy_when_enabled(monkeypatch):
+    product = {"name": "x", "price": "1", "image": "/ProductsImages/thumbs/X_250_180.jpg"}
+
+    assert server.transform_product_to_mcp_format(product, "s")["image"].startswith(server.IMAGE_ORIGIN)
+
+    monkeypatch.setattr(server, "IMAGE_PROXY_BASE_URL", "https://mcp.example.com")
+    image = server.transform_product_to_mcp_format(product, "s")["image"]
+    assert image == "https://mcp.example.com/images/ProductsImages/thumbs/X_250_180.jpg"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
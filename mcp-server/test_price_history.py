@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Price history tests
+(run with: python -m pytest test_price_history.py)
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import price_history
+import server
+
+STORE = server.DEFAULT_STORE
+
+
+def test_changes_series_and_lowest(tmp_path):
+    history = price_history.PriceHistory(tmp_path)
+    assert history.append("2025-01-01T00:00:00.000Z", {"a": 10.0, "b": 5.5, "c": None})
+    assert history.append("2025-02-01T00:00:00.000Z", {"a": 8.0, "b": 5.5})
+    assert history.append("2025-03-01T00:00:00.000Z", {"a": 12.0, "b": 5.5, "d": 3.0})
+    # Older or repeated scrapes are not recorded twice
+    assert not history.append("2025-02-01T00:00:00.000Z", {"a": 1.0})
+
+    # Unchanged prices cost nothing: a, b, a, a, d
+    assert history.records == 5
+
+    reopened = price_history.PriceHistory(tmp_path)
+    assert reopened.series("a") == [
+        ("2025-01-01T00:00:00.000Z", 10.0), ("2025-02-01T00:00:00.000Z", 8.0), ("2025-03-01T00:00:00.000Z", 12.0)
+    ]
+    assert reopened.lowest("a") == (8.0, "2025-02-01T00:00:00.000Z")
+    assert reopened.lowest("b") == (5.5, "2025-01-01T00:00:00.000Z")
+    assert reopened.lowest("c") is None
+
+    assert reopened.changes_since("2025-02-15") == [
+        {"key": "a", "before": 8.0, "now": 12.0},
+        {"key": "d", "before": None, "now": 3.0},
+    ]
+    # A date before the first scrape compares against the first scrape
+    assert [c["key"] for c in reopened.changes_since("2024-01-01")] == ["a", "d"]
+    assert reopened.changes_since("2025-03-02") == []
+
+
+def test_interrupted_append_is_discarded(tmp_path):
+    history = price_history.PriceHistory(tmp_path)
+    history.append("2025-01-01", {"a": 1.0})
+    # Column bytes written without an index update, as after a crash
+    with open(tmp_path / price_history.PRODUCT_COLUMN[0], "ab") as f:
+        f.write(b"\xff" * 12)
+
+    history = price_history.PriceHistory(tmp_path)
+    history.append("2025-01-02", {"a": 2.0})
+    assert history.series("a") == [("2025-01-01", 1.0), ("2025-01-02", 2.0)]
+
+
+def test_price_history_tool():
+    catalog = server.get_store_catalog(STORE)
+    server.record_price_history(catalog)
+
+    keys = list(catalog.key_index)
+    prices = {key: catalog.prices[idx] for key, idx in catalog.key_index.items()}
+    cheaper, dearer = keys[0], keys[1]
+    prices[cheaper] -= 1
+    prices[dearer] += 5
+    server.get_price_history(STORE).append("2099-01-01T00:00:00.000Z", prices)
+
+    changes = server.price_history_func().structuredContent["changes"]
+    assert [c["id"] for c in changes] == [f"{STORE}:{dearer}", f"{STORE}:{cheaper}"]
+    assert changes[0]["now"] == pytest.approx(changes[0]["before"] + 5)
+
+    result = server.price_history_func(product_id=f"{STORE}:{cheaper}")
+    assert [entry["scrapedAt"] for entry in result.structuredContent["history"]] == [catalog.scraped_at, "2099-01-01T00:00:00.000Z"]
+    assert result.structuredContent["lowest"]["price"] == pytest.approx(catalog.prices[catalog.key_index[cheaper]] - 1)
+
+    assert server.price_history_func(product_id="missing:1").isError
+
+
+def test_background_appends_keep_load_order(monkeypatch):
+    append = price_history.PriceHistory.append
+
+    def slow_append(self, scraped_at, prices):
+        if scraped_at == "2025-01-01":
+            time.sleep(0.2)  # Give a later append the chance to overtake this one
+        return append(self, scraped_at, prices)
+
+    monkeypatch.setattr(price_history.PriceHistory, "append", slow_append)
+    for scraped_at, price in (("2025-01-01", 10.0), ("2025-02-01", 12.0)):
+        catalog = SimpleNamespace(store_name="ordered", scraped_at=scraped_at,
+                                  prices=[price], key_index={"a": 0})
+        server.record_price_history(catalog, background=True)
+
+    server._price_history_queue.join()
+    assert server.get_price_history("ordered").series("a") == [("2025-01-01", 10.0), ("2025-02-01", 12.0)]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Profiling hook tests
+(run with: python -m pytest test_profiling.py)
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from mcp import types
+from starlette.requests import Request
+
+import profiling
+import server
+
+
+def busy_work(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def test_sampler_collects_collapsed_stacks():
+    sampler = profiling.StackSampler(interval=0.001)
+    with sampler.profile("busy"):
+        busy_work(0.1)
+
+    collapsed = sampler.collapsed()
+    assert "test_profiling:busy_work" in collapsed
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+    summary = sampler.summary()
+    assert summary["calls"]["busy"]["calls"] == 1
+    assert summary["samples"] > 0
+
+    # The sampler thread stops once no call is being profiled
+    deadline = time.time() + 1
+    while sampler._thread is not None and time.time() < deadline:
+        time.sleep(0.01)
+    assert sampler._thread is None
+
+    sampler.reset()
+    assert sampler.collapsed() == ""
+
+
+def call_search(meta):
+    params = {"name": "search_products", "arguments": {"search": "אורז"}, "_meta": meta}
+    request = types.CallToolRequest.model_validate({"method": "tools/call", "params": params})
+    return asyncio.run(server.handle_call_tool(request)).root
+
+
+def dump(query: bytes):
+    request = Request({"type": "http", "method": "GET", "query_string": query, "headers": []})
+    return asyncio.run(server.profile_dump(request))
+
+
+def test_tool_calls_are_profiled_only_on_request(monkeypatch):
+    monkeypatch.setattr(server, "profiler", profiling.StackSampler(interval=0.001))
+    assert dump(b"").status_code == 404
+
+    monkeypatch.setattr(server, "PROFILE_ON_DEMAND", True)
+    call_search({"sessionId": "profile-session"})
+    assert server.profiler.summary()["calls"] == {}
+
+    call_search({"sessionId": "profile-session", "profile": True})
+    summary = json.loads(dump(b"format=summary&reset=1").body)
+    assert summary["calls"]["tool:search_products"]["calls"] == 1
+    assert server.profiler.summary()["calls"] == {}
+
+    monkeypatch.setattr(server, "PROFILE_TOKEN", "secret")
+    assert dump(b"").status_code == 403
+    assert dump(b"token=secret").status_code == 200
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
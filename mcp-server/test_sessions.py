@@ -84,7 +84,7 @@ def test_session_isolation():
         "tools/call",
         {
             "name": "add_to_cart",
-            "arguments": {"product_id": "nitzat-haduvdevan:0", "quantity": 2}
+            "arguments": {"product_id": "nitzat-haduvdevan:i281", "quantity": 2}
         },
         session_a
     )
@@ -96,7 +96,7 @@ def test_session_isolation():
         "tools/call",
         {
             "name": "add_to_cart",
-            "arguments": {"product_id": "nitzat-haduvdevan:1", "quantity": 1}
+            "arguments": {"product_id": "nitzat-haduvdevan:i303", "quantity": 1}
         },
         session_a
     )
@@ -128,7 +128,7 @@ def test_session_isolation():
         "tools/call",
         {
             "name": "add_to_cart",
-            "arguments": {"product_id": "nitzat-haduvdevan:5", "quantity": 3}
+            "arguments": {"product_id": "nitzat-haduvdevan:i6975", "quantity": 3}
         },
         session_b
     )
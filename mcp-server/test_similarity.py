@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Similar products tests
+Uses the real store data (run with: python -m pytest test_similarity.py)
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import server
+import similarity
+
+STORE = server.DEFAULT_STORE
+
+
+def test_similar_products_share_name_and_category():
+    catalog = server.get_store_catalog(STORE)
+    source = next(idx for idx, name in enumerate(catalog.names_lower) if "בסמטי" in name)
+
+    source_id = catalog.items[source]["id"]
+    result = server.similar_products(source_id, limit=3)
+    products = result.structuredContent["products"]
+
+    assert not result.isError
+    assert len(products) == 3
+    assert source_id not in [p["id"] for p in products]
+    assert "בסמטי" in products[0]["name"]
+    assert products[0]["category"] == catalog.items[source]["category"]
+    scores = [p["similarity"] for p in products]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_inactive_products_are_never_returned():
+    features = [("abc", [0, 1, 2], 1.0), ("xyz", [3], 1.0)]
+    index = similarity.SimilarityIndex(4, features, active=[True, False, True, True])
+
+    assert [idx for idx, _ in index.most_similar(0, 5)] == [2, 3]
+    assert index.most_similar(0, 1)[0] == (2, pytest.approx(1.0))
+
+
+def test_sparse_scores_match_dense_cosine():
+    features = [("abc", [0, 1, 2], 1.0), ("bcd", [0, 2], 1.0), ("xyz", [1, 3], 1.0), ("category:a", [0, 3], 2.0)]
+    index = similarity.SimilarityIndex(4, features, active=[True] * 4)
+
+    dense = np.zeros((4, len(features)))
+    for column, (_, rows, weight) in enumerate(features):
+        dense[rows, column] = (np.log(5 / (1 + len(rows))) + 1) * weight
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+
+    for idx in range(4):
+        scores = dense @ dense[idx]
+        assert [(i, pytest.approx(scores[i], abs=1e-6)) for i in range(4) if i != idx] == \
+            sorted(index.most_similar(idx, 3))
+
+
+def test_index_memory_grows_with_terms_not_vocabulary():
+    catalog = server.get_store_catalog(STORE)
+    index = server.build_similarity_index(catalog)
+    pairs = sum(len(postings) for postings in catalog.trigram_index.values())
+    # Index arrays and weights for (product, term) pairs, not a dense product x term matrix
+    assert index.nbytes < 32 * (pairs + len(catalog.products) + len(catalog.trigram_index) + 100)
+
+
+def test_index_is_rebuilt_only_for_new_catalog_versions():
+    catalog = SimpleNamespace(generation=0)
+    builds = []
+
+    def build(c):
+        builds.append(c.generation)
+        return object()
+
+    first = server.catalog_derived("similarity-test", catalog, "kind", build)
+    assert server.catalog_derived("similarity-test", catalog, "kind", build) is first
+
+    catalog.generation = 1
+    assert server.catalog_derived("similarity-test", catalog, "kind", build) is not first
+    assert builds == [0, 1]
+    server._derived_cache.pop(("similarity-test", "kind"))
+
+
+@pytest.mark.parametrize("product_id", ["", "nope", f"{STORE}:x", f"{STORE}:999999", "missing:1"])
+def test_unknown_product_is_an_error(product_id):
+    assert server.similar_products(product_id).isError
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing tests
+(run with: python -m pytest test_singleflight.py)
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from mcp import types
+
+import server
+import singleflight
+
+
+def test_concurrent_thread_calls_share_one_run():
+    flight = singleflight.SingleFlight()
+    runs = []
+    started = threading.Event()
+
+    def load():
+        runs.append(1)
+        started.set()
+        time.sleep(0.1)
+        return object()
+
+    with ThreadPoolExecutor(8) as pool:
+        first = pool.submit(flight.do, "store", load)
+        started.wait()
+        others = [pool.submit(flight.do, "store", load) for _ in range(7)]
+        results = {id(f.result()) for f in [first] + others}
+
+    assert len(runs) == 1 and len(results) == 1
+    assert flight.stats() == {"calls": 8, "coalesced": 7, "in_flight": 0}
+
+    # Finished calls are not cached
+    flight.do("store", load)
+    assert len(runs) == 2
+
+
+def test_errors_reach_every_waiting_caller():
+    flight = singleflight.SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError("broken")
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(flight.do, "k", fail)
+        started.wait()
+        second = pool.submit(flight.do, "k", fail)
+        for future in (first, second):
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_async_calls_survive_a_cancelled_caller():
+    flight = singleflight.AsyncSingleFlight()
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        first = asyncio.create_task(flight.do("k", compute))
+        second = asyncio.create_task(flight.do("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "result"
+    assert runs == [1]
+    assert flight.stats() == {"calls": 2, "coalesced": 1, "in_flight": 0}
+
+
+def test_identical_concurrent_searches_are_coalesced(monkeypatch):
+    monkeypatch.setattr(server, "search_flights", singleflight.AsyncSingleFlight())
+    calls = []
+    search_products = server.search_products
+
+    def slow_search(**kwargs):
+        calls.append(kwargs["search"])
+        time.sleep(0.05)
+        return search_products(**kwargs)
+
+    monkeypatch.setattr(server, "search_products", slow_search)
+
+    def request(search, session_id):
+        return server.handle_call_tool(types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(
+                name="search_products", arguments={"search": search, "_sessionId": session_id}
+            )
+        ))
+
+    async def run():
+        return await asyncio.gather(*(
+            request(search, f"flight-{i}") for i, search in enumerate(["אורז", "אורז", "אורז", "קמח"])
+        ))
+
+    results = [result.root for result in asyncio.run(run())]
+
+    assert sorted(calls) == sorted(["אורז", "קמח"])
+    assert results[0].structuredContent == results[1].structuredContent == results[2].structuredContent
+    assert server.search_flights.stats()["coalesced"] == 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
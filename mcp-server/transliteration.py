@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+English <-> Hebrew search keys
+Product names are Hebrew only, so English queries are matched through:
+  - a compact English -> Hebrew term dictionary (rice -> אורז)
+  - consonant "skeletons" that make a Hebrew word and its Latin spelling
+    collide (בסמטי -> bsmt <- basmati)
+
+Both are turned into alias keys per product when the catalog is indexed,
+so an English query is answered with index lookups instead of a scan.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Set
+
+# English term -> Hebrew stems. A stem matches any name token starting with it,
+# which covers inflections (אדום / אדומה / אדומות).
+ENGLISH_TO_HEBREW: Dict[str, List[str]] = {
+    "rice": ["אורז"],
+    "basmati": ["בסמטי"],
+    "quinoa": ["קינואה"],
+    "lentil": ["עדשים", "עדשה"],
+    "chickpea": ["חומוס"],
+    "hummus": ["חומוס"],
+    "bean": ["שעועית", "פולי"],
+    "soy": ["סויה"],
+    "pea": ["אפונה"],
+    "bulgur": ["בורגול"],
+    "buckwheat": ["כוסמת"],
+    "spelt": ["כוסמין"],
+    "oat": ["שיבולת"],
+    "oatmeal": ["שיבולת"],
+    "barley": ["גריסי", "גריסים"],
+    "wheat": ["חיטה", "חיטת"],
+    "durum": ["דורום"],
+    "rye": ["שיפון"],
+    "millet": ["דוחן"],
+    "corn": ["תירס"],
+    "popcorn": ["פופקורן"],
+    "flax": ["פשתן"],
+    "flaxseed": ["פשתן"],
+    "bran": ["סובין"],
+    "sprout": ["נבט"],
+    "couscous": ["קוסקוס"],
+    "pasta": ["פסטה"],
+    "spaghetti": ["ספגטי"],
+    "penne": ["פנה"],
+    "fusilli": ["פוזילי"],
+    "gnocchi": ["ניוקי"],
+    "tortellini": ["טורטליני"],
+    "fettuccine": ["פטוצ"],
+    "noodle": ["אטריות", "אטריה"],
+    "flour": ["קמח"],
+    "organic": ["אורגני"],
+    "whole": ["מלא"],
+    "wholegrain": ["מלא"],
+    "brown": ["מלא"],
+    "wild": ["פרא", "בר"],
+    "red": ["אדום", "אדומ"],
+    "black": ["שחור"],
+    "white": ["לבן", "לבנ"],
+    "green": ["ירוק"],
+    "yellow": ["צהוב"],
+    "round": ["עגול"],
+    "long": ["ארוך"],
+    "roasted": ["קלוי"],
+    "mix": ["מיקס", "תערובת"],
+    "gluten": ["גלוטן"],
+}
+
+# Common English plural/variant spellings folded onto dictionary terms
+ENGLISH_VARIANTS = {
+    "lentils": "lentil", "chickpeas": "chickpea", "beans": "bean", "peas": "pea",
+    "oats": "oat", "sprouts": "sprout", "noodles": "noodle", "soya": "soy",
+    "bulgar": "bulgur", "burgul": "bulgur", "humus": "hummus", "cuscus": "couscous",
+    "fettucine": "fettuccine", "flaxseeds": "flaxseed",
+}
+
+# Hebrew letter -> Latin consonant class; vowel letters map to "" (dropped)
+HEBREW_CONSONANTS = {
+    "א": "", "ב": "b", "ג": "g", "ד": "d", "ה": "h", "ו": "", "ז": "z", "ח": "h",
+    "ט": "t", "י": "", "כ": "k", "ך": "k", "ל": "l", "מ": "m", "ם": "m", "נ": "n",
+    "ן": "n", "ס": "s", "ע": "", "פ": "p", "ף": "p", "צ": "ts", "ץ": "ts", "ק": "k",
+    "ר": "r", "ש": "s", "ת": "t",
+}
+
+# Latin spellings folded onto the same consonant classes, applied in order
+LATIN_REWRITES = [
+    ("sh", "s"), ("th", "t"), ("gh", "g"), ("ch", "h"), ("kh", "h"), ("ph", "p"), ("tz", "ts"), ("ck", "k"),
+    ("qu", "k"), ("c", "k"), ("q", "k"), ("x", "ks"), ("f", "p"), ("v", "b"), ("w", "b"),
+]
+
+SKELETON_PREFIX = "~"
+MIN_SKELETON_LENGTH = 2
+# Stems this short only match whole tokens (בר must not match ברזל)
+MIN_PREFIX_STEM_LENGTH = 3
+
+_hebrew_word = re.compile(r"[א-ת]+")
+_latin_word = re.compile(r"[a-z]+")
+
+# Reverse dictionary: Hebrew stem -> English terms
+_STEM_TO_ENGLISH: Dict[str, Set[str]] = {}
+for _term, _stems in ENGLISH_TO_HEBREW.items():
+    for _stem in _stems:
+        _STEM_TO_ENGLISH.setdefault(_stem, set()).add(_term)
+_STEM_LENGTHS = sorted({len(stem) for stem in _STEM_TO_ENGLISH})
+
+
+def _collapse(text: str) -> str:
+    """Drop repeated letters (spaghetti -> spageti)"""
+    return re.sub(r"(.)\1+", r"\1", text)
+
+
+def hebrew_skeleton(word: str) -> str:
+    """Consonant skeleton of a Hebrew word; a leading ה is kept, later ones are vowels"""
+    letters = []
+    for position, char in enumerate(word):
+        if char == "ה" and position > 0:
+            continue
+        letters.append(HEBREW_CONSONANTS.get(char, ""))
+    return _collapse("".join(letters))
+
+
+def latin_skeleton(word: str) -> str:
+    """Consonant skeleton of a Latin word, comparable with hebrew_skeleton"""
+    word = word.lower()
+    for source, target in LATIN_REWRITES:
+        word = word.replace(source, target)
+    return _collapse(re.sub(r"[aeiouy]", "", word))
+
+
+def normalize_english(word: str) -> str:
+    """Fold an English query word onto its dictionary form"""
+    word = word.lower()
+    return ENGLISH_VARIANTS.get(word, word)
+
+
+def alias_keys(name: str) -> Set[str]:
+    """English dictionary terms and skeleton keys for a Hebrew product name"""
+    keys = set()
+    for token in _hebrew_word.findall(name):
+        keys.update(token_alias_keys(token))
+    return keys
+
+
+@lru_cache(maxsize=65536)
+def token_alias_keys(token: str) -> FrozenSet[str]:
+    """Alias keys of one Hebrew token (memoized: catalogs repeat the same words)"""
+    keys = set()
+    # Also try without a one-letter prefix (ו/ה/ב/מ/ל + word)
+    for word in (token, token[1:]) if len(token) > 3 else (token,):
+        for length in _STEM_LENGTHS:
+            if length > len(word):
+                break
+            if length < MIN_PREFIX_STEM_LENGTH and length != len(word):
+                continue
+            keys.update(_STEM_TO_ENGLISH.get(word[:length], ()))
+
+    skeleton = hebrew_skeleton(token)
+    if len(skeleton) >= MIN_SKELETON_LENGTH:
+        keys.add(SKELETON_PREFIX + skeleton)
+    return frozenset(keys)
+
+
+def query_keys(query: str) -> List[List[str]]:
+    """Alias keys for each word of an English query.
+
+    Each inner list holds the alternative keys for one word; a product
+    matches the query when it matches one key of every word. Dictionary
+    terms are precise, so the looser skeleton is only used for words the
+    dictionary does not know.
+    """
+    result = []
+    for word in _latin_word.findall(query.lower()):
+        alternatives = []
+        term = normalize_english(word)
+        if term in ENGLISH_TO_HEBREW:
+            alternatives.append(term)
+        else:
+            skeleton = latin_skeleton(word)
+            if len(skeleton) >= MIN_SKELETON_LENGTH:
+                alternatives.append(SKELETON_PREFIX + skeleton)
+        if alternatives:
+            result.append(alternatives)
+    return result
+
+
+def is_latin_query(query: str) -> bool:
+    return query.isascii() and any(char.isalpha() for char in query)
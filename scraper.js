@@ -1,13 +1,25 @@
 const puppeteer = require('puppeteer');
+const crypto = require('crypto');
 const fs = require('fs');
 const path = require('path');
+const { productKey, buildCatalogDelta } = require('./catalog-delta');
 
 // Configuration
 const CONFIG = {
   baseUrl: 'https://www.nizat.com',
-  outputDir: path.join(__dirname, 'data'),
+  // The MCP server and sync-docs read the store's data dir
+  outputDir: path.join(__dirname, 'stores', 'nitzat-haduvdevan', 'data'),
+  debugDir: path.join(__dirname, 'data'), // Debug screenshots, kept out of the published data
   outputFile: 'products.json',
-  delayBetweenRequests: 2000, // milliseconds
+  deltaFile: 'products.delta.json', // Changes since the previous scrape (consumed by the MCP server)
+  delayBetweenRequests: 2000, // Minimum spacing between page navigations across all pages (ms)
+  concurrency: 4, // Browser pages scraping categories in parallel
+  blockResources: true, // Abort non-essential requests; image URLs are read from DOM attributes (off in debug mode)
+  blockedResourceTypes: ['image', 'font', 'media', 'stylesheet'],
+  blockedHosts: ['google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'facebook.net', 'facebook.com', 'hotjar.com'],
+  settleMs: 500, // A page counts as loaded once the DOM stops changing for this long
+  settleTimeoutMs: 8000, // Upper bound for waiting on the DOM to settle
+  productSelector: 'tr[id*="rptproducts_tr"], img[id*="rptproducts_imgProductPic"]',
   headless: true,
   debug: false, // Set to true to save screenshots and see browser
   maxCategories: 20, // Maximum number of categories to scrape (set to null for all)
@@ -15,9 +27,11 @@ const CONFIG = {
   userAgent: 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 };
 
-// Ensure output directory exists
-if (!fs.existsSync(CONFIG.outputDir)) {
-  fs.mkdirSync(CONFIG.outputDir, { recursive: true });
+// Ensure output directories exist
+for (const dir of [CONFIG.outputDir, CONFIG.debugDir]) {
+  if (!fs.existsSync(dir)) {
+    fs.mkdirSync(dir, { recursive: true });
+  }
 }
 
 /**
@@ -27,6 +41,543 @@ function sleep(ms) {
   return new Promise(resolve => setTimeout(resolve, ms));
 }
 
+/**
+ * Write a file via a temp file and rename, so readers never see it half-written
+ */
+function writeFileAtomic(filePath, content) {
+  const tmpPath = `${filePath}.tmp`;
+  fs.writeFileSync(tmpPath, content, 'utf-8');
+  fs.renameSync(tmpPath, filePath);
+}
+
+/**
+ * Write products.json, plus a delta against the previous products.json when one exists
+ */
+function writeCatalog(output) {
+  const outputPath = path.join(CONFIG.outputDir, CONFIG.outputFile);
+  const deltaPath = path.join(CONFIG.outputDir, CONFIG.deltaFile);
+  const json = JSON.stringify(output, null, 2);
+
+  let previous = null;
+  if (fs.existsSync(outputPath)) {
+    try {
+      previous = JSON.parse(fs.readFileSync(outputPath, 'utf-8'));
+    } catch (e) {
+      console.log('⚠️  Previous products.json is unreadable, skipping delta');
+    }
+  }
+
+  if (previous && Array.isArray(previous.products)) {
+    const delta = buildCatalogDelta(previous, output);
+    // The hash tells consumers which products.json this delta produces
+    delta.sha256 = crypto.createHash('sha256').update(json, 'utf-8').digest('hex');
+    // Written before products.json so the delta is in place when the new file is noticed
+    writeFileAtomic(deltaPath, JSON.stringify(delta, null, 2));
+    console.log(`🧾 Delta: ${delta.added.length} added, ${delta.changed.length} changed, ${delta.removed.length} removed`);
+  } else if (fs.existsSync(deltaPath)) {
+    fs.unlinkSync(deltaPath);
+  }
+
+  writeFileAtomic(outputPath, json);
+  return outputPath;
+}
+
+/**
+ * Global politeness limiter: spaces calls (page navigations) at least intervalMs apart
+ */
+function createThrottle(intervalMs) {
+  let nextSlot = 0;
+  return async function throttle() {
+    const now = Date.now();
+    const slot = Math.max(now, nextSlot);
+    nextSlot = slot + intervalMs;
+    if (slot > now) {
+      await sleep(slot - now);
+    }
+  };
+}
+
+/**
+ * Whether requests are intercepted; debug runs render everything for screenshots
+ */
+function blockingResources() {
+  return CONFIG.blockResources && !CONFIG.debug;
+}
+
+/**
+ * Set up a page: user agent, viewport and (optionally) blocking of non-essential requests
+ */
+async function preparePage(page, stats) {
+  await page.setUserAgent(CONFIG.userAgent);
+  await page.setViewport({ width: 1920, height: 1080 });
+
+  if (!blockingResources()) {
+    return;
+  }
+
+  await page.setRequestInterception(true);
+  page.on('request', request => {
+    const url = request.url();
+    if (CONFIG.blockedResourceTypes.includes(request.resourceType()) ||
+        CONFIG.blockedHosts.some(host => url.includes(host))) {
+      stats.blockedRequests++;
+      request.abort();
+    } else {
+      request.continue();
+    }
+  });
+}
+
+/**
+ * Wait until the DOM has stopped changing for settleMs (or settleTimeoutMs passes)
+ */
+async function waitForDomToSettle(page) {
+  await page.evaluate((quietMs, timeoutMs) => new Promise(resolve => {
+    let quietTimer = null;
+    let hardStop = null;
+    const observer = new MutationObserver(() => {
+      clearTimeout(quietTimer);
+      quietTimer = setTimeout(done, quietMs);
+    });
+    function done() {
+      observer.disconnect();
+      clearTimeout(quietTimer);
+      clearTimeout(hardStop);
+      resolve();
+    }
+    observer.observe(document.body, { childList: true, subtree: true, attributes: true, attributeFilter: ['src', 'data-src'] });
+    quietTimer = setTimeout(done, quietMs);
+    hardStop = setTimeout(done, timeoutMs);
+  }), CONFIG.settleMs, CONFIG.settleTimeoutMs);
+}
+
+/**
+ * Pool of browser pages reused for every category; the first page is the one already open
+ */
+async function createPagePool(browser, firstPage, size, stats) {
+  const pages = [firstPage];
+  while (pages.length < size) {
+    const page = await browser.newPage();
+    await preparePage(page, stats);
+    pages.push(page);
+  }
+  return pages;
+}
+
+/**
+ * Load one category page and extract its products (raw, before filtering)
+ */
+async function scrapeCategory(page, category, throttle) {
+  // Construct full URL
+  let categoryUrl;
+  if (category.url.startsWith('http')) {
+    categoryUrl = category.url;
+  } else if (category.url.startsWith('/')) {
+    categoryUrl = `${CONFIG.baseUrl}${category.url}`;
+  } else {
+    categoryUrl = `${CONFIG.baseUrl}/${category.url}`;
+  }
+  
+  console.log(`   → ${categoryUrl}`);
+  
+  // Politeness: navigations from all pages share one rate limit
+  await throttle();
+  await page.goto(categoryUrl, { 
+    waitUntil: blockingResources() ? 'domcontentloaded' : 'networkidle2',
+    timeout: 30000
+  });
+
+  // Wait for the product grid instead of a fixed delay
+  try {
+    await page.waitForSelector(CONFIG.productSelector, { timeout: 10000 });
+  } catch (e) {
+    console.log('   ⚠️  No product grid found, extracting what is there...');
+  }
+
+  if (!blockingResources()) {
+    // Scroll page systematically to trigger lazy loading of all images
+    console.log('   📜 Scrolling to load images...');
+    await page.evaluate(async () => {
+      await new Promise((resolve) => {
+        let totalHeight = 0;
+        const distance = 300; // Scroll distance
+        const timer = setInterval(() => {
+          const scrollHeight = document.body.scrollHeight;
+          window.scrollBy(0, distance);
+          totalHeight += distance;
+
+          if (totalHeight >= scrollHeight) {
+            clearInterval(timer);
+            resolve();
+          }
+        }, 200); // Scroll every 200ms
+      });
+    });
+    
+    // Wait for images to have src attributes
+    try {
+      await page.waitForFunction(() => {
+        const images = document.querySelectorAll('img');
+        return Array.from(images).some(img => img.src || img.dataset.src);
+      }, { timeout: 5000 });
+    } catch (e) {
+      console.log('   ⚠️  Timeout waiting for images, continuing...');
+    }
+    
+    // Scroll back to top
+    await page.evaluate(() => {
+      window.scrollTo(0, 0);
+    });
+  }
+
+  // Lazy-loaded rows are appended after the first ones; wait until the DOM is quiet
+  await waitForDomToSettle(page);
+  
+  // Save screenshot if in debug mode
+  if (CONFIG.debug) {
+    const screenshotPath = path.join(CONFIG.debugDir, `debug-category-${category.name.replace(/[^a-zA-Z0-9]/g, '_')}.png`);
+    await page.screenshot({ path: screenshotPath, fullPage: false });
+    console.log(`   📸 Debug screenshot: ${screenshotPath}`);
+  }
+  
+  // Extract products from the page
+  return page.evaluate((categoryName) => {
+    const extractedProducts = [];
+    
+    // Only keep images whose wrapping div has the required ID
+    const getValidImageSrc = (imgElement) => {
+      if (!imgElement || typeof imgElement.closest !== 'function') return null;
+      
+      const wrapper = imgElement.closest('#ContentPlaceHolder1_productpic');
+      const hasRepeaterImageId = typeof imgElement.id === 'string' &&
+        imgElement.id.startsWith('ContentPlaceHolder1_products_rptproducts_imgProductPic');
+      
+      if (!wrapper && !hasRepeaterImageId) return null;
+      
+      // Lazy-load attributes hold the real URL while src may still be a
+      // placeholder (always the case when images are blocked), so read them first
+      const attributeCandidates = [
+        'data-src',
+        'data-lazy-src',
+        'data-original',
+        'src',
+        'data-srcset',
+        'data-lazy',
+        'srcset'
+      ];
+      
+      for (const attr of attributeCandidates) {
+        const value = imgElement.getAttribute(attr);
+        if (value && value.trim() !== '') {
+          return value.trim();
+        }
+      }
+      
+      if (imgElement.dataset) {
+        const datasetKeys = ['src', 'lazySrc', 'original'];
+        for (const key of datasetKeys) {
+          if (imgElement.dataset[key] && imgElement.dataset[key].trim() !== '') {
+            return imgElement.dataset[key].trim();
+          }
+        }
+      }
+      
+      const style = imgElement.getAttribute('style');
+      if (style) {
+        const urlMatch = style.match(/url\(['"]?([^'")\s]+)['"]?\)/);
+        if (urlMatch && urlMatch[1]) {
+          return urlMatch[1];
+        }
+      }
+      
+      return null;
+    };
+    
+    // Try multiple product selectors
+    const productSelectors = [
+      'tr[id*="rptproducts_tr"]',  // ASP.NET repeater table rows
+      'div[id*="_itemsContainer"] > div',  // Container items
+      '[class*="product-item"]',
+      '[class*="product"]',
+      '[class*="item"]',
+      'table tr[id]',  // Table rows with IDs
+      '[data-product]',
+      'article',
+      '[class*="card"]',
+      '.product',
+      '.item'
+    ];
+    
+    let productElements = [];
+    for (const selector of productSelectors) {
+      const elements = document.querySelectorAll(selector);
+      if (elements.length > 0) {
+        productElements = Array.from(elements);
+        break;
+      }
+    }
+    
+    // Alternative approach: Start with product images and build products around them
+    if (productElements.length > 0) {
+      // Try image-first approach for better results
+      const productImages = document.querySelectorAll('img[id*="products"], img[id*="item"], img[src*="productsimages"], img[src*="ProductsImages"]');
+      
+      productImages.forEach((img, imgIdx) => {
+        try {
+          // Get image URL
+          const image = getValidImageSrc(img);
+          if (!image) return;
+          
+          // Find nearest container
+          const container = img.closest('tr, div[class*="product"], div[class*="item"], div[id], td');
+          if (!container) return;
+          
+          // Find product name/link in container
+          const links = container.querySelectorAll('a[href]');
+          let name = null;
+          let url = null;
+          let price = null;
+          
+          // Look for product link (usually contains product ID like i8085)
+          for (const link of links) {
+            const href = link.getAttribute('href');
+            const text = link.textContent.trim();
+            if (href && href.includes('-i') && text && text.length > 3 && text.length < 200) {
+              name = text;
+              url = href;
+              break;
+            }
+          }
+          
+          // If still no name, try any link with substantial text
+          if (!name) {
+            for (const link of links) {
+              const text = link.textContent.trim();
+              if (text && text.length > 10 && text.length < 200) {
+                name = text;
+                url = link.getAttribute('href');
+                break;
+              }
+            }
+          }
+          
+          // Look for price
+          const priceElement = container.querySelector('[class*="price"], [id*="price"]');
+          if (priceElement) {
+            const priceText = priceElement.textContent.trim();
+            const priceMatch = priceText.match(/[\d,\.]+/);
+            price = priceMatch ? priceMatch[0] : null;
+          }
+          
+          if (name && image) {
+            extractedProducts.push({
+              name,
+              price,
+              category: categoryName,
+              url,
+              image
+            });
+          }
+        } catch (err) {
+          // Skip problematic images
+        }
+      });
+    }
+    
+    // If no product containers found, try to find individual product components
+    if (productElements.length === 0) {
+      // Look for images with product-like patterns
+      const allImages = document.querySelectorAll('img[alt]');
+      const allLinks = document.querySelectorAll('a[href]');
+      
+      // Try to build products from visible links with text
+      allLinks.forEach(link => {
+        const text = link.textContent.trim();
+        const href = link.getAttribute('href');
+        
+        if (text && text.length > 3 && text.length < 200 && href) {
+          // Look for price near this link
+          let price = null;
+          const parent = link.closest('[class*="product"], [class*="item"], div');
+          if (parent) {
+            const priceElement = parent.querySelector('[class*="price"], [class*="cost"], .price');
+            if (priceElement) {
+              const priceText = priceElement.textContent.trim();
+              const priceMatch = priceText.match(/[\d,\.]+/);
+              price = priceMatch ? priceMatch[0] : null;
+            }
+          }
+          
+          // Find associated image - check multiple attributes and locations
+          let image = null;
+          let img = null;
+          
+          // Strategy 1: Inside the link itself
+          img = link.querySelector('img');
+          
+          // Strategy 2: In the parent row/container (look up the tree)
+          if (!img) {
+            let currentElement = link.parentElement;
+            let depth = 0;
+            while (currentElement && depth < 5 && !img) {
+              img = currentElement.querySelector('img');
+              if (img) break;
+              currentElement = currentElement.parentElement;
+              depth++;
+            }
+          }
+          
+          // Strategy 3: Look for closest table row
+          if (!img) {
+            const row = link.closest('tr');
+            if (row) {
+              img = row.querySelector('img');
+            }
+          }
+          
+          // Strategy 4: Look in nearest divs
+          if (!img) {
+            const nearestDiv = link.closest('div[class], div[id]');
+            if (nearestDiv) {
+              img = nearestDiv.querySelector('img');
+            }
+          }
+          
+          if (img) {
+            image = getValidImageSrc(img);
+          }
+          
+          if (text && !text.includes('בצ') && !text.includes('סגור')) { // Filter out UI text
+            extractedProducts.push({
+              name: text,
+              price: price,
+              category: categoryName,
+              url: href,
+              image: image
+            });
+          }
+        }
+      });
+    } else {
+      // Process found product elements
+      productElements.forEach((element, idx) => {
+        try {
+          // Try to find product name
+          const nameElement = element.querySelector('[class*="name"], [class*="title"], h2, h3, h4, a[href]');
+          const name = nameElement ? nameElement.textContent.trim() : null;
+
+          // Try to find price
+          const priceElement = element.querySelector('[class*="price"], [class*="cost"], .price');
+          let price = null;
+          if (priceElement) {
+            const priceText = priceElement.textContent.trim();
+            const priceMatch = priceText.match(/[\d,\.]+/);
+            price = priceMatch ? priceMatch[0] : null;
+          }
+
+          // Try to find product link
+          const linkElement = element.querySelector('a');
+          const url = linkElement ? linkElement.getAttribute('href') : null;
+
+          // Try to find product image - search broadly in the element tree
+          let imageElement = element.querySelector('img');
+          
+          // If not found in current element, search in parent/siblings
+          if (!imageElement && element.parentElement) {
+            imageElement = element.parentElement.querySelector('img');
+          }
+          
+          // Try searching in nearest container
+          if (!imageElement) {
+            const container = element.closest('tr, div[class], div[id]');
+            if (container) {
+              imageElement = container.querySelector('img');
+            }
+          }
+          
+          let image = null;
+          if (imageElement) {
+            image = getValidImageSrc(imageElement);
+          }
+
+          
+          // Only add if we have at least a name
+          if (name && name.length > 3) {
+            extractedProducts.push({
+              name,
+              price,
+              category: categoryName,
+              url,
+              image
+            });
+          }
+        } catch (err) {
+          // Skip problematic elements
+        }
+      });
+    }
+    
+    
+    // Remove duplicates based on name
+    const uniqueProducts = [];
+    const seen = new Set();
+    extractedProducts.forEach(product => {
+      if (!seen.has(product.name)) {
+        seen.add(product.name);
+        uniqueProducts.push(product);
+      }
+    });
+
+    return uniqueProducts;
+  }, category.name);
+}
+
+/**
+ * Filter a category's products and add those with unused images to allProducts, up to maxProducts
+ */
+function mergeCategoryProducts(category, products, allProducts, usedImages) {
+  // Filter products to only include those with both image AND price
+  // Also exclude products with the default Nitzat logo image (placeholder)
+  const placeholderImages = [
+    'Q659875_80_40.png',  // Nitzat logo
+    'productsimages/mfrimages/thumbs/Q659875_80_40.png'
+  ];
+  
+  const completeProducts = products.filter(product => 
+    product.image && product.image.trim() !== '' &&
+    product.price && product.price.trim() !== '' &&
+    !placeholderImages.some(placeholder => product.image.includes(placeholder))
+  );
+  
+  // First, deduplicate within this category's products
+  const categoryUniqueProducts = [];
+  const categoryImages = new Set();
+  for (const product of completeProducts) {
+    if (!categoryImages.has(product.image) && !usedImages.has(product.image)) {
+      categoryImages.add(product.image);
+      categoryUniqueProducts.push(product);
+    }
+  }
+  
+  console.log(`   ✓ Found ${products.length} products in ${category.name} (${completeProducts.length} with complete data, ${categoryUniqueProducts.length} with unique images)`);
+  
+  // Add products up to the maximum limit and track their images
+  const remainingSlots = CONFIG.maxProducts - allProducts.length;
+  const productsToAdd = categoryUniqueProducts.slice(0, remainingSlots);
+  
+  // Track the images we're adding
+  productsToAdd.forEach(product => {
+    usedImages.add(product.image);
+  });
+  
+  allProducts.push(...productsToAdd);
+  
+  if (allProducts.length >= CONFIG.maxProducts) {
+    console.log(`   🎯 Reached maximum of ${CONFIG.maxProducts} products!`);
+  }
+}
+
+
 /**
  * Main scraper function
  */
@@ -39,15 +590,15 @@ async function scrapeNitzatHaduvdevan() {
   });
 
   try {
+    const stats = { blockedRequests: 0 };
     const page = await browser.newPage();
     
-    // Set user agent and viewport
-    await page.setUserAgent(CONFIG.userAgent);
-    await page.setViewport({ width: 1920, height: 1080 });
+    // Set user agent, viewport and request blocking
+    await preparePage(page, stats);
     
     console.log(`📡 Navigating to ${CONFIG.baseUrl}...`);
     await page.goto(CONFIG.baseUrl, { 
-      waitUntil: 'networkidle2',
+      waitUntil: blockingResources() ? 'domcontentloaded' : 'networkidle2',
       timeout: 30000
     });
 
@@ -57,7 +608,7 @@ async function scrapeNitzatHaduvdevan() {
       if (acceptCookiesButton) {
         console.log('🍪 Accepting cookies...');
         await acceptCookiesButton.click();
-        await sleep(1000);
+        await waitForDomToSettle(page);
       }
     } catch (e) {
       console.log('ℹ️  No cookie consent dialog found');
@@ -65,7 +616,7 @@ async function scrapeNitzatHaduvdevan() {
     
     // Save screenshot if in debug mode
     if (CONFIG.debug) {
-      const screenshotPath = path.join(CONFIG.outputDir, 'debug-homepage.png');
+      const screenshotPath = path.join(CONFIG.debugDir, 'debug-homepage.png');
       await page.screenshot({ path: screenshotPath, fullPage: true });
       console.log(`📸 Debug screenshot saved to: ${screenshotPath}`);
     }
@@ -75,7 +626,7 @@ async function scrapeNitzatHaduvdevan() {
 
     // Wait for content to load
     await page.waitForSelector('body', { timeout: 10000 });
-    await sleep(3000); // Give more time for dynamic content
+    await waitForDomToSettle(page); // Menus are built by scripts after load
     
     // Get all category links from the main menu
     console.log('📂 Extracting categories...');
@@ -144,416 +695,46 @@ async function scrapeNitzatHaduvdevan() {
     
     console.log(`\n🔄 Will scrape up to ${CONFIG.maxProducts} products with images from ${categoriesToScrape} categories...\n`);
     
-    for (let i = 0; i < categoriesToScrape; i++) {
-      // Check if we've reached the product limit
-      if (allProducts.length >= CONFIG.maxProducts) {
-        console.log(`\n✅ Reached maximum of ${CONFIG.maxProducts} products. Stopping scrape.`);
-        break;
-      }
-      
-      const category = filteredCategories[i];
-      console.log(`\n📦 Scraping category: ${category.name} (${allProducts.length}/${CONFIG.maxProducts} products collected)`);
-      
-      try {
-        // Construct full URL
-        let categoryUrl;
-        if (category.url.startsWith('http')) {
-          categoryUrl = category.url;
-        } else if (category.url.startsWith('/')) {
-          categoryUrl = `${CONFIG.baseUrl}${category.url}`;
-        } else {
-          categoryUrl = `${CONFIG.baseUrl}/${category.url}`;
-        }
-        
-        console.log(`   → ${categoryUrl}`);
-        
-        await page.goto(categoryUrl, { 
-          waitUntil: 'networkidle2',
-          timeout: 30000
-        });
-        
-        await sleep(CONFIG.delayBetweenRequests);
+    const pages = await createPagePool(browser, page, Math.max(1, Math.min(CONFIG.concurrency, categoriesToScrape)), stats);
+    const throttle = createThrottle(CONFIG.delayBetweenRequests);
+    console.log(`🧵 Scraping with ${pages.length} parallel pages`);
 
-        // Wait for content to load
-        await sleep(3000);
-        
-        // Scroll page systematically to trigger lazy loading of all images
-        console.log('   📜 Scrolling to load images...');
-        await page.evaluate(async () => {
-          await new Promise((resolve) => {
-            let totalHeight = 0;
-            const distance = 300; // Scroll distance
-            const timer = setInterval(() => {
-              const scrollHeight = document.body.scrollHeight;
-              window.scrollBy(0, distance);
-              totalHeight += distance;
-
-              if (totalHeight >= scrollHeight) {
-                clearInterval(timer);
-                resolve();
-              }
-            }, 200); // Scroll every 200ms
-          });
-        });
-        
-        // Wait for images to load
-        await sleep(2000);
-        
-        // Wait for images to have src attributes
-        try {
-          await page.waitForFunction(() => {
-            const images = document.querySelectorAll('img');
-            return Array.from(images).some(img => img.src || img.dataset.src);
-          }, { timeout: 5000 });
-        } catch (e) {
-          console.log('   ⚠️  Timeout waiting for images, continuing...');
-        }
-        
-        // Scroll back to top
-        await page.evaluate(() => {
-          window.scrollTo(0, 0);
-        });
-        await sleep(1000);
-        
-        // Save screenshot if in debug mode
-        if (CONFIG.debug) {
-          const screenshotPath = path.join(CONFIG.outputDir, `debug-category-${category.name.replace(/[^a-zA-Z0-9]/g, '_')}.png`);
-          await page.screenshot({ path: screenshotPath, fullPage: false });
-          console.log(`   📸 Debug screenshot: ${screenshotPath}`);
+    // Categories finish out of order; results are merged in category order
+    // so the output (and usedImages deduplication) matches a serial scrape
+    const results = new Array(categoriesToScrape);
+    let nextCategory = 0;
+    let nextToMerge = 0;
+
+    const mergeFinished = () => {
+      while (nextToMerge < categoriesToScrape && results[nextToMerge] !== undefined) {
+        if (allProducts.length < CONFIG.maxProducts) {
+          mergeCategoryProducts(filteredCategories[nextToMerge], results[nextToMerge], allProducts, usedImages);
         }
-        
-        // Extract products from the page
-        const products = await page.evaluate((categoryName) => {
-          const extractedProducts = [];
-          
-          // Only keep images whose wrapping div has the required ID
-          const getValidImageSrc = (imgElement) => {
-            if (!imgElement || typeof imgElement.closest !== 'function') return null;
-            
-            const wrapper = imgElement.closest('#ContentPlaceHolder1_productpic');
-            const hasRepeaterImageId = typeof imgElement.id === 'string' &&
-              imgElement.id.startsWith('ContentPlaceHolder1_products_rptproducts_imgProductPic');
-            
-            if (!wrapper && !hasRepeaterImageId) return null;
-            
-            const attributeCandidates = [
-              'src',
-              'data-src',
-              'data-lazy-src',
-              'data-original',
-              'data-srcset',
-              'data-lazy',
-              'srcset'
-            ];
-            
-            for (const attr of attributeCandidates) {
-              const value = imgElement.getAttribute(attr);
-              if (value && value.trim() !== '') {
-                return value.trim();
-              }
-            }
-            
-            if (imgElement.dataset) {
-              const datasetKeys = ['src', 'lazySrc', 'original'];
-              for (const key of datasetKeys) {
-                if (imgElement.dataset[key] && imgElement.dataset[key].trim() !== '') {
-                  return imgElement.dataset[key].trim();
-                }
-              }
-            }
-            
-            const style = imgElement.getAttribute('style');
-            if (style) {
-              const urlMatch = style.match(/url\(['"]?([^'")\s]+)['"]?\)/);
-              if (urlMatch && urlMatch[1]) {
-                return urlMatch[1];
-              }
-            }
-            
-            return null;
-          };
-          
-          // Try multiple product selectors
-          const productSelectors = [
-            'tr[id*="rptproducts_tr"]',  // ASP.NET repeater table rows
-            'div[id*="_itemsContainer"] > div',  // Container items
-            '[class*="product-item"]',
-            '[class*="product"]',
-            '[class*="item"]',
-            'table tr[id]',  // Table rows with IDs
-            '[data-product]',
-            'article',
-            '[class*="card"]',
-            '.product',
-            '.item'
-          ];
-          
-          let productElements = [];
-          for (const selector of productSelectors) {
-            const elements = document.querySelectorAll(selector);
-            if (elements.length > 0) {
-              productElements = Array.from(elements);
-              break;
-            }
-          }
-          
-          // Alternative approach: Start with product images and build products around them
-          if (productElements.length > 0) {
-            // Try image-first approach for better results
-            const productImages = document.querySelectorAll('img[id*="products"], img[id*="item"], img[src*="productsimages"], img[src*="ProductsImages"]');
-            
-            productImages.forEach((img, imgIdx) => {
-              try {
-                // Get image URL
-                const image = getValidImageSrc(img);
-                if (!image) return;
-                
-                // Find nearest container
-                const container = img.closest('tr, div[class*="product"], div[class*="item"], div[id], td');
-                if (!container) return;
-                
-                // Find product name/link in container
-                const links = container.querySelectorAll('a[href]');
-                let name = null;
-                let url = null;
-                let price = null;
-                
-                // Look for product link (usually contains product ID like i8085)
-                for (const link of links) {
-                  const href = link.getAttribute('href');
-                  const text = link.textContent.trim();
-                  if (href && href.includes('-i') && text && text.length > 3 && text.length < 200) {
-                    name = text;
-                    url = href;
-                    break;
-                  }
-                }
-                
-                // If still no name, try any link with substantial text
-                if (!name) {
-                  for (const link of links) {
-                    const text = link.textContent.trim();
-                    if (text && text.length > 10 && text.length < 200) {
-                      name = text;
-                      url = link.getAttribute('href');
-                      break;
-                    }
-                  }
-                }
-                
-                // Look for price
-                const priceElement = container.querySelector('[class*="price"], [id*="price"]');
-                if (priceElement) {
-                  const priceText = priceElement.textContent.trim();
-                  const priceMatch = priceText.match(/[\d,\.]+/);
-                  price = priceMatch ? priceMatch[0] : null;
-                }
-                
-                if (name && image) {
-                  extractedProducts.push({
-                    name,
-                    price,
-                    category: categoryName,
-                    url,
-                    image
-                  });
-                }
-              } catch (err) {
-                // Skip problematic images
-              }
-            });
-          }
-          
-          // If no product containers found, try to find individual product components
-          if (productElements.length === 0) {
-            // Look for images with product-like patterns
-            const allImages = document.querySelectorAll('img[alt]');
-            const allLinks = document.querySelectorAll('a[href]');
-            
-            // Try to build products from visible links with text
-            allLinks.forEach(link => {
-              const text = link.textContent.trim();
-              const href = link.getAttribute('href');
-              
-              if (text && text.length > 3 && text.length < 200 && href) {
-                // Look for price near this link
-                let price = null;
-                const parent = link.closest('[class*="product"], [class*="item"], div');
-                if (parent) {
-                  const priceElement = parent.querySelector('[class*="price"], [class*="cost"], .price');
-                  if (priceElement) {
-                    const priceText = priceElement.textContent.trim();
-                    const priceMatch = priceText.match(/[\d,\.]+/);
-                    price = priceMatch ? priceMatch[0] : null;
-                  }
-                }
-                
-                // Find associated image - check multiple attributes and locations
-                let image = null;
-                let img = null;
-                
-                // Strategy 1: Inside the link itself
-                img = link.querySelector('img');
-                
-                // Strategy 2: In the parent row/container (look up the tree)
-                if (!img) {
-                  let currentElement = link.parentElement;
-                  let depth = 0;
-                  while (currentElement && depth < 5 && !img) {
-                    img = currentElement.querySelector('img');
-                    if (img) break;
-                    currentElement = currentElement.parentElement;
-                    depth++;
-                  }
-                }
-                
-                // Strategy 3: Look for closest table row
-                if (!img) {
-                  const row = link.closest('tr');
-                  if (row) {
-                    img = row.querySelector('img');
-                  }
-                }
-                
-                // Strategy 4: Look in nearest divs
-                if (!img) {
-                  const nearestDiv = link.closest('div[class], div[id]');
-                  if (nearestDiv) {
-                    img = nearestDiv.querySelector('img');
-                  }
-                }
-                
-                if (img) {
-                  image = getValidImageSrc(img);
-                }
-                
-                if (text && !text.includes('בצ') && !text.includes('סגור')) { // Filter out UI text
-                  extractedProducts.push({
-                    name: text,
-                    price: price,
-                    category: categoryName,
-                    url: href,
-                    image: image
-                  });
-                }
-              }
-            });
-          } else {
-            // Process found product elements
-            productElements.forEach((element, idx) => {
-              try {
-                // Try to find product name
-                const nameElement = element.querySelector('[class*="name"], [class*="title"], h2, h3, h4, a[href]');
-                const name = nameElement ? nameElement.textContent.trim() : null;
-
-                // Try to find price
-                const priceElement = element.querySelector('[class*="price"], [class*="cost"], .price');
-                let price = null;
-                if (priceElement) {
-                  const priceText = priceElement.textContent.trim();
-                  const priceMatch = priceText.match(/[\d,\.]+/);
-                  price = priceMatch ? priceMatch[0] : null;
-                }
-
-                // Try to find product link
-                const linkElement = element.querySelector('a');
-                const url = linkElement ? linkElement.getAttribute('href') : null;
-
-                // Try to find product image - search broadly in the element tree
-                let imageElement = element.querySelector('img');
-                
-                // If not found in current element, search in parent/siblings
-                if (!imageElement && element.parentElement) {
-                  imageElement = element.parentElement.querySelector('img');
-                }
-                
-                // Try searching in nearest container
-                if (!imageElement) {
-                  const container = element.closest('tr, div[class], div[id]');
-                  if (container) {
-                    imageElement = container.querySelector('img');
-                  }
-                }
-                
-                let image = null;
-                if (imageElement) {
-                  image = getValidImageSrc(imageElement);
-                }
-
-                
-                // Only add if we have at least a name
-                if (name && name.length > 3) {
-                  extractedProducts.push({
-                    name,
-                    price,
-                    category: categoryName,
-                    url,
-                    image
-                  });
-                }
-              } catch (err) {
-                // Skip problematic elements
-              }
-            });
-          }
-          
-          
-          // Remove duplicates based on name
-          const uniqueProducts = [];
-          const seen = new Set();
-          extractedProducts.forEach(product => {
-            if (!seen.has(product.name)) {
-              seen.add(product.name);
-              uniqueProducts.push(product);
-            }
-          });
+        results[nextToMerge] = null;
+        nextToMerge++;
+      }
+    };
 
-          return uniqueProducts;
-        }, category.name);
+    const runWorker = async (workerPage) => {
+      while (nextCategory < categoriesToScrape && allProducts.length < CONFIG.maxProducts) {
+        const index = nextCategory++;
+        const category = filteredCategories[index];
+        console.log(`\n📦 Scraping category: ${category.name} (${allProducts.length}/${CONFIG.maxProducts} products collected)`);
 
-        // Filter products to only include those with both image AND price
-        // Also exclude products with the default Nitzat logo image (placeholder)
-        const placeholderImages = [
-          'Q659875_80_40.png',  // Nitzat logo
-          'productsimages/mfrimages/thumbs/Q659875_80_40.png'
-        ];
-        
-        const completeProducts = products.filter(product => 
-          product.image && product.image.trim() !== '' &&
-          product.price && product.price.trim() !== '' &&
-          !placeholderImages.some(placeholder => product.image.includes(placeholder))
-        );
-        
-        // First, deduplicate within this category's products
-        const categoryUniqueProducts = [];
-        const categoryImages = new Set();
-        for (const product of completeProducts) {
-          if (!categoryImages.has(product.image) && !usedImages.has(product.image)) {
-            categoryImages.add(product.image);
-            categoryUniqueProducts.push(product);
-          }
-        }
-        
-        console.log(`   ✓ Found ${products.length} products in ${category.name} (${completeProducts.length} with complete data, ${categoryUniqueProducts.length} with unique images)`);
-        
-        // Add products up to the maximum limit and track their images
-        const remainingSlots = CONFIG.maxProducts - allProducts.length;
-        const productsToAdd = categoryUniqueProducts.slice(0, remainingSlots);
-        
-        // Track the images we're adding
-        productsToAdd.forEach(product => {
-          usedImages.add(product.image);
-        });
-        
-        allProducts.push(...productsToAdd);
-        
-        if (allProducts.length >= CONFIG.maxProducts) {
-          console.log(`   🎯 Reached maximum of ${CONFIG.maxProducts} products!`);
+        try {
+          results[index] = await scrapeCategory(workerPage, category, throttle);
+        } catch (error) {
+          console.error(`   ✗ Error scraping category ${category.name}:`, error.message);
+          results[index] = [];
         }
-
-      } catch (error) {
-        console.error(`   ✗ Error scraping category ${category.name}:`, error.message);
+        mergeFinished();
       }
+    };
+
+    await Promise.all(pages.map(runWorker));
+
+    if (allProducts.length >= CONFIG.maxProducts) {
+      console.log(`\n✅ Reached maximum of ${CONFIG.maxProducts} products. Stopping scrape.`);
     }
 
     // Final deduplication pass - ensure absolutely no duplicate images
@@ -569,18 +750,20 @@ async function scrapeNitzatHaduvdevan() {
     
     console.log(`\n🔍 Final deduplication: ${allProducts.length} → ${finalProducts.length} unique image products`);
 
-    // Save results to JSON file
-    const outputPath = path.join(CONFIG.outputDir, CONFIG.outputFile);
+    // Save results to JSON file (and the delta against the previous scrape)
     const output = {
       scrapedAt: new Date().toISOString(),
       totalProducts: finalProducts.length,
       products: finalProducts
     };
 
-    fs.writeFileSync(outputPath, JSON.stringify(output, null, 2), 'utf-8');
+    const outputPath = writeCatalog(output);
     
     console.log(`\n✅ Scraping completed!`);
     console.log(`📊 Total products scraped: ${allProducts.length}`);
+    if (blockingResources()) {
+      console.log(`🚫 Blocked ${stats.blockedRequests} non-essential requests`);
+    }
     console.log(`💾 Data saved to: ${outputPath}`);
 
   } catch (error) {
@@ -604,5 +787,5 @@ if (require.main === module) {
     });
 }
 
-module.exports = { scrapeNitzatHaduvdevan };
+module.exports = { scrapeNitzatHaduvdevan, productKey, buildCatalogDelta, writeCatalog };
 
@@ -1,3 +1,4 @@
+const crypto = require('crypto');
 const fs = require('fs');
 const path = require('path');
 
@@ -8,6 +9,9 @@ const docsIndex = path.join(docsDir, 'index.html');
 const storesDir = path.join(projectRoot, 'stores');
 const docsStoresDir = path.join(docsDir, 'stores');
 
+// Shard and index file names are content hashes, so browsers can cache them forever
+const HASH_LENGTH = 16;
+
 function ensureDir(dirPath) {
   fs.mkdirSync(dirPath, { recursive: true });
 }
@@ -32,6 +36,64 @@ function copyDirectory(src, dest) {
   console.log(`📁 Synced ${path.relative(projectRoot, src)} -> ${path.relative(projectRoot, dest)}`);
 }
 
+function contentHash(content) {
+  return crypto.createHash('sha256').update(content).digest('hex').slice(0, HASH_LENGTH);
+}
+
+function writeHashed(dir, data) {
+  const content = JSON.stringify(data);
+  const hash = contentHash(content);
+  fs.writeFileSync(path.join(dir, `${hash}.json`), content);
+  return { hash, bytes: Buffer.byteLength(content) };
+}
+
+/**
+ * Split products.json into one shard per category, plus a search index
+ * and a small manifest, so the viewer only downloads what is browsed.
+ */
+function buildShards(dataDir) {
+  const productsFile = path.join(dataDir, 'products.json');
+  if (!fs.existsSync(productsFile)) {
+    console.warn(`⚠️ Missing file, skipping shards: ${productsFile}`);
+    return;
+  }
+  const data = JSON.parse(fs.readFileSync(productsFile, 'utf8'));
+
+  // Categories keep their scrape order; products keep their order within a category
+  const byCategory = new Map();
+  data.products.forEach((product) => {
+    if (!byCategory.has(product.category)) byCategory.set(product.category, []);
+    byCategory.get(product.category).push(product);
+  });
+
+  const shardsDir = path.join(dataDir, 'shards');
+  fs.rmSync(shardsDir, { recursive: true, force: true });
+  ensureDir(shardsDir);
+
+  const categories = [];
+  const entries = [];
+  [...byCategory].forEach(([name, products], categoryIndex) => {
+    const { hash, bytes } = writeHashed(shardsDir, products);
+    categories.push({ name, count: products.length, hash, bytes });
+    products.forEach((product, position) => {
+      entries.push([product.name.toLowerCase(), categoryIndex, position]);
+    });
+  });
+
+  // Lowercased names with their shard position: searching needs no shard,
+  // and only the shards holding matches are fetched to render them
+  const searchIndex = writeHashed(shardsDir, { entries });
+
+  const manifest = {
+    scrapedAt: data.scrapedAt,
+    totalProducts: data.products.length,
+    searchIndex,
+    categories
+  };
+  fs.writeFileSync(path.join(dataDir, 'manifest.json'), JSON.stringify(manifest, null, 2));
+  console.log(`🧩 Wrote ${categories.length} category shards and search index -> ${path.relative(projectRoot, dataDir)}`);
+}
+
 function syncIndex() {
   ensureDir(docsDir);
   copyFile(sourceIndex, docsIndex);
@@ -58,6 +120,8 @@ function syncStores() {
       path.join(srcStoreDir, 'data'),
       path.join(destStoreDir, 'data')
     );
+
+    buildShards(path.join(destStoreDir, 'data'));
   });
 }
 